@@ -1,22 +1,21 @@
 """
 BlackTable API - FastAPI backend for all recruitment modules
 """
-import os
 import json
-from typing import List, Dict, Any, Optional
+import hashlib
+from typing import List, Dict, Any, Optional, Tuple
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-import tempfile
-import shutil
 
 # Import BlackTable modules
-from blacktable.resume_parser import ResumeParser
-from blacktable.question_generator import QuestionGenerator
+from blacktable.resume_parser import ResumeParser, ResumeData
+from blacktable.question_generator import QuestionGenerator, QuestionSet
 from blacktable.fit_score import FITScoreMatcher
 from blacktable.application_analyzer import ApplicationAnalyzer
+from blacktable.core.clients import get_ai_service
 
 app = FastAPI(
     title="BlackTable API",
@@ -33,11 +32,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
-resume_parser = ResumeParser()
-question_generator = QuestionGenerator()
-fit_score_matcher = FITScoreMatcher()
-application_analyzer = ApplicationAnalyzer()
+# Initialize services (all components share one AI service and connection pool)
+ai_service = get_ai_service()
+resume_parser = ResumeParser(ai_service=ai_service)
+question_generator = QuestionGenerator(ai_service=ai_service)
+fit_score_matcher = FITScoreMatcher(ai_service=ai_service)
+application_analyzer = ApplicationAnalyzer(ai_service=ai_service)
+
+
+@app.on_event("startup")
+def warm_converter_pool():
+    """Start the document converter processes so the first uploads do not pay for model loading"""
+    if resume_parser.document_processor.pool is not None:
+        resume_parser.document_processor.pool.warm()
+
+
+@app.on_event("shutdown")
+def stop_converter_pool():
+    """Stop the document converter processes"""
+    resume_parser.document_processor.close()
+
 
 # Mount static files for GUI
 app.mount("/static", StaticFiles(directory="api/static"), name="static")
@@ -64,16 +78,26 @@ class ApplicationAnalysisRequest(BaseModel):
     additional_fields: Optional[Dict[str, Any]] = None
 
 
-# Helper function to save uploaded file temporarily
-def save_uploaded_file(uploaded_file: UploadFile) -> str:
-    """Save uploaded file temporarily and return path"""
-    temp_dir = tempfile.mkdtemp()
-    file_path = os.path.join(temp_dir, uploaded_file.filename)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(uploaded_file.file, buffer)
-    
-    return file_path
+# Chunk size for reading uploads
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+async def read_upload(uploaded_file: UploadFile) -> Tuple[bytes, str]:
+    """Read an uploaded file into memory, hashing it while it streams in"""
+    digest = hashlib.sha256()
+    chunks = []
+    while True:
+        chunk = await uploaded_file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
+
+
+def _ndjson_event(data: BaseModel, final: bool) -> str:
+    """Serialize a streamed (partial or final) result as one NDJSON line"""
+    return json.dumps({"success": True, "final": final, "data": data.model_dump(mode="json")}) + "\n"
 
 
 @app.get("/", response_class=FileResponse)
@@ -87,15 +111,9 @@ async def root():
 async def parse_resume(file: UploadFile = File(...)):
     """Parse resume and return structured data"""
     try:
-        # Save uploaded file temporarily
-        file_path = save_uploaded_file(file)
-        
-        # Parse resume
-        resume_data = resume_parser.parse_resume(file_path)
-        
-        # Clean up temporary file
-        os.remove(file_path)
-        os.rmdir(os.path.dirname(file_path))
+        # Parse resume straight from the upload
+        data, content_hash = await read_upload(file)
+        resume_data = await resume_parser.aparse_resume_bytes(data, file.filename, content_hash)
         
         return {"success": True, "data": resume_data.dict()}
         
@@ -103,11 +121,27 @@ async def parse_resume(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail=f"Resume parsing failed: {str(e)}")
 
 
+@app.post("/api/parse-resume/stream")
+async def parse_resume_stream(file: UploadFile = File(...)):
+    """Parse resume, streaming partially filled results as NDJSON lines"""
+    data, content_hash = await read_upload(file)
+    filename = file.filename
+
+    async def events():
+        try:
+            async for resume_data in resume_parser.astream_resume_bytes(data, filename, content_hash):
+                yield _ndjson_event(resume_data, final=isinstance(resume_data, ResumeData))
+        except Exception as e:
+            yield json.dumps({"success": False, "detail": f"Resume parsing failed: {str(e)}"}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
 @app.post("/api/generate-questions")
 async def generate_questions(request: QuestionGenerationRequest):
     """Generate standard interview questions"""
     try:
-        questions = question_generator.generate_standard_questions(
+        questions = await question_generator.agenerate_standard_questions(
             job_description=request.job_description,
             interview_round=request.interview_round,
             focus_area=request.focus_area,
@@ -121,6 +155,26 @@ async def generate_questions(request: QuestionGenerationRequest):
         raise HTTPException(status_code=400, detail=f"Question generation failed: {str(e)}")
 
 
+@app.post("/api/generate-questions/stream")
+async def generate_questions_stream(request: QuestionGenerationRequest):
+    """Generate standard interview questions, streaming the growing question set as NDJSON lines"""
+
+    async def events():
+        try:
+            async for question_set in question_generator.astream_standard_question_set(
+                job_description=request.job_description,
+                interview_round=request.interview_round,
+                focus_area=request.focus_area,
+                question_count=request.question_count,
+                difficulty_levels=request.difficulty_levels
+            ):
+                yield _ndjson_event(question_set, final=isinstance(question_set, QuestionSet))
+        except Exception as e:
+            yield json.dumps({"success": False, "detail": f"Question generation failed: {str(e)}"}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
 @app.post("/api/generate-personalized-questions")
 async def generate_personalized_questions(
     job_description: str = Form(...),
@@ -130,24 +184,18 @@ async def generate_personalized_questions(
 ):
     """Generate personalized interview questions based on resume"""
     try:
-        # Save uploaded file temporarily
-        file_path = save_uploaded_file(file)
-        
-        # Parse resume
-        resume_data = resume_parser.parse_resume(file_path)
+        # Parse resume straight from the upload
+        data, content_hash = await read_upload(file)
+        resume_data = await resume_parser.aparse_resume_bytes(data, file.filename, content_hash)
         
         # Generate personalized questions
-        questions = question_generator.generate_personalized_questions(
+        questions = await question_generator.agenerate_personalized_questions(
             resume_data=resume_data,
             job_description=job_description,
             interview_round=interview_round,
             question_count=question_count
         )
         
-        # Clean up temporary file
-        os.remove(file_path)
-        os.rmdir(os.path.dirname(file_path))
-        
         return {"success": True, "data": [q.dict() for q in questions]}
         
     except Exception as e:
@@ -161,22 +209,16 @@ async def calculate_fit_score(
 ):
     """Calculate FIT score between resume and job description"""
     try:
-        # Save uploaded file temporarily
-        file_path = save_uploaded_file(file)
-        
-        # Parse resume
-        resume_data = resume_parser.parse_resume(file_path)
+        # Parse resume straight from the upload
+        data, content_hash = await read_upload(file)
+        resume_data = await resume_parser.aparse_resume_bytes(data, file.filename, content_hash)
         
         # Calculate FIT score
-        fit_score_result = fit_score_matcher.calculate_fit_score(
+        fit_score_result = await fit_score_matcher.acalculate_fit_score(
             resume_data=resume_data,
             job_description=job_description
         )
         
-        # Clean up temporary file
-        os.remove(file_path)
-        os.rmdir(os.path.dirname(file_path))
-        
         return {"success": True, "data": fit_score_result.dict()}
         
     except Exception as e:
@@ -197,11 +239,9 @@ async def analyze_application(
 ):
     """Analyze complete job application"""
     try:
-        # Save uploaded file temporarily
-        file_path = save_uploaded_file(file)
-        
-        # Parse resume
-        resume_data = resume_parser.parse_resume(file_path)
+        # Parse resume straight from the upload
+        data, content_hash = await read_upload(file)
+        resume_data = await resume_parser.aparse_resume_bytes(data, file.filename, content_hash)
         
         # Parse pre-screening data
         parsed_prescreening_questions = None
@@ -220,7 +260,7 @@ async def analyze_application(
                 parsed_prescreening_responses = None
         
         # Analyze application
-        analysis_result = application_analyzer.analyze_application(
+        analysis_result = await application_analyzer.aanalyze_application(
             job_title=job_title,
             job_description=job_description,
             salary_range=salary_range,
@@ -232,16 +272,18 @@ async def analyze_application(
             resume=resume_data.resume
         )
         
-        # Clean up temporary file
-        os.remove(file_path)
-        os.rmdir(os.path.dirname(file_path))
-        
         return {"success": True, "data": analysis_result.dict()}
         
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Application analysis failed: {str(e)}")
 
 
+@app.get("/api/telemetry")
+async def telemetry_summary():
+    """Per-stage call counts, tokens, cost and latency of recent AI calls"""
+    return {"success": True, "data": ai_service.telemetry.summary()}
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
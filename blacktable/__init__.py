@@ -1,26 +1,39 @@
 """
 BlackTable - AI-Powered Recruitment Module
-"""
 
-try:
-    from .resume_parser import ResumeParser
-    from .question_generator import QuestionGenerator
-    from .fit_score import FITScoreMatcher
-    from .application_analyzer import ApplicationAnalyzer
-except ImportError as e:
-    # Handle import errors gracefully during development
-    print(f"Warning: Some components could not be imported: {e}")
-    ResumeParser = None
-    QuestionGenerator = None
-    FITScoreMatcher = None
-    ApplicationAnalyzer = None
+Components are imported on first attribute access (PEP 562), so importing
+the package, or one component, does not load the others or their
+dependencies (docling, the provider SDKs).
+"""
+import importlib
+from typing import Any, List
 
 __version__ = "1.0.0"
 __author__ = "Himansh Raj"
 
+# Public name -> submodule defining it
+_LAZY_IMPORTS = {
+    "ResumeParser": ".resume_parser",
+    "QuestionGenerator": ".question_generator",
+    "FITScoreMatcher": ".fit_score",
+    "ApplicationAnalyzer": ".application_analyzer",
+}
+
 __all__ = [
     "ResumeParser",
     "QuestionGenerator", 
     "FITScoreMatcher",
     "ApplicationAnalyzer"
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
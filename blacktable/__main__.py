@@ -0,0 +1,111 @@
+"""
+BlackTable command line
+
+Usage:
+    python -m blacktable ingest resumes.zip --output resumes.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import zipfile
+from typing import List, Optional
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run a BlackTable command
+
+    Args:
+        argv: Command line arguments (defaults to sys.argv[1:])
+
+    Returns:
+        Process exit code
+    """
+    parser = argparse.ArgumentParser(prog="blacktable", description="BlackTable recruitment tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser(
+        "ingest",
+        help="Parse a directory or zip archive of resumes into JSONL or SQLite",
+        description="Parse every resume in a directory or zip archive and write one record per resume. "
+                    "Running the same command again resumes where it stopped."
+    )
+    ingest_parser.add_argument("source", help="Directory or .zip archive of resumes")
+    ingest_parser.add_argument(
+        "-o", "--output", required=True, help="Output file: .jsonl, or .sqlite, .sqlite3 or .db for SQLite"
+    )
+    ingest_parser.add_argument("--provider", default="openai", help="AI provider (openai or anthropic)")
+    ingest_parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Document converter processes (defaults to BLACKTABLE_CONVERTER_WORKERS, 0 converts in-process)"
+    )
+    ingest_parser.add_argument("--concurrency", type=int, default=8, help="Resumes extracted at the same time")
+    ingest_parser.add_argument("--max-pending", type=int, default=32, help="Most resumes held in memory at once")
+    ingest_parser.add_argument("--limit", type=int, default=None, help="Stop after this many new resumes")
+    ingest_parser.add_argument(
+        "--sectioned", action=argparse.BooleanOptionalAction, default=None,
+        help="Extract resume sections in concurrent calls (defaults to BLACKTABLE_RESUME_SECTIONED)"
+    )
+    ingest_parser.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress lines")
+    ingest_parser.add_argument("--quiet", action="store_true", help="Only print the final summary")
+
+    args = parser.parse_args(argv)
+    if args.command == "ingest":
+        return _ingest(args)
+    return 2
+
+
+def _ingest(args: argparse.Namespace) -> int:
+    """Run the ingest command"""
+    from .core.config import AIConfig
+    from .resume_parser.ingest import create_ingest_sink, ingest
+    from .resume_parser.parser import ResumeParser
+    from .resume_parser.pool import ConverterPool
+
+    if not (os.path.isdir(args.source) or zipfile.is_zipfile(args.source)):
+        print(f"Error: Not a directory or zip archive: {args.source}", file=sys.stderr)
+        return 2
+
+    resume_parser = None
+    sink = None
+    try:
+        resume_parser = ResumeParser(ai_provider=args.provider, sectioned=args.sectioned)
+        processor = resume_parser.document_processor
+        if args.workers is not None:
+            if processor.pool is not None:
+                processor.pool.shutdown()
+            processor.pool = ConverterPool(
+                args.workers, max_tasks_per_child=AIConfig.get_converter_max_tasks_per_child()
+            ) if args.workers else None
+
+        sink = create_ingest_sink(args.output)
+        stats = asyncio.run(ingest(
+            args.source,
+            sink,
+            resume_parser,
+            concurrency=args.concurrency,
+            max_pending=args.max_pending,
+            limit=args.limit,
+            progress_interval=args.progress_interval,
+            progress=None if args.quiet else sys.stderr
+        ))
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume", file=sys.stderr)
+        return 130
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if sink is not None:
+            sink.close()
+        if resume_parser is not None:
+            resume_parser.document_processor.close()
+
+    print(json.dumps(stats.summary()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
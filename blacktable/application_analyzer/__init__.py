@@ -1,8 +1,9 @@
 """
 Application Analyzer Module - Comprehensive job application analysis
 """
+import importlib
+from typing import Any, List
 
-from .analyzer import ApplicationAnalyzer
 from .models import (
     JobApplication, JobRequirements, ApplicationAnalysisResult,
     WhyMatch, WhyNotMatch, CandidateProfile
@@ -17,3 +18,15 @@ __all__ = [
     "WhyNotMatch", 
     "CandidateProfile"
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name == "ApplicationAnalyzer":
+        value = importlib.import_module(".analyzer", __name__).ApplicationAnalyzer
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -2,8 +2,9 @@
 Application Analyzer - AI-powered comprehensive job application analysis
 """
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from ..core.ai_service import AIService
+from ..core.clients import get_ai_service
 # from ..core.config import AIConfig
 from ..fit_score.matcher import FITScoreMatcher
 from ..fit_score.models import FITScoreResult
@@ -14,21 +15,46 @@ from .models import (
 )
 
 
+# System prompt for AI
+ANALYSIS_SYSTEM_PROMPT = """
+You are an expert AI recruitment analyst with deep expertise in talent assessment, 
+job matching, and candidate evaluation. Your role is to provide comprehensive, 
+objective, and actionable analysis of job applications.
+
+You will receive job application data along with detailed FIT Score analysis that provides 
+technical skill matching, experience relevance, and detailed gap analysis. Use this 
+FIT Score data to enhance your assessment and provide more accurate analysis.
+
+Analyze the provided job application data against the job requirements and provide:
+1. A precise AI fit score (0-100) - consider and incorporate the FIT Score analysis
+2. Detailed reasons why the candidate matches
+3. Detailed reasons for concerns or gaps
+4. Extracted candidate profile information
+5. Strategic hiring recommendations
+
+Be thorough, objective, and provide actionable insights for hiring managers.
+Focus on both hard skills and soft skills, cultural fit, growth potential, and overall suitability.
+Use the FIT Score analysis to inform your technical assessment while adding your own insights 
+on communication, cultural fit, and overall potential.
+"""
+
+
 class ApplicationAnalyzer:
     """
     Comprehensive application analyzer that evaluates job applications 
     against job requirements using AI
     """
     
-    def __init__(self, ai_provider: str = "openai"):
+    def __init__(self, ai_provider: str = "openai", ai_service: Optional[AIService] = None):
         """
         Initialize the application analyzer
         
         Args:
             ai_provider: AI provider to use ("openai" or "anthropic")
+            ai_service: AI service to use; defaults to the shared service for ai_provider
         """
-        self.ai_service = AIService(provider=ai_provider)
-        self.fit_score_matcher = FITScoreMatcher(ai_provider=ai_provider)
+        self.ai_service = ai_service or get_ai_service(ai_provider)
+        self.fit_score_matcher = FITScoreMatcher(ai_provider=ai_provider, ai_service=self.ai_service)
         # self.config = AIConfig()
     
     def analyze_application(
@@ -63,21 +89,10 @@ class ApplicationAnalyzer:
             ApplicationAnalysisResult with comprehensive analysis
         """
         
-        # Create job requirements and application objects
-        job_requirements = JobRequirements(
-            job_title=job_title,
-            job_description=job_description,
-            salary_range=salary_range,
-            prescreening_questions=prescreening_questions or []
-        )
-        
-        job_application = JobApplication(
-            resume=resume,
-            current_ctc=current_ctc,
-            expected_ctc=expected_ctc,
-            notice_period=notice_period,
-            prescreening_responses=prescreening_responses or {},
-            additional_fields=additional_fields or {}
+        job_requirements, job_application = self._build_application_records(
+            job_title, job_description, salary_range, prescreening_questions,
+            prescreening_responses, current_ctc, expected_ctc, notice_period,
+            additional_fields, resume
         )
         
         # Calculate FIT Score if resume is available
@@ -98,6 +113,88 @@ class ApplicationAnalyzer:
         # Generate comprehensive analysis using AI (including FIT Score data)
         return self._generate_ai_analysis(job_requirements, job_application, fit_score_result)
     
+    async def aanalyze_application(
+        self,
+        job_title: str,
+        job_description: str,
+        salary_range: str = None,
+        prescreening_questions: List[str] = None,
+        prescreening_responses: Dict[str, str] = None,
+        current_ctc: str = None,
+        expected_ctc: str = None,
+        notice_period: str = None,
+        additional_fields: Dict[str, Any] = None,
+        resume: Resume = None
+    ) -> ApplicationAnalysisResult:
+        """
+        Async variant of analyze_application
+        
+        Args:
+            job_title: Title of the job position
+            job_description: Detailed job description
+            salary_range: Salary range for the position (optional)
+            prescreening_questions: List of pre-screening questions (optional)
+            prescreening_responses: Dict of question:answer pairs from candidate
+            current_ctc: Candidate's current CTC
+            expected_ctc: Candidate's expected CTC
+            notice_period: Candidate's notice period
+            additional_fields: Any other fields filled by candidate
+            resume: Complete Resume object with structured resume data (optional)
+            
+        Returns:
+            ApplicationAnalysisResult with comprehensive analysis
+        """
+        job_requirements, job_application = self._build_application_records(
+            job_title, job_description, salary_range, prescreening_questions,
+            prescreening_responses, current_ctc, expected_ctc, notice_period,
+            additional_fields, resume
+        )
+        
+        fit_score_result = None
+        if resume:
+            try:
+                fit_score_result = await self.fit_score_matcher.acalculate_fit_score(
+                    resume_data=resume,
+                    job_description=job_description
+                )
+            except Exception as e:
+                print(f"Warning: FIT Score calculation failed: {e}")
+                fit_score_result = None
+        
+        return await self._agenerate_ai_analysis(job_requirements, job_application, fit_score_result)
+    
+    def _build_application_records(
+        self,
+        job_title: str,
+        job_description: str,
+        salary_range: str,
+        prescreening_questions: List[str],
+        prescreening_responses: Dict[str, str],
+        current_ctc: str,
+        expected_ctc: str,
+        notice_period: str,
+        additional_fields: Dict[str, Any],
+        resume: Resume
+    ) -> Tuple[JobRequirements, JobApplication]:
+        """Create job requirements and application objects"""
+        job_requirements = JobRequirements(
+            job_title=job_title,
+            job_description=job_description,
+            salary_range=salary_range,
+            prescreening_questions=prescreening_questions or []
+        )
+        
+        job_application = JobApplication(
+            resume=resume,
+            current_ctc=current_ctc,
+            expected_ctc=expected_ctc,
+            notice_period=notice_period,
+            prescreening_responses=prescreening_responses or {},
+            additional_fields=additional_fields or {}
+        )
+        
+        return job_requirements, job_application
+    
     def _generate_ai_analysis(
         self, 
         job_requirements: JobRequirements, 
@@ -119,35 +216,13 @@ class ApplicationAnalyzer:
         # Create comprehensive prompt for AI analysis
         analysis_prompt = self._create_analysis_prompt(job_requirements, job_application, fit_score_result)
         
-        # System prompt for AI
-        system_prompt = """
-You are an expert AI recruitment analyst with deep expertise in talent assessment, 
-job matching, and candidate evaluation. Your role is to provide comprehensive, 
-objective, and actionable analysis of job applications.
-
-You will receive job application data along with detailed FIT Score analysis that provides 
-technical skill matching, experience relevance, and detailed gap analysis. Use this 
-FIT Score data to enhance your assessment and provide more accurate analysis.
-
-Analyze the provided job application data against the job requirements and provide:
-1. A precise AI fit score (0-100) - consider and incorporate the FIT Score analysis
-2. Detailed reasons why the candidate matches
-3. Detailed reasons for concerns or gaps
-4. Extracted candidate profile information
-5. Strategic hiring recommendations
-
-Be thorough, objective, and provide actionable insights for hiring managers.
-Focus on both hard skills and soft skills, cultural fit, growth potential, and overall suitability.
-Use the FIT Score analysis to inform your technical assessment while adding your own insights 
-on communication, cultural fit, and overall potential.
-"""
-        
         # Generate structured response using AI
         try:
             result = self.ai_service.generate_structured_response(
                 prompt=analysis_prompt,
                 response_model=ApplicationAnalysisResult,
-                system_prompt=system_prompt
+                system_prompt=ANALYSIS_SYSTEM_PROMPT,
+                stage="application_analyzer.analysis"
             )
             return result
         except Exception as e:
@@ -155,6 +230,26 @@ on communication, cultural fit, and overall potential.
             print(f"Warning: AI analysis failed, performing fallback analysis: {e}")
             # throw e  # Optionally re-raise the exception for further handling
             raise ValueError("AI analysis failed, fallback analysis not implemented")
+    
+    async def _agenerate_ai_analysis(
+        self, 
+        job_requirements: JobRequirements, 
+        job_application: JobApplication,
+        fit_score_result: FITScoreResult = None
+    ) -> ApplicationAnalysisResult:
+        """Async variant of _generate_ai_analysis"""
+        analysis_prompt = self._create_analysis_prompt(job_requirements, job_application, fit_score_result)
+        
+        try:
+            return await self.ai_service.agenerate_structured_response(
+                prompt=analysis_prompt,
+                response_model=ApplicationAnalysisResult,
+                system_prompt=ANALYSIS_SYSTEM_PROMPT,
+                stage="application_analyzer.analysis"
+            )
+        except Exception as e:
+            print(f"Warning: AI analysis failed, performing fallback analysis: {e}")
+            raise ValueError("AI analysis failed, fallback analysis not implemented")
 
     def _create_analysis_prompt(
         self, 
@@ -1,23 +1,28 @@
 """
-Core configuration for BlackTable
+Core services shared by the BlackTable components
 """
-import os
-from typing import Optional
+import importlib
+from typing import Any, List
 
+from .config import AIConfig
 
-class AIConfig:
-    """Configuration for AI services"""
-    OPENAI_MODEL = "gpt-4o"
-    ANTHROPIC_MODEL = "claude-3-sonnet"
-    MAX_TOKENS = 4000
-    TEMPERATURE = 0.1
-    
-    @classmethod
-    def get_openai_api_key(cls) -> Optional[str]:
-        """Get OpenAI API key from environment"""
-        return os.getenv("OPENAI_API_KEY")
-    
-    @classmethod
-    def get_anthropic_api_key(cls) -> Optional[str]:
-        """Get Anthropic API key from environment"""
-        return os.getenv("ANTHROPIC_API_KEY")
+# Public name -> submodule defining it; loaded on first access (PEP 562)
+_LAZY_IMPORTS = {
+    "AIService": ".ai_service",
+    "get_ai_service": ".clients",
+    "reset_clients": ".clients",
+}
+
+__all__ = ["AIConfig", "AIService", "get_ai_service", "reset_clients"]
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
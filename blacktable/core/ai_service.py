@@ -1,149 +1,963 @@
 """
 AI Service for structured data generation using Pydantic models
 """
+import asyncio
 import json
 import os
-from typing import Any, Type, TypeVar
-from pydantic import BaseModel
-import openai
-from anthropic import Anthropic
-from dotenv import load_dotenv
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Type, TypeVar
+from pydantic import BaseModel, ValidationError
 
+from .batch import BATCH_COMPLETED, BATCH_FAILED, BaseBatchBackend, BatchRequest, BatchResult, create_batch_backend
+from .budget import CompactionReport, TokenBudget
+from .cache import BaseCache, create_cache, make_cache_key
 from .config import AIConfig
-
-# Load environment variables
-load_dotenv()
+from .json_repair import repair_json
+from .providers import BaseProvider, Completion, CompletionRequest, create_provider, static_blocks
+from .rate_limit import RateLimiter, create_rate_limiter, parse_rate_limit_headers
+from .retry import RetryPolicy
+from .schema import SchemaPromptRegistry, drop_disallowed_nulls, schema_registry
+from .singleflight import SingleFlight
+from .stages import StagePolicies, create_stage_policies
+from .streaming import PartialJSONParser, make_partial_model
+from .telemetry import CallRecord, Telemetry, create_telemetry, estimate_cost
+from .tokens import estimate_tokens
 
 T = TypeVar('T', bound=BaseModel)
 
+_env_loaded = False
+
+
+def load_env() -> None:
+    """Load variables from a .env file once, on first use rather than at import"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _env_loaded = True
+
 
 class AIService:
     """AI service for generating structured data using Pydantic models"""
-    
-    def __init__(self, provider: str = "openai"):
+
+    _UNSET = object()
+
+    def __init__(
+        self,
+        provider: str = "openai",
+        cache: Optional[BaseCache] = _UNSET,
+        schemas: SchemaPromptRegistry = None,
+        rate_limiter: Optional[RateLimiter] = _UNSET,
+        retry_policy: RetryPolicy = None,
+        telemetry: Telemetry = None,
+        stage_policies: StagePolicies = None
+    ):
         """
         Initialize AI service with specified provider
-        
+
         Args:
-            provider: AI provider ("openai" or "anthropic")
+            provider: AI provider ("openai", "anthropic", "router" or "replay")
+            cache: Response cache for structured responses; defaults to the configured
+                backend, pass None to disable caching
+            schemas: Schema prompt registry; defaults to the process-wide registry
+            rate_limiter: Limiter for provider calls; defaults to the configured
+                limits, pass None to disable limiting
+            retry_policy: Backoff for transient provider errors; defaults to the configured policy
+            telemetry: Per-call telemetry; defaults to the configured sinks
+            stage_policies: Per-stage provider/model overrides; defaults to the configured policies
         """
+        load_env()
         self.provider = provider
         self.config = AIConfig()
-        
-        if provider == "openai":
-            api_key = self.config.get_openai_api_key()
-            if not api_key:
-                raise ValueError("OpenAI API key not found in environment variables")
-            self.client = openai.OpenAI(api_key=api_key)
-        elif provider == "anthropic":
-            api_key = self.config.get_anthropic_api_key()
-            if not api_key:
-                raise ValueError("Anthropic API key not found in environment variables")
-            self.client = Anthropic(api_key=api_key)
-        else:
-            raise ValueError(f"Unsupported provider: {provider}")
-    
+        self.backend = create_provider(provider, self.config)
+        self.client = self.backend.client
+        self.model = self.backend.default_model or (
+            self.config.ANTHROPIC_MODEL if provider == "anthropic" else self.config.OPENAI_MODEL
+        )
+        if cache is AIService._UNSET:
+            cache = create_cache(
+                self.config.get_cache_backend(),
+                sqlite_path=self.config.get_cache_path(),
+                max_entries=self.config.CACHE_MAX_ENTRIES,
+                ttl=self.config.CACHE_TTL
+            )
+        self.cache = cache
+        self.schemas = schemas or schema_registry
+        self.structured_mode = self.config.get_structured_mode()
+        # Response models that fall back to the schema-in-prompt path
+        self.prompt_mode_models = self.config.get_prompt_mode_models()
+        self.batch_backend: Optional[BaseBatchBackend] = None
+        if rate_limiter is AIService._UNSET:
+            rate_limiter = create_rate_limiter(self.config)
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_attempts=self.config.get_retry_max_attempts(),
+            base_delay=self.config.RETRY_BASE_DELAY,
+            max_delay=self.config.RETRY_MAX_DELAY
+        )
+        # Coalesces identical structured requests while one of them is in flight
+        self.single_flight = SingleFlight() if self.config.get_single_flight() else None
+        # Mark static prompt prefixes for provider-side prompt caching
+        self.prompt_caching = self.config.get_prompt_caching()
+        # Token budget for long inputs such as resume markdown and job descriptions
+        self.input_budget = self.config.get_input_token_budget()
+        self.input_max_list_items = self.config.get_input_max_list_items()
+        # Re-asks sending only the validation errors when local repair fails
+        self.reask_attempts = self.config.get_reask_attempts()
+        self.telemetry = telemetry or create_telemetry(
+            self.config.get_telemetry_sinks(), jsonl_path=self.config.get_telemetry_path()
+        )
+        self.stage_policies = stage_policies if stage_policies is not None else create_stage_policies(self.config)
+        # Backends of other providers that stage policies route to, created on first use
+        self._backends: Dict[str, BaseProvider] = {provider: self.backend}
+        self._backends_lock = threading.Lock()
+
+    @property
+    def cache_stats(self) -> Dict[str, float]:
+        """Hit/miss counters of the response cache"""
+        return self.cache.stats.as_dict() if self.cache else {}
+
+    @property
+    def single_flight_stats(self) -> Dict[str, float]:
+        """Counters of structured calls that ran and that shared an in-flight call"""
+        return self.single_flight.stats.as_dict() if self.single_flight else {}
+
+    def close(self) -> None:
+        """Close the provider backends of every stage"""
+        with self._backends_lock:
+            backends = list(self._backends.values())
+        for backend in backends:
+            backend.close()
+
+    def fit_input(self, text: str, stage: str = None) -> Tuple[str, CompactionReport]:
+        """
+        Compact a long input to the token budget of a stage
+
+        Repeated page headers, legal boilerplate and publication lists beyond
+        the configured length are dropped first; only then are the longest
+        sections truncated. Tokens are counted for the model serving the stage.
+
+        Args:
+            text: Input text (markdown or plain text)
+            stage: Call stage whose policy may set its own input budget
+
+        Returns:
+            (text to send, report of what was cut)
+        """
+        budget = self.stage_policies.resolve(stage).input_budget or self.input_budget
+        if budget <= 0:
+            return text, CompactionReport(budget=0, original_tokens=0, final_tokens=0)
+        token_budget = TokenBudget(budget, model=self._model_for(stage), max_list_items=self.input_max_list_items)
+        return token_budget.fit(text)
+
     def generate_structured_response(
-        self, 
-        prompt: str, 
+        self,
+        prompt: str,
         response_model: Type[T],
-        system_prompt: str = None
+        system_prompt: str = None,
+        stage: str = None
     ) -> T:
         """
         Generate structured response using Pydantic model
-        
+
+        Args:
+            prompt: User prompt
+            response_model: Pydantic model class for response structure
+            system_prompt: Optional system prompt
+            stage: Pipeline stage label for telemetry
+
+        Returns:
+            Instance of response_model with generated data
+        """
+        key = self._request_key(prompt, response_model, system_prompt, stage=stage)
+        cache_key = key if self.cache is not None else None
+        cached = self._get_cached(cache_key, response_model)
+        if cached is not None:
+            self._record_cache_hit(stage)
+            return cached
+
+        def generate() -> T:
+            request = self._build_structured_request(prompt, response_model, system_prompt, stage=stage)
+            try:
+                completion = self._complete(request, stage=stage, kind="structured")
+            except Exception as e:
+                if not self._should_fall_back(request, response_model, e, stage=stage):
+                    raise
+                request = self._build_structured_request(prompt, response_model, system_prompt, stage=stage)
+                completion = self._complete(request, stage=stage, kind="structured")
+            result = self._resolve_structured_response(completion, response_model, stage=stage)
+            self._set_cached(cache_key, result)
+            return result
+
+        if self.single_flight is None:
+            return generate()
+        result, shared = self.single_flight.do(key, generate)
+        return self._shared_result(result, stage) if shared else result
+
+    async def agenerate_structured_response(
+        self,
+        prompt: str,
+        response_model: Type[T],
+        system_prompt: str = None,
+        stage: str = None
+    ) -> T:
+        """
+        Async variant of generate_structured_response using the provider's async client
+
         Args:
             prompt: User prompt
             response_model: Pydantic model class for response structure
             system_prompt: Optional system prompt
-            
+            stage: Pipeline stage label for telemetry
+
         Returns:
             Instance of response_model with generated data
         """
-        # Create schema prompt
-        schema = response_model.model_json_schema()
-        schema_prompt = f"""
-You must respond with valid JSON that matches this exact schema:
-{json.dumps(schema, indent=2)}
+        key = self._request_key(prompt, response_model, system_prompt, stage=stage)
+        cache_key = key if self.cache is not None else None
+        cached = self._get_cached(cache_key, response_model)
+        if cached is not None:
+            self._record_cache_hit(stage)
+            return cached
 
-User request: {prompt}
+        async def generate() -> T:
+            request = self._build_structured_request(prompt, response_model, system_prompt, stage=stage)
+            try:
+                completion = await self._acomplete(request, stage=stage, kind="structured")
+            except Exception as e:
+                if not self._should_fall_back(request, response_model, e, stage=stage):
+                    raise
+                request = self._build_structured_request(prompt, response_model, system_prompt, stage=stage)
+                completion = await self._acomplete(request, stage=stage, kind="structured")
+            result = await self._aresolve_structured_response(completion, response_model, stage=stage)
+            self._set_cached(cache_key, result)
+            return result
 
-Respond only with valid JSON, no other text or formatting.
-"""
-        
-        if self.provider == "openai":
-            messages = []
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            messages.append({"role": "user", "content": schema_prompt})
-            
-            response = self.client.chat.completions.create(
-                model=self.config.OPENAI_MODEL,
-                messages=messages,
-                max_tokens=self.config.MAX_TOKENS,
-                temperature=self.config.TEMPERATURE,
-                response_format={"type": "json_object"}
-            )
-            
-            result_text = response.choices[0].message.content
-            # log all output to log.log
-            # with open("log.log", "a") as log_file:
-            #     log_file.write(f"Full Prompt: {schema_prompt}\n")
-            #     log_file.write(f"AI Response: {result_text}\n")
-            
-        elif self.provider == "anthropic":
-            full_prompt = f"{system_prompt}\n\n{schema_prompt}" if system_prompt else schema_prompt
-            
-            response = self.client.messages.create(
-                model=self.config.ANTHROPIC_MODEL,
-                max_tokens=self.config.MAX_TOKENS,
-                temperature=self.config.TEMPERATURE,
-                messages=[{"role": "user", "content": full_prompt}]
-            )
-            
-            result_text = response.content[0].text
-        
+        if self.single_flight is None:
+            return await generate()
+        result, shared = await self.single_flight.ado(key, generate)
+        return self._shared_result(result, stage) if shared else result
+
+    def stream_structured_response(
+        self,
+        prompt: str,
+        response_model: Type[T],
+        system_prompt: str = None,
+        stage: str = None
+    ) -> Iterator[BaseModel]:
+        """
+        Stream a structured response, yielding progressively filled partial objects
+
+        Partial objects are instances of `make_partial_model(response_model)`, in
+        which every field is optional. The last item yielded is the fully
+        validated response_model instance.
+
+        Args:
+            prompt: User prompt
+            response_model: Pydantic model class for response structure
+            system_prompt: Optional system prompt
+            stage: Pipeline stage label for telemetry
+
+        Yields:
+            Partial instances, then the final response_model instance
+        """
+        cache_key = self._structured_cache_key(prompt, response_model, system_prompt, stage=stage)
+        cached = self._get_cached(cache_key, response_model)
+        if cached is not None:
+            self._record_cache_hit(stage)
+            yield cached
+            return
+
+        partial_model = make_partial_model(response_model)
+        request = self._build_structured_request(prompt, response_model, system_prompt, stage=stage)
+        parser = PartialJSONParser()
+        try:
+            for chunk in self._stream(request, stage=stage):
+                partial = self._validate_partial(partial_model, parser.feed(chunk))
+                if partial is not None:
+                    yield partial
+        except Exception as e:
+            if parser.text or not self._should_fall_back(request, response_model, e, stage=stage):
+                raise
+            yield from self.stream_structured_response(prompt, response_model, system_prompt, stage=stage)
+            return
+
+        result = self._resolve_structured_response(
+            Completion(text=parser.text, model=request.model), response_model, stage=stage
+        )
+        self._set_cached(cache_key, result)
+        yield result
+
+    async def astream_structured_response(
+        self,
+        prompt: str,
+        response_model: Type[T],
+        system_prompt: str = None,
+        stage: str = None
+    ) -> AsyncIterator[BaseModel]:
+        """
+        Async variant of stream_structured_response
+
+        Args:
+            prompt: User prompt
+            response_model: Pydantic model class for response structure
+            system_prompt: Optional system prompt
+            stage: Pipeline stage label for telemetry
+
+        Yields:
+            Partial instances, then the final response_model instance
+        """
+        cache_key = self._structured_cache_key(prompt, response_model, system_prompt, stage=stage)
+        cached = self._get_cached(cache_key, response_model)
+        if cached is not None:
+            self._record_cache_hit(stage)
+            yield cached
+            return
+
+        partial_model = make_partial_model(response_model)
+        request = self._build_structured_request(prompt, response_model, system_prompt, stage=stage)
+        parser = PartialJSONParser()
         try:
-            # Parse JSON and create Pydantic model instance
-            result_data = json.loads(result_text)
-            return response_model(**result_data)
-        except (json.JSONDecodeError, Exception) as e:
-            raise ValueError(f"Failed to parse AI response as valid JSON for {response_model.__name__}: {e}")
-    
-    def generate_text_response(self, prompt: str, system_prompt: str = None) -> str:
+            async for chunk in self._astream(request, stage=stage):
+                partial = self._validate_partial(partial_model, parser.feed(chunk))
+                if partial is not None:
+                    yield partial
+        except Exception as e:
+            if parser.text or not self._should_fall_back(request, response_model, e, stage=stage):
+                raise
+            async for item in self.astream_structured_response(prompt, response_model, system_prompt, stage=stage):
+                yield item
+            return
+
+        result = await self._aresolve_structured_response(
+            Completion(text=parser.text, model=request.model), response_model, stage=stage
+        )
+        self._set_cached(cache_key, result)
+        yield result
+
+    def generate_text_response(self, prompt: str, system_prompt: str = None, stage: str = None) -> str:
         """
         Generate simple text response
-        
+
         Args:
             prompt: User prompt
             system_prompt: Optional system prompt
-            
+            stage: Pipeline stage label for telemetry
+
         Returns:
             Generated text response
         """
-        if self.provider == "openai":
-            messages = []
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            messages.append({"role": "user", "content": prompt})
-            
-            response = self.client.chat.completions.create(
-                model=self.config.OPENAI_MODEL,
-                messages=messages,
-                max_tokens=self.config.MAX_TOKENS,
-                temperature=self.config.TEMPERATURE
+        return self._complete(self._build_text_request(prompt, system_prompt, stage=stage), stage=stage).text
+
+    async def agenerate_text_response(self, prompt: str, system_prompt: str = None, stage: str = None) -> str:
+        """
+        Async variant of generate_text_response using the provider's async client
+
+        Args:
+            prompt: User prompt
+            system_prompt: Optional system prompt
+            stage: Pipeline stage label for telemetry
+
+        Returns:
+            Generated text response
+        """
+        completion = await self._acomplete(self._build_text_request(prompt, system_prompt, stage=stage), stage=stage)
+        return completion.text
+
+    def _complete(self, request: CompletionRequest, stage: str = None, kind: str = "text") -> Completion:
+        """Run a completion request, retrying transient errors with backoff"""
+        attempt = 0
+        while True:
+            try:
+                return self._complete_once(request, stage, kind)
+            except Exception as e:
+                if not self._backend_for(stage).is_transient(e) or not self.retry_policy.should_retry(attempt):
+                    raise
+                time.sleep(self._retry_delay(attempt, e, stage))
+                attempt += 1
+
+    async def _acomplete(self, request: CompletionRequest, stage: str = None, kind: str = "text") -> Completion:
+        """Async variant of _complete"""
+        attempt = 0
+        while True:
+            try:
+                return await self._acomplete_once(request, stage, kind)
+            except Exception as e:
+                if not self._backend_for(stage).is_transient(e) or not self.retry_policy.should_retry(attempt):
+                    raise
+                await asyncio.sleep(self._retry_delay(attempt, e, stage))
+                attempt += 1
+
+    def _retry_delay(self, attempt: int, error: Exception, stage: str = None) -> float:
+        """Backoff before the next attempt, honoring the provider's retry-after"""
+        retry_after = parse_rate_limit_headers(self._backend_for(stage).error_headers(error)).get("retry_after")
+        return self.retry_policy.delay(attempt, retry_after)
+
+    def _complete_once(self, request: CompletionRequest, stage: str = None, kind: str = "text") -> Completion:
+        """Run a completion request within the rate limiter's budget"""
+        queued = time.monotonic()
+        reservation = None
+        if self.rate_limiter is not None:
+            reservation = self.rate_limiter.acquire(
+                self._provider_for(stage), request.model, self._estimate_request_tokens(request)
             )
-            
-            return response.choices[0].message.content
-            
-        elif self.provider == "anthropic":
-            full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
-            
-            response = self.client.messages.create(
-                model=self.config.ANTHROPIC_MODEL,
-                max_tokens=self.config.MAX_TOKENS,
-                temperature=self.config.TEMPERATURE,
-                messages=[{"role": "user", "content": full_prompt}]
+        started = time.monotonic()
+        try:
+            completion = self._backend_for(stage).complete(request)
+        except Exception as e:
+            self._release_on_error(reservation, e, stage)
+            self._record_call(request, stage, kind, started - queued, time.monotonic() - started, error=e)
+            raise
+        self._release(reservation, completion)
+        self._record_call(request, stage, kind, started - queued, time.monotonic() - started, completion=completion)
+        return completion
+
+    async def _acomplete_once(self, request: CompletionRequest, stage: str = None, kind: str = "text") -> Completion:
+        """Async variant of _complete_once"""
+        queued = time.monotonic()
+        reservation = None
+        if self.rate_limiter is not None:
+            reservation = await self.rate_limiter.aacquire(
+                self._provider_for(stage), request.model, self._estimate_request_tokens(request)
+            )
+        started = time.monotonic()
+        try:
+            completion = await self._backend_for(stage).acomplete(request)
+        except Exception as e:
+            self._release_on_error(reservation, e, stage)
+            self._record_call(request, stage, kind, started - queued, time.monotonic() - started, error=e)
+            raise
+        self._release(reservation, completion)
+        self._record_call(request, stage, kind, started - queued, time.monotonic() - started, completion=completion)
+        return completion
+
+    def _stream(self, request: CompletionRequest, stage: str = None) -> Iterator[str]:
+        """Stream a completion request within the rate limiter's budget"""
+        queued = time.monotonic()
+        reservation = None
+        if self.rate_limiter is not None:
+            reservation = self.rate_limiter.acquire(
+                self._provider_for(stage), request.model, self._estimate_request_tokens(request)
             )
-            
-            return response.content[0].text
+        started = time.monotonic()
+        first_token_at = None
+        streamed = []
+        failed = False
+        try:
+            for chunk in self._backend_for(stage).stream(request):
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                streamed.append(chunk)
+                yield chunk
+        except Exception as e:
+            failed = True
+            self._release_on_error(reservation, e, stage)
+            self._record_call(request, stage, "stream", started - queued, time.monotonic() - started, error=e)
+            raise
+        finally:
+            if not failed:
+                self._finish_stream(request, stage, reservation, streamed, started - queued, started, first_token_at)
+
+    async def _astream(self, request: CompletionRequest, stage: str = None) -> AsyncIterator[str]:
+        """Async variant of _stream"""
+        queued = time.monotonic()
+        reservation = None
+        if self.rate_limiter is not None:
+            reservation = await self.rate_limiter.aacquire(
+                self._provider_for(stage), request.model, self._estimate_request_tokens(request)
+            )
+        started = time.monotonic()
+        first_token_at = None
+        streamed = []
+        failed = False
+        try:
+            async for chunk in self._backend_for(stage).astream(request):
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                streamed.append(chunk)
+                yield chunk
+        except Exception as e:
+            failed = True
+            self._release_on_error(reservation, e, stage)
+            self._record_call(request, stage, "stream", started - queued, time.monotonic() - started, error=e)
+            raise
+        finally:
+            if not failed:
+                self._finish_stream(request, stage, reservation, streamed, started - queued, started, first_token_at)
+
+    def _finish_stream(
+        self,
+        request: CompletionRequest,
+        stage: Optional[str],
+        reservation,
+        streamed: List[str],
+        queue_time: float,
+        started: float,
+        first_token_at: Optional[float]
+    ) -> None:
+        """Settle and record a finished (or abandoned) stream"""
+        # Streams carry no usage; estimate what was sent and received
+        completion_tokens = estimate_tokens("".join(streamed))
+        prompt_tokens = self._estimate_request_tokens(request, completion_tokens=0)
+        if reservation is not None:
+            self.rate_limiter.release(reservation, used_tokens=prompt_tokens + completion_tokens)
+        completion = Completion(
+            text="", model=request.model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+        )
+        self._record_call(
+            request, stage, "stream", queue_time, time.monotonic() - started, completion=completion,
+            time_to_first_token=first_token_at - started if first_token_at is not None else None
+        )
+
+    def _release(self, reservation, completion: Completion) -> None:
+        """Settle a reservation with the usage the provider reported"""
+        if reservation is None:
+            return
+        self.rate_limiter.release(
+            reservation,
+            used_tokens=completion.prompt_tokens + completion.completion_tokens,
+            headers=completion.headers
+        )
+
+    def _release_on_error(self, reservation, error: Exception, stage: str = None) -> None:
+        """Settle a reservation for a failed call, backing off on 429s"""
+        if reservation is None:
+            return
+        backend = self._backend_for(stage)
+        self.rate_limiter.release(
+            reservation,
+            headers=backend.error_headers(error),
+            rate_limited=backend.is_rate_limited(error)
+        )
+
+    def _record_call(
+        self,
+        request: CompletionRequest,
+        stage: Optional[str],
+        kind: str,
+        queue_time: float,
+        latency: float,
+        completion: Completion = None,
+        error: Exception = None,
+        time_to_first_token: Optional[float] = None
+    ) -> None:
+        """Emit the telemetry record of one provider call"""
+        record = CallRecord(
+            stage=stage,
+            provider=self._provider_for(stage),
+            model=completion.model if completion and completion.model else request.model,
+            kind=kind,
+            queue_time=queue_time,
+            latency=latency,
+            time_to_first_token=time_to_first_token,
+            error=f"{type(error).__name__}: {error}" if error else None
+        )
+        if completion is not None:
+            record.prompt_tokens = completion.prompt_tokens
+            record.completion_tokens = completion.completion_tokens
+            record.cached_tokens = completion.cached_tokens
+            record.cost = estimate_cost(
+                record.model, completion.prompt_tokens, completion.completion_tokens, completion.cached_tokens
+            )
+        self.telemetry.emit(record)
+
+    def _shared_result(self, result: T, stage: Optional[str]) -> T:
+        """Record a call answered by an identical in-flight call and hand out a private copy"""
+        self.telemetry.emit(CallRecord(
+            stage=stage, provider=self._provider_for(stage), model=self._model_for(stage),
+            kind="structured", deduplicated=True
+        ))
+        return result.model_copy(deep=True)
+
+    def _record_cache_hit(self, stage: Optional[str]) -> None:
+        """Emit the telemetry record of a call answered by the response cache"""
+        self.telemetry.emit(CallRecord(
+            stage=stage, provider=self._provider_for(stage), model=self._model_for(stage),
+            kind="structured", cache_hit=True
+        ))
+
+    def _estimate_request_tokens(self, request: CompletionRequest, completion_tokens: Optional[int] = None) -> int:
+        """
+        Estimate the tokens a request counts against the provider's budget
+
+        Providers reserve max_tokens for the completion until it finishes, so
+        that is the estimate unless the real completion size is known.
+        """
+        prompt_tokens = estimate_tokens(request.prompt)
+        prompt_tokens += sum(estimate_tokens(block) for block in static_blocks(request))
+        if request.response_schema is not None:
+            prompt_tokens += estimate_tokens(json.dumps(request.response_schema))
+        return prompt_tokens + (request.max_tokens if completion_tokens is None else completion_tokens)
+
+    def _structured_cache_key(
+        self,
+        prompt: str,
+        response_model: Type[BaseModel],
+        system_prompt: str = None,
+        stage: str = None
+    ) -> Optional[str]:
+        """Cache key for a structured request, or None when caching is off"""
+        if self.cache is None:
+            return None
+        return self._request_key(prompt, response_model, system_prompt, stage=stage)
+
+    def _request_key(
+        self,
+        prompt: str,
+        response_model: Type[BaseModel],
+        system_prompt: str = None,
+        stage: str = None
+    ) -> str:
+        """Identity of a structured request, shared by the response cache and single-flight"""
+        return make_cache_key(
+            provider=self._provider_for(stage),
+            model=self._model_for(stage),
+            system_prompt=system_prompt,
+            prompt=prompt,
+            schema=self.schemas.get(response_model).fingerprint,
+            temperature=self._temperature_for(stage)
+        )
+
+    def _get_cached(self, cache_key: Optional[str], response_model: Type[T]) -> Optional[T]:
+        """Validate a cached answer back into response_model"""
+        if cache_key is None:
+            return None
+        cached_text = self.cache.get(cache_key)
+        if cached_text is None:
+            return None
+        try:
+            return response_model.model_validate_json(cached_text)
+        except ValidationError:
+            # Stale entry from an older schema version; refetch
+            self.cache.delete(cache_key)
+            return None
+
+    def _set_cached(self, cache_key: Optional[str], result: BaseModel) -> None:
+        """Store a validated answer"""
+        if cache_key is not None:
+            self.cache.set(cache_key, result.model_dump_json())
+
+    def run_batch(
+        self,
+        requests: List[BatchRequest],
+        poll_interval: float = 30.0,
+        timeout: Optional[float] = None,
+        backend: BaseBatchBackend = None
+    ) -> Dict[str, BatchResult]:
+        """
+        Run requests through the provider's offline batch API and wait for the results
+
+        Cached structured answers are returned without being queued.
+
+        Args:
+            requests: Batch requests with unique custom ids
+            poll_interval: Seconds between status polls
+            timeout: Give up after this many seconds (None waits indefinitely)
+            backend: Batch backend; defaults to the one matching the provider
+
+        Returns:
+            BatchResult per custom id
+        """
+        results: Dict[str, BatchResult] = {}
+        pending: List[BatchRequest] = []
+        for request in requests:
+            cached = None
+            if request.response_model is not None:
+                cache_key = self._structured_cache_key(request.prompt, request.response_model, request.system_prompt)
+                cached = self._get_cached(cache_key, request.response_model)
+            if cached is not None:
+                results[request.custom_id] = BatchResult(custom_id=request.custom_id, result=cached)
+            else:
+                pending.append(request)
+
+        if not pending:
+            return results
+
+        batch_id = self.submit_batch(pending, backend=backend)
+        backend = self._get_batch_backend(backend)
+        started = time.monotonic()
+        while True:
+            state = backend.status(batch_id)
+            if state == BATCH_COMPLETED:
+                break
+            if state == BATCH_FAILED:
+                raise ValueError(f"Batch {batch_id} failed")
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError(f"Batch {batch_id} did not finish within {timeout} seconds")
+            time.sleep(poll_interval)
+
+        results.update(self.collect_batch(batch_id, pending, backend=backend))
+        return results
+
+    def submit_batch(self, requests: List[BatchRequest], backend: BaseBatchBackend = None) -> str:
+        """
+        Queue requests with the batch backend without waiting
+
+        Args:
+            requests: Batch requests with unique custom ids
+            backend: Batch backend; defaults to the one matching the provider
+
+        Returns:
+            Batch id to pass to collect_batch
+        """
+        completion_requests = {
+            request.custom_id: (
+                self._build_structured_request(request.prompt, request.response_model, request.system_prompt)
+                if request.response_model is not None
+                else self._build_text_request(request.prompt, request.system_prompt)
+            )
+            for request in requests
+        }
+        return self._get_batch_backend(backend).submit(completion_requests)
+
+    def collect_batch(
+        self,
+        batch_id: str,
+        requests: List[BatchRequest],
+        backend: BaseBatchBackend = None
+    ) -> Dict[str, BatchResult]:
+        """
+        Map the results of a finished batch back to response models
+
+        Args:
+            batch_id: Id returned by submit_batch
+            requests: The requests that were submitted
+            backend: Batch backend the batch was submitted to
+
+        Returns:
+            BatchResult per custom id
+        """
+        raw_results = self._get_batch_backend(backend).results(batch_id)
+        results: Dict[str, BatchResult] = {}
+        for request in requests:
+            raw = raw_results.get(request.custom_id, "missing from batch results")
+            if isinstance(raw, str):
+                results[request.custom_id] = BatchResult(custom_id=request.custom_id, error=raw)
+                continue
+            if request.response_model is None:
+                results[request.custom_id] = BatchResult(custom_id=request.custom_id, result=raw.text)
+                continue
+            try:
+                parsed = self._parse_structured_response(raw, request.response_model)
+            except ValueError as e:
+                results[request.custom_id] = BatchResult(custom_id=request.custom_id, error=str(e))
+                continue
+            cache_key = self._structured_cache_key(request.prompt, request.response_model, request.system_prompt)
+            self._set_cached(cache_key, parsed)
+            results[request.custom_id] = BatchResult(custom_id=request.custom_id, result=parsed)
+        return results
+
+    def _get_batch_backend(self, backend: BaseBatchBackend = None) -> BaseBatchBackend:
+        """Resolve the batch backend, creating the provider default on first use"""
+        if backend is not None:
+            return backend
+        if self.batch_backend is None:
+            self.batch_backend = create_batch_backend(self.backend)
+        return self.batch_backend
+
+    def _native_schema(self, response_model: Type[BaseModel], stage: str = None) -> Optional[Dict[str, Any]]:
+        """Provider schema for native structured output, or None for the prompt path"""
+        if self.structured_mode != "native" or response_model.__name__ in self.prompt_mode_models:
+            return None
+        return self._backend_for(stage).native_schema(self.schemas.get(response_model))
+
+    def _should_fall_back(
+        self,
+        request: CompletionRequest,
+        response_model: Type[BaseModel],
+        error: Exception,
+        stage: str = None
+    ) -> bool:
+        """
+        Switch response_model to the prompt path when the provider rejects its native schema
+
+        Returns:
+            True if the request should be rebuilt and retried
+        """
+        if request.response_schema is None or not self._backend_for(stage).is_bad_request(error):
+            return False
+        self.prompt_mode_models.add(response_model.__name__)
+        return True
+
+    def _build_structured_request(
+        self,
+        prompt: str,
+        response_model: Type[BaseModel],
+        system_prompt: str = None,
+        stage: str = None
+    ) -> CompletionRequest:
+        """Build the completion request, natively constrained or carrying the schema prompt"""
+        native_schema = self._native_schema(response_model, stage)
+        if native_schema is not None:
+            return CompletionRequest(
+                prompt=prompt,
+                system_prompt=system_prompt,
+                response_schema=native_schema,
+                schema_name=response_model.__name__,
+                **self._request_settings(stage)
+            )
+
+        # The schema block is identical for every request of a model, so it is
+        # sent as static content ahead of the request to hit the prompt cache
+        schema_prompt = f"""
+You must respond with valid JSON that matches this exact schema:
+{self.schemas.get(response_model).text}
+
+Respond only with valid JSON, no other text or formatting.
+"""
+        return CompletionRequest(
+            prompt=f"User request: {prompt}",
+            system_prompt=system_prompt,
+            static_prompt=schema_prompt,
+            schema_name=response_model.__name__,
+            json_mode=True,
+            **self._request_settings(stage)
+        )
+
+    def _build_text_request(self, prompt: str, system_prompt: str = None, stage: str = None) -> CompletionRequest:
+        """Build a plain text completion request"""
+        return CompletionRequest(prompt=prompt, system_prompt=system_prompt, **self._request_settings(stage))
+
+    def _request_settings(self, stage: str = None) -> Dict[str, Any]:
+        """Model and generation settings for a request of the given stage"""
+        policy = self.stage_policies.resolve(stage)
+        return {
+            "model": self._model_for(stage),
+            "max_tokens": policy.max_tokens or self.config.MAX_TOKENS,
+            "temperature": self._temperature_for(stage),
+            "timeout": policy.timeout,
+            "cache_prefix": self.prompt_caching,
+        }
+
+    def _provider_for(self, stage: str = None) -> str:
+        """Provider name serving a stage"""
+        return self.stage_policies.resolve(stage).provider or self.provider
+
+    def _backend_for(self, stage: str = None) -> BaseProvider:
+        """Provider backend serving a stage, created on first use"""
+        provider = self._provider_for(stage)
+        backend = self._backends.get(provider)
+        if backend is None:
+            with self._backends_lock:
+                backend = self._backends.get(provider)
+                if backend is None:
+                    backend = create_provider(provider, self.config)
+                    self._backends[provider] = backend
+        return backend
+
+    def _model_for(self, stage: str = None) -> str:
+        """Model serving a stage"""
+        policy = self.stage_policies.resolve(stage)
+        if policy.model:
+            return policy.model
+        provider = self._provider_for(stage)
+        if provider == self.provider:
+            return self.model
+        return self._backend_for(stage).default_model or (
+            self.config.ANTHROPIC_MODEL if provider == "anthropic" else self.config.OPENAI_MODEL
+        )
+
+    def _temperature_for(self, stage: str = None) -> float:
+        """Sampling temperature of a stage"""
+        temperature = self.stage_policies.resolve(stage).temperature
+        return self.config.TEMPERATURE if temperature is None else temperature
+
+    def _validate_partial(self, partial_model: Type[BaseModel], value: Any) -> Optional[BaseModel]:
+        """Validate a partially parsed value, skipping snapshots that do not fit yet"""
+        if not isinstance(value, dict):
+            return None
+        try:
+            return partial_model.model_validate(value)
+        except ValidationError:
+            return None
+
+    def _parse_structured_response(self, completion: Completion, response_model: Type[T]) -> T:
+        """Validate the completion text against response_model, repairing it locally if needed"""
+        result, errors = self._validate_structured_text(completion.text, response_model)
+        if result is None:
+            raise ValueError(
+                f"Failed to parse AI response as valid JSON for {response_model.__name__}: {'; '.join(errors)}"
+            )
+        return result
+
+    def _resolve_structured_response(self, completion: Completion, response_model: Type[T], stage: str = None) -> T:
+        """Validate the completion, re-asking with only the validation errors if repair fails"""
+        result, errors = self._validate_structured_text(completion.text, response_model)
+        for _ in range(self.reask_attempts):
+            if result is not None:
+                break
+            completion = self._complete(
+                self._build_reask_request(completion.text, errors, response_model, stage), stage=stage, kind="reask"
+            )
+            result, errors = self._validate_structured_text(completion.text, response_model)
+        if result is None:
+            raise ValueError(
+                f"Failed to parse AI response as valid JSON for {response_model.__name__}: {'; '.join(errors)}"
+            )
+        return result
+
+    async def _aresolve_structured_response(
+        self,
+        completion: Completion,
+        response_model: Type[T],
+        stage: str = None
+    ) -> T:
+        """Async variant of _resolve_structured_response"""
+        result, errors = self._validate_structured_text(completion.text, response_model)
+        for _ in range(self.reask_attempts):
+            if result is not None:
+                break
+            completion = await self._acomplete(
+                self._build_reask_request(completion.text, errors, response_model, stage), stage=stage, kind="reask"
+            )
+            result, errors = self._validate_structured_text(completion.text, response_model)
+        if result is None:
+            raise ValueError(
+                f"Failed to parse AI response as valid JSON for {response_model.__name__}: {'; '.join(errors)}"
+            )
+        return result
+
+    def _validate_structured_text(self, text: str, response_model: Type[T]) -> Tuple[Optional[T], List[str]]:
+        """
+        Validate response text, falling back to local JSON repair
+
+        Returns:
+            (validated instance or None, validation errors)
+        """
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            data = repair_json(text)
+            if data is None:
+                return None, [f"response is not valid JSON ({e})"]
+        try:
+            return response_model.model_validate(drop_disallowed_nulls(data, response_model)), []
+        except ValidationError as e:
+            return None, [
+                f"{'.'.join(str(part) for part in error['loc']) or '(root)'}: {error['msg']}"
+                for error in e.errors()
+            ]
+
+    def _build_reask_request(
+        self,
+        previous_text: str,
+        errors: List[str],
+        response_model: Type[BaseModel],
+        stage: str = None
+    ) -> CompletionRequest:
+        """Ask the model to fix its previous answer given only the validation errors"""
+        error_lines = "\n".join(f"- {error}" for error in errors)
+        reask_prompt = f"""
+Your previous response did not match the {response_model.__name__} schema.
+
+Errors:
+{error_lines}
+
+Previous response:
+{previous_text}
+
+Return the corrected JSON only.
+"""
+        return self._build_structured_request(reask_prompt, response_model, stage=stage)
@@ -0,0 +1,250 @@
+"""
+Offline batch execution backends for the AI service
+"""
+import io
+import json
+import os
+import uuid
+from typing import Any, Callable, Dict, Optional, Type
+from pydantic import BaseModel, ConfigDict
+
+from .providers import AnthropicProvider, BaseProvider, Completion, CompletionRequest, OpenAIProvider
+
+
+# Batch states reported by backends
+BATCH_IN_PROGRESS = "in_progress"
+BATCH_COMPLETED = "completed"
+BATCH_FAILED = "failed"
+
+
+class BatchRequest(BaseModel):
+    """One request in an offline batch"""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    custom_id: str
+    prompt: str
+    response_model: Optional[Type[BaseModel]] = None  # None for a plain text response
+    system_prompt: Optional[str] = None
+
+
+class BatchResult(BaseModel):
+    """Outcome of one batch request"""
+    custom_id: str
+    result: Optional[Any] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the request produced a result"""
+        return self.error is None
+
+
+class BaseBatchBackend:
+    """Interface for provider batch APIs"""
+
+    def submit(self, requests: Dict[str, CompletionRequest]) -> str:
+        """
+        Queue completion requests
+
+        Args:
+            requests: Completion requests keyed by custom id
+
+        Returns:
+            Batch id
+        """
+        raise NotImplementedError
+
+    def status(self, batch_id: str) -> str:
+        """Batch state: BATCH_IN_PROGRESS, BATCH_COMPLETED or BATCH_FAILED"""
+        raise NotImplementedError
+
+    def results(self, batch_id: str) -> Dict[str, Any]:
+        """Completions (or error strings) keyed by custom id for a finished batch"""
+        raise NotImplementedError
+
+
+class OpenAIBatchBackend(BaseBatchBackend):
+    """OpenAI Batch API backend (chat completions endpoint)"""
+
+    ENDPOINT = "/v1/chat/completions"
+
+    def __init__(self, provider: OpenAIProvider, completion_window: str = "24h"):
+        self.provider = provider
+        self.client = provider.client
+        self.completion_window = completion_window
+
+    def submit(self, requests: Dict[str, CompletionRequest]) -> str:
+        lines = [
+            json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": self.ENDPOINT,
+                "body": self.provider._build_kwargs(request),
+            })
+            for custom_id, request in requests.items()
+        ]
+        payload = io.BytesIO("\n".join(lines).encode("utf-8"))
+        input_file = self.client.files.create(file=("batch.jsonl", payload), purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=self.ENDPOINT,
+            completion_window=self.completion_window
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        state = self.client.batches.retrieve(batch_id).status
+        if state == "completed":
+            return BATCH_COMPLETED
+        if state in ("failed", "expired", "cancelled"):
+            return BATCH_FAILED
+        return BATCH_IN_PROGRESS
+
+    def results(self, batch_id: str) -> Dict[str, Any]:
+        batch = self.client.batches.retrieve(batch_id)
+        results: Dict[str, Any] = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get("response") or {}
+                body = response.get("body") or {}
+                if entry.get("error") or response.get("status_code") != 200:
+                    results[entry["custom_id"]] = str(entry.get("error") or body.get("error") or "request failed")
+                    continue
+                usage = body.get("usage") or {}
+                results[entry["custom_id"]] = Completion(
+                    text=body["choices"][0]["message"]["content"] or "",
+                    model=body.get("model", ""),
+                    prompt_tokens=usage.get("prompt_tokens", 0),
+                    completion_tokens=usage.get("completion_tokens", 0)
+                )
+        return results
+
+
+class AnthropicBatchBackend(BaseBatchBackend):
+    """Anthropic Message Batches backend"""
+
+    def __init__(self, provider: AnthropicProvider):
+        self.provider = provider
+        self.client = provider.client
+
+    def submit(self, requests: Dict[str, CompletionRequest]) -> str:
+        batch = self.client.messages.batches.create(requests=[
+            {"custom_id": custom_id, "params": self.provider._build_kwargs(request)}
+            for custom_id, request in requests.items()
+        ])
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        batch = self.client.messages.batches.retrieve(batch_id)
+        return BATCH_COMPLETED if batch.processing_status == "ended" else BATCH_IN_PROGRESS
+
+    def results(self, batch_id: str) -> Dict[str, Any]:
+        results: Dict[str, Any] = {}
+        for entry in self.client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                results[entry.custom_id] = self.provider._to_completion(entry.result.message)
+            else:
+                error = getattr(entry.result, "error", None)
+                results[entry.custom_id] = str(error or entry.result.type)
+        return results
+
+
+class LocalBatchBackend(BaseBatchBackend):
+    """
+    File-based stand-in for provider batch APIs
+
+    Each batch is a directory holding `requests.jsonl`; a finished batch also
+    holds `results.jsonl`. Results are produced by `process()`, which runs every
+    request through responder, or by any external worker that writes the
+    results file, so the whole batch flow can be exercised offline.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        responder: Optional[Callable[[CompletionRequest], Completion]] = None,
+        auto_process: bool = True
+    ):
+        """
+        Args:
+            directory: Root directory for batch files
+            responder: Function answering one request (e.g. a provider's complete)
+            auto_process: Process pending batches on the first status poll
+        """
+        self.directory = directory
+        self.responder = responder
+        self.auto_process = auto_process
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, batch_id: str, name: str) -> str:
+        return os.path.join(self.directory, batch_id, name)
+
+    def submit(self, requests: Dict[str, CompletionRequest]) -> str:
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        os.makedirs(os.path.join(self.directory, batch_id))
+        with open(self._path(batch_id, "requests.jsonl"), "w", encoding="utf-8") as file:
+            for custom_id, request in requests.items():
+                file.write(json.dumps({"custom_id": custom_id, "request": request.model_dump()}) + "\n")
+        return batch_id
+
+    def process(self, batch_id: str) -> None:
+        """Answer every request of a batch and write its results file"""
+        if self.responder is None:
+            raise ValueError("LocalBatchBackend needs a responder to process batches")
+
+        lines = []
+        with open(self._path(batch_id, "requests.jsonl"), encoding="utf-8") as file:
+            for line in file:
+                entry = json.loads(line)
+                try:
+                    completion = self.responder(CompletionRequest(**entry["request"]))
+                    lines.append({"custom_id": entry["custom_id"], "completion": completion.model_dump()})
+                except Exception as e:
+                    lines.append({"custom_id": entry["custom_id"], "error": str(e)})
+
+        partial_path = self._path(batch_id, "results.jsonl.part")
+        with open(partial_path, "w", encoding="utf-8") as file:
+            for line in lines:
+                file.write(json.dumps(line) + "\n")
+        os.replace(partial_path, self._path(batch_id, "results.jsonl"))
+
+    def status(self, batch_id: str) -> str:
+        if os.path.exists(self._path(batch_id, "results.jsonl")):
+            return BATCH_COMPLETED
+        if self.auto_process and self.responder is not None:
+            self.process(batch_id)
+            return BATCH_COMPLETED
+        return BATCH_IN_PROGRESS
+
+    def results(self, batch_id: str) -> Dict[str, Any]:
+        results: Dict[str, Any] = {}
+        with open(self._path(batch_id, "results.jsonl"), encoding="utf-8") as file:
+            for line in file:
+                entry = json.loads(line)
+                if "completion" in entry:
+                    results[entry["custom_id"]] = Completion(**entry["completion"])
+                else:
+                    results[entry["custom_id"]] = entry.get("error", "request failed")
+        return results
+
+
+def create_batch_backend(provider: BaseProvider) -> BaseBatchBackend:
+    """
+    Create the batch backend matching a provider
+
+    Args:
+        provider: Provider backend of an AI service
+
+    Returns:
+        Batch backend for the provider
+    """
+    if isinstance(provider, OpenAIProvider):
+        return OpenAIBatchBackend(provider)
+    if isinstance(provider, AnthropicProvider):
+        return AnthropicBatchBackend(provider)
+    raise ValueError(f"Batch execution is not supported for provider: {provider.name}")
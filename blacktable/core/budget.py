@@ -0,0 +1,322 @@
+"""
+Token budgets for long inputs
+
+Resumes and job descriptions are compacted to fit a token budget before
+they are sent. Cuts are made in order of how little they lose:
+
+1. repeated page headers/footers and page markers
+2. legal boilerplate (EEO statements, privacy notices, declarations)
+3. publication-style lists beyond the first N entries
+4. proportional truncation of the longest sections, keeping every heading
+
+Every cut is listed in a CompactionReport.
+"""
+import re
+from typing import Dict, List, Optional, Set, Tuple
+from pydantic import BaseModel
+
+from .tokens import TokenCounter, get_token_counter
+
+
+BOILERPLATE_PATTERNS = [
+    r"equal (employment )?opportunity",
+    r"without regard to (race|age|sex|gender|religion)",
+    r"reasonable accommodations?",
+    r"e-verify",
+    r"affirmative action",
+    r"privacy (notice|policy|statement)",
+    r"consent to the (processing|use) of (my )?personal data",
+    r"\bgdpr\b",
+    r"i hereby (declare|certify)",
+    r"references (are )?available (up)?on request",
+    r"this (e-?mail|document) (is|may be) confidential",
+]
+BOILERPLATE_HEADINGS = re.compile(
+    r"^(declaration|references|eeo( statement)?|equal opportunity( employer)?|privacy( notice)?|disclaimer)$",
+    re.IGNORECASE
+)
+LIST_HEADINGS = re.compile(
+    r"(publications?|papers|selected works|presentations|talks|conference|posters|patents|citations)",
+    re.IGNORECASE
+)
+SECTION_KEYWORDS = re.compile(
+    r"^(summary|profile|objective|experience|work experience|employment|education|skills|projects|"
+    r"certifications?|awards|achievements|languages|interests|volunteer(ing)?|responsibilities|"
+    r"requirements|qualifications|benefits|about (us|the role|the company)|what you.ll do|"
+    r"references|declaration|publications?|presentations|talks|patents)\s*:?$",
+    re.IGNORECASE
+)
+PAGE_MARKER = re.compile(r"^(page \d+( of \d+)?|\d+\s*/\s*\d+|<!--\s*(image|page ?break)\s*-->)$", re.IGNORECASE)
+LIST_ITEM = re.compile(r"^\s*([-*•]|\d+[.)]|\[\d+\])\s+")
+_boilerplate = re.compile("|".join(BOILERPLATE_PATTERNS), re.IGNORECASE)
+
+TRUNCATION_MARKER = "[... truncated to fit the token budget]"
+
+
+class Cut(BaseModel):
+    """One piece of content removed from an input"""
+    reason: str  # "duplicate", "page_marker", "boilerplate", "list_items" or "truncated"
+    section: Optional[str] = None
+    tokens: int
+    detail: Optional[str] = None
+
+
+class CompactionReport(BaseModel):
+    """What compaction did to one input"""
+    budget: int
+    original_tokens: int
+    final_tokens: int
+    exact: bool = False  # counted with the model's real tokenizer
+    cuts: List[Cut] = []
+
+    @property
+    def compacted(self) -> bool:
+        """Whether anything was removed"""
+        return bool(self.cuts)
+
+    def summary(self) -> str:
+        """One-line description of the cuts"""
+        if not self.cuts:
+            return f"{self.original_tokens} tokens, within budget"
+        removed = {}
+        for cut in self.cuts:
+            removed[cut.reason] = removed.get(cut.reason, 0) + cut.tokens
+        parts = ", ".join(f"{reason} -{tokens}" for reason, tokens in removed.items())
+        return f"{self.original_tokens} -> {self.final_tokens} tokens (budget {self.budget}): {parts}"
+
+
+class _Section:
+    """A heading and the lines below it"""
+
+    def __init__(self, heading: Optional[str]):
+        self.heading = heading
+        self.lines: List[str] = []
+
+    @property
+    def title(self) -> Optional[str]:
+        if self.heading is None:
+            return None
+        return self.heading.lstrip("#").strip().rstrip(":").strip()
+
+
+class TokenBudget:
+    """Compacts text to a token budget, section by section"""
+
+    def __init__(self, max_tokens: int, model: Optional[str] = None, max_list_items: int = 10):
+        """
+        Args:
+            max_tokens: Token budget for the text
+            model: Model whose tokenizer counts the text
+            max_list_items: Entries kept in publication-style lists once over budget
+        """
+        if max_tokens <= 0:
+            raise ValueError("Token budget must be positive")
+        self.max_tokens = max_tokens
+        self.counter: TokenCounter = get_token_counter(model)
+        self.max_list_items = max_list_items
+
+    def fit(self, text: str) -> Tuple[str, CompactionReport]:
+        """
+        Compact text to the budget
+
+        Text within the budget is returned unchanged.
+
+        Args:
+            text: Markdown or plain text
+
+        Returns:
+            (compacted text, report of what was cut)
+        """
+        original = self.counter.count(text)
+        report = CompactionReport(
+            budget=self.max_tokens, original_tokens=original, final_tokens=original, exact=self.counter.exact
+        )
+        if original <= self.max_tokens:
+            return text, report
+
+        sections = self._split(text)
+        steps = [self._drop_repeated_lines, self._drop_boilerplate, self._cap_lists, self._truncate]
+        for step in steps:
+            step(sections, report)
+            compacted = self._join(sections)
+            if self.counter.count(compacted) <= self.max_tokens:
+                break
+
+        report.final_tokens = self.counter.count(compacted)
+        return compacted, report
+
+    def _split(self, text: str) -> List[_Section]:
+        sections = [_Section(None)]
+        for line in text.splitlines():
+            stripped = line.strip()
+            if stripped.startswith("#") or (len(stripped) < 60 and SECTION_KEYWORDS.match(stripped)):
+                sections.append(_Section(line))
+            else:
+                sections[-1].lines.append(line)
+        return [section for section in sections if section.heading is not None or section.lines]
+
+    def _join(self, sections: List[_Section]) -> str:
+        lines: List[str] = []
+        for section in sections:
+            if section.heading is not None:
+                lines.extend(["", section.heading, ""])
+            lines.extend(section.lines)
+        return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip() + "\n"
+
+    def _drop_repeated_lines(self, sections: List[_Section], report: CompactionReport) -> None:
+        """
+        Drop page furniture: page markers, section headings repeated on a new
+        page and running headers/footers
+
+        A running header or footer is a short line found at the edge of at
+        least two pages; its later copies at page edges are dropped. Lines
+        repeated elsewhere, such as the same role title in two jobs, are kept.
+        """
+        seen_headings = set()
+        kept_sections = []
+        for section in sections:
+            key = (section.title or "").lower()
+            if section.heading is not None and key in seen_headings:
+                # A section heading repeated on a new page: merge its lines into the first occurrence
+                report.cuts.append(Cut(
+                    reason="duplicate", section=section.title, tokens=self.counter.count(section.heading)
+                ))
+                first = next(kept for kept in kept_sections if (kept.title or "").lower() == key)
+                first.lines.extend(section.lines)
+                continue
+            if section.title and SECTION_KEYWORDS.match(section.title):
+                seen_headings.add(key)
+            kept_sections.append(section)
+        sections[:] = kept_sections
+
+        furniture = self._running_lines(sections)
+        seen_lines = set()
+        for section_index, section in enumerate(sections):
+            kept = []
+            for line_index, line in enumerate(section.lines):
+                stripped = line.strip()
+                if PAGE_MARKER.match(stripped):
+                    report.cuts.append(Cut(
+                        reason="page_marker", section=section.title, tokens=self.counter.count(line)
+                    ))
+                    continue
+                if (section_index, line_index) in furniture and stripped in seen_lines:
+                    report.cuts.append(Cut(reason="duplicate", section=section.title, tokens=self.counter.count(line)))
+                    continue
+                seen_lines.add(stripped)
+                kept.append(line)
+            section.lines = kept
+
+    def _running_lines(self, sections: List[_Section], edge: int = 2) -> Set[Tuple[int, int]]:
+        """
+        Positions (section index, line index) of running headers and footers
+
+        Pages are separated by page markers; the first and last `edge`
+        non-empty lines of each page are its edges.
+        """
+        pages: List[List[Optional[Tuple[int, int]]]] = [[]]
+        for section_index, section in enumerate(sections):
+            if section.heading is not None:
+                pages[-1].append(None)
+            for line_index, line in enumerate(section.lines):
+                stripped = line.strip()
+                if PAGE_MARKER.match(stripped):
+                    pages.append([])
+                elif stripped:
+                    pages[-1].append((section_index, line_index))
+
+        edges: Dict[str, Dict[int, Tuple[int, int]]] = {}
+        for page_number, page in enumerate(pages):
+            for position in page[:edge] + page[-edge:]:
+                if position is None:
+                    continue
+                stripped = sections[position[0]].lines[position[1]].strip()
+                if len(stripped) <= 80 and not LIST_ITEM.match(stripped):
+                    edges.setdefault(stripped, {})[page_number] = position
+        return {position for by_page in edges.values() if len(by_page) > 1 for position in by_page.values()}
+
+    def _drop_boilerplate(self, sections: List[_Section], report: CompactionReport) -> None:
+        """Drop legal boilerplate sections and paragraphs"""
+        kept_sections = []
+        for section in sections:
+            if section.title and BOILERPLATE_HEADINGS.match(section.title):
+                report.cuts.append(Cut(
+                    reason="boilerplate", section=section.title, tokens=self._tokens(section), detail="section"
+                ))
+                continue
+            kept = []
+            for paragraph in self._paragraphs(section.lines):
+                if _boilerplate.search(" ".join(paragraph)):
+                    report.cuts.append(Cut(
+                        reason="boilerplate", section=section.title,
+                        tokens=self.counter.count("\n".join(paragraph)), detail=paragraph[0].strip()[:60]
+                    ))
+                    continue
+                kept.extend(paragraph + [""])
+            section.lines = kept
+            kept_sections.append(section)
+        sections[:] = kept_sections
+
+    def _cap_lists(self, sections: List[_Section], report: CompactionReport) -> None:
+        """Keep the first entries of publication-style lists"""
+        for section in sections:
+            if not section.title or not LIST_HEADINGS.search(section.title):
+                continue
+            entries = [line for line in section.lines if line.strip()]
+            if len(entries) <= self.max_list_items:
+                continue
+            dropped = entries[self.max_list_items:]
+            section.lines = entries[:self.max_list_items] + [f"- ... {len(dropped)} more entries omitted"]
+            report.cuts.append(Cut(
+                reason="list_items", section=section.title,
+                tokens=self.counter.count("\n".join(dropped)), detail=f"{len(dropped)} entries"
+            ))
+
+    def _truncate(self, sections: List[_Section], report: CompactionReport) -> None:
+        """Shorten the longest sections so that every section keeps a fair share of the budget"""
+        marker_tokens = self.counter.count(TRUNCATION_MARKER) + 1
+        heading_tokens = sum(self.counter.count(section.heading or "") + 1 for section in sections)
+        body_budget = max(0, self.max_tokens - heading_tokens - marker_tokens * len(sections))
+        sizes = [self.counter.count("\n".join(section.lines)) for section in sections]
+
+        # Water-filling: the largest cap at which all bodies fit
+        cap = body_budget
+        remaining = body_budget
+        for index, size in enumerate(sorted(sizes)):
+            share = remaining / (len(sizes) - index)
+            if size <= share:
+                remaining -= size
+            else:
+                cap = int(share)
+                break
+        else:
+            return
+
+        for section, size in zip(sections, sizes):
+            if size <= cap:
+                continue
+            kept, used = [], 0
+            for line in section.lines:
+                tokens = self.counter.count(line) + 1
+                if used + tokens > cap:
+                    break
+                kept.append(line)
+                used += tokens
+            section.lines = kept + [TRUNCATION_MARKER]
+            report.cuts.append(Cut(reason="truncated", section=section.title, tokens=size - used))
+
+    def _paragraphs(self, lines: List[str]) -> List[List[str]]:
+        paragraphs: List[List[str]] = []
+        current: List[str] = []
+        for line in lines:
+            if line.strip():
+                current.append(line)
+            elif current:
+                paragraphs.append(current)
+                current = []
+        if current:
+            paragraphs.append(current)
+        return paragraphs
+
+    def _tokens(self, section: _Section) -> int:
+        return self.counter.count("\n".join([section.heading or ""] + section.lines))
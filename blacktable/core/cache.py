@@ -0,0 +1,274 @@
+"""
+Content-addressed response cache for the AI service
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+def make_cache_key(
+    provider: str,
+    model: str,
+    system_prompt: Optional[str],
+    prompt: str,
+    schema: Optional[Any],
+    temperature: float
+) -> str:
+    """
+    Hash the inputs that determine an AI response
+
+    Args:
+        provider: AI provider name
+        model: Model name
+        system_prompt: Optional system prompt
+        prompt: User prompt
+        schema: JSON schema of the response model, or its fingerprint (None for text responses)
+        temperature: Sampling temperature
+
+    Returns:
+        Hex SHA-256 digest identifying the request
+    """
+    payload = json.dumps(
+        {
+            "provider": provider,
+            "model": model,
+            "system_prompt": system_prompt,
+            "prompt": prompt,
+            "schema": schema,
+            "temperature": temperature,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CacheStats:
+    """Hit/miss counters for a cache"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        """Counters as a plain dict"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+
+class BaseCache:
+    """Interface for response cache backends"""
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response text for key, or None"""
+        raise NotImplementedError
+
+    def set(self, key: str, value: str) -> None:
+        """Store response text under key"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """Drop key from the cache"""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        raise NotImplementedError
+
+
+class MemoryCache(BaseCache):
+    """In-process LRU cache with size and TTL eviction"""
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = 3600):
+        """
+        Args:
+            max_entries: Maximum number of entries kept before evicting the least recently used
+            ttl: Seconds an entry stays valid (None for no expiry)
+        """
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+
+            value, stored_at = entry
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                self.stats.evictions += 1
+                self.stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            self.stats.writes += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache(BaseCache):
+    """Persistent cache stored in a SQLite database"""
+
+    def __init__(self, path: str, ttl: Optional[float] = 7 * 24 * 3600):
+        """
+        Args:
+            path: Database file path (created if missing)
+            ttl: Seconds an entry stays valid (None for no expiry)
+        """
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+
+            value, created_at = row
+            if self.ttl is not None and time.time() - created_at > self.ttl:
+                with self._conn:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.stats.evictions += 1
+                self.stats.misses += 1
+                return None
+
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time())
+            )
+            self.stats.writes += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        """Close the database connection"""
+        self._conn.close()
+
+
+class TieredCache(BaseCache):
+    """Cache that checks tiers in order and back-fills faster tiers on a hit"""
+
+    def __init__(self, tiers: List[BaseCache]):
+        """
+        Args:
+            tiers: Caches ordered fastest first (e.g. memory, then SQLite)
+        """
+        super().__init__()
+        self.tiers = tiers
+
+    def get(self, key: str) -> Optional[str]:
+        for index, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster_tier in self.tiers[:index]:
+                    faster_tier.set(key, value)
+                self.stats.hits += 1
+                return value
+        self.stats.misses += 1
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        for tier in self.tiers:
+            tier.set(key, value)
+        self.stats.writes += 1
+
+    def delete(self, key: str) -> None:
+        for tier in self.tiers:
+            tier.delete(key)
+
+    def clear(self) -> None:
+        for tier in self.tiers:
+            tier.clear()
+
+
+def create_cache(backend: str, sqlite_path: str = None, max_entries: int = 1024, ttl: Optional[float] = 3600) -> Optional[BaseCache]:
+    """
+    Build a cache from a backend name
+
+    Args:
+        backend: "memory", "sqlite", "tiered" (memory in front of SQLite) or "none"
+        sqlite_path: Database path for the SQLite tier
+        max_entries: Size bound for the memory tier
+        ttl: Entry lifetime in seconds for the memory tier
+
+    Returns:
+        Cache instance, or None when caching is disabled
+    """
+    if backend in (None, "", "none", "off"):
+        return None
+    if backend == "memory":
+        return MemoryCache(max_entries=max_entries, ttl=ttl)
+    if backend == "sqlite":
+        return SQLiteCache(sqlite_path)
+    if backend == "tiered":
+        return TieredCache([MemoryCache(max_entries=max_entries, ttl=ttl), SQLiteCache(sqlite_path)])
+    raise ValueError(f"Unsupported cache backend: {backend}")
@@ -0,0 +1,124 @@
+"""
+Process-wide registry of AI services and provider HTTP clients
+"""
+import asyncio
+import threading
+import weakref
+from typing import Dict, TYPE_CHECKING
+import httpx
+
+from .config import AIConfig
+
+if TYPE_CHECKING:
+    from .ai_service import AIService
+
+
+_lock = threading.RLock()
+_http_clients: Dict[str, httpx.Client] = {}
+# Async clients hold connections bound to an event loop, so they are kept per loop
+_async_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+_ai_services: Dict[str, "AIService"] = {}
+
+
+def _http2_available() -> bool:
+    """Whether the optional h2 package needed for HTTP/2 is installed"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _client_options(config: AIConfig) -> dict:
+    """Keyword arguments shared by the sync and async HTTP clients"""
+    return {
+        "http2": config.get_http2() and _http2_available(),
+        "limits": httpx.Limits(
+            max_connections=config.get_http_max_connections(),
+            max_keepalive_connections=config.get_http_max_keepalive_connections(),
+            keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY
+        ),
+    }
+
+
+def get_http_client(provider: str) -> httpx.Client:
+    """
+    Get the shared blocking HTTP client for a provider
+
+    Args:
+        provider: AI provider ("openai" or "anthropic")
+
+    Returns:
+        Keep-alive HTTP client reused by every service of the provider
+    """
+    with _lock:
+        client = _http_clients.get(provider)
+        if client is None or client.is_closed:
+            client = httpx.Client(**_client_options(AIConfig()))
+            _http_clients[provider] = client
+        return client
+
+
+def get_async_http_client(provider: str) -> httpx.AsyncClient:
+    """
+    Get the shared async HTTP client for a provider on the running event loop
+
+    Args:
+        provider: AI provider ("openai" or "anthropic")
+
+    Returns:
+        Keep-alive async HTTP client reused by every service of the provider
+
+    Raises:
+        RuntimeError: When called outside a running event loop, where a client
+            could be neither shared nor closed
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        raise RuntimeError("Async HTTP clients can only be created inside a running event loop") from None
+
+    with _lock:
+        clients = _async_http_clients.setdefault(loop, {})
+        client = clients.get(provider)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(**_client_options(AIConfig()))
+            clients[provider] = client
+        return client
+
+
+def get_ai_service(provider: str = "openai") -> "AIService":
+    """
+    Get the process-wide AI service for a provider
+
+    Components share this service by default, so they also share its
+    response cache, schema registry and connection pool.
+
+    Args:
+        provider: AI provider ("openai" or "anthropic")
+
+    Returns:
+        Shared AIService instance
+    """
+    from .ai_service import AIService
+
+    with _lock:
+        service = _ai_services.get(provider)
+        if service is None:
+            service = AIService(provider=provider)
+            _ai_services[provider] = service
+        return service
+
+
+def reset_clients() -> None:
+    """Close the shared services and blocking HTTP clients and forget them"""
+    with _lock:
+        for service in _ai_services.values():
+            service.close()
+        for client in _http_clients.values():
+            client.close()
+        _http_clients.clear()
+        _async_http_clients.clear()
+        _ai_services.clear()
@@ -2,7 +2,7 @@
 Core configuration for BlackTable
 """
 import os
-from typing import Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 
 class AIConfig:
@@ -11,13 +11,334 @@ class AIConfig:
     ANTHROPIC_MODEL = "claude-3-sonnet"
     MAX_TOKENS = 4000
     TEMPERATURE = 0.1
-    
+
+    # Per-stage provider/model policies (see stages.py); empty uses the settings above everywhere
+    STAGES_FILE = None
+
+    # Token budget for long inputs (resume markdown, job descriptions); longer inputs are compacted
+    INPUT_TOKEN_BUDGET = 12000
+    INPUT_MAX_LIST_ITEMS = 10
+
+    # Structured output: "native" (json_schema / tool use) or "prompt" (schema in prompt)
+    STRUCTURED_MODE = "native"
+
+    # Response cache
+    CACHE_BACKEND = "memory"
+    CACHE_PATH = ".blacktable_cache/responses.sqlite3"
+    CACHE_MAX_ENTRIES = 1024
+    CACHE_TTL = 3600
+
+    # Coalesce identical structured requests while one of them is in flight
+    SINGLE_FLIGHT = True
+
+    # Mark static prompt prefixes (system prompt, schema) for provider-side prompt caching
+    PROMPT_CACHING = True
+
+    # Shared HTTP connection pool (one per provider)
+    HTTP2 = True
+    HTTP_MAX_CONNECTIONS = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+    HTTP_KEEPALIVE_EXPIRY = 30.0
+
+    # Retries of transient provider errors and re-asks for invalid structured output
+    RETRY_MAX_ATTEMPTS = 3
+    RETRY_BASE_DELAY = 0.5
+    RETRY_MAX_DELAY = 8.0
+    REASK_ATTEMPTS = 1
+
+    # Routing across providers ("router" provider)
+    HEDGE_PERCENTILE = 0.95
+    HEDGE_DELAY = 10.0
+    HEDGE_MIN_SAMPLES = 20
+
+    # Record/replay provider ("replay"): mode "record", "replay" or "fake"
+    REPLAY_MODE = "replay"
+    REPLAY_CASSETTE = ".blacktable_cache/cassette.jsonl"
+    REPLAY_TARGET = "openai"
+    REPLAY_LATENCY = "none"
+    REPLAY_MISS = "error"
+
+    # Per-call telemetry sinks: comma-separated "memory", "jsonl", "prometheus" or "none"
+    TELEMETRY_SINKS = "memory"
+    TELEMETRY_PATH = ".blacktable_cache/telemetry.jsonl"
+
+    # On-disk cache of document conversions keyed by file content and converter settings
+    CONVERSION_CACHE_PATH = ".blacktable_cache/conversions.sqlite3"
+    CONVERSION_CACHE_MAX_MB = 512
+
+    # Read PDF text layers directly and run Docling only when they look unusable
+    PDF_FAST_PATH = True
+
+    # Worker processes converting documents (0 converts in the calling thread)
+    CONVERTER_WORKERS = 0
+    CONVERTER_MAX_TASKS_PER_CHILD = 50
+
+    # Extract resume sections (experience, projects, education, profile) in concurrent calls
+    RESUME_SECTIONED = False
+
+    # Find contact fields and links with regular expressions instead of having the model write them
+    RESUME_PRE_EXTRACT = True
+
+    # Client-side rate limiting
+    RATE_LIMIT_STORE = "memory"
+    RATE_LIMIT_PATH = ".blacktable_cache/rate_limits.sqlite3"
+
     @classmethod
     def get_openai_api_key(cls) -> Optional[str]:
         """Get OpenAI API key from environment"""
         return os.getenv("OPENAI_API_KEY")
-    
+
     @classmethod
     def get_anthropic_api_key(cls) -> Optional[str]:
         """Get Anthropic API key from environment"""
         return os.getenv("ANTHROPIC_API_KEY")
+
+    @classmethod
+    def get_cache_backend(cls) -> str:
+        """Get response cache backend ("memory", "sqlite", "tiered" or "none")"""
+        return os.getenv("BLACKTABLE_CACHE_BACKEND", cls.CACHE_BACKEND)
+
+    @classmethod
+    def get_cache_path(cls) -> str:
+        """Get the SQLite response cache path"""
+        return os.getenv("BLACKTABLE_CACHE_PATH", cls.CACHE_PATH)
+
+    @classmethod
+    def get_conversion_cache_path(cls) -> Optional[str]:
+        """Get the document conversion cache path (empty or "none" disables the cache)"""
+        path = os.getenv("BLACKTABLE_CONVERSION_CACHE", cls.CONVERSION_CACHE_PATH)
+        return None if not path or path.lower() == "none" else path
+
+    @classmethod
+    def get_conversion_cache_max_bytes(cls) -> int:
+        """Get the size bound of the document conversion cache in bytes"""
+        return int(float(os.getenv("BLACKTABLE_CONVERSION_CACHE_MAX_MB", cls.CONVERSION_CACHE_MAX_MB)) * 1024 * 1024)
+
+    @classmethod
+    def get_pdf_fast_path(cls) -> bool:
+        """Whether PDFs with a usable text layer skip Docling"""
+        value = os.getenv("BLACKTABLE_PDF_FAST_PATH")
+        if value is None:
+            return cls.PDF_FAST_PATH
+        return value.strip().lower() in ("1", "true", "yes", "on")
+
+    @classmethod
+    def get_converter_workers(cls) -> int:
+        """Get the number of document converter processes ("auto" uses every CPU)"""
+        value = os.getenv("BLACKTABLE_CONVERTER_WORKERS", str(cls.CONVERTER_WORKERS)).strip().lower()
+        if value == "auto":
+            return os.cpu_count() or 1
+        return int(value)
+
+    @classmethod
+    def get_converter_max_tasks_per_child(cls) -> Optional[int]:
+        """Get the conversions after which a converter process is replaced (0 never replaces)"""
+        value = int(os.getenv("BLACKTABLE_CONVERTER_MAX_TASKS_PER_CHILD", cls.CONVERTER_MAX_TASKS_PER_CHILD))
+        return value or None
+
+    @classmethod
+    def get_resume_sectioned(cls) -> bool:
+        """Whether resumes are extracted section by section in concurrent calls"""
+        value = os.getenv("BLACKTABLE_RESUME_SECTIONED")
+        if value is None:
+            return cls.RESUME_SECTIONED
+        return value.strip().lower() in ("1", "true", "yes", "on")
+
+    @classmethod
+    def get_resume_pre_extract(cls) -> bool:
+        """Whether resume contact fields and links are extracted locally before the model call"""
+        value = os.getenv("BLACKTABLE_RESUME_PRE_EXTRACT")
+        if value is None:
+            return cls.RESUME_PRE_EXTRACT
+        return value.strip().lower() in ("1", "true", "yes", "on")
+
+    @classmethod
+    def get_stages_file(cls) -> Optional[str]:
+        """Get the YAML file with per-stage model policies"""
+        return os.getenv("BLACKTABLE_STAGES_FILE", cls.STAGES_FILE) or None
+
+    @classmethod
+    def get_stage_models(cls) -> Dict[str, Dict[str, Any]]:
+        """
+        Get per-stage model policies from the environment
+
+        BLACKTABLE_STAGES holds comma-separated `stage=provider:model/max_tokens/timeout`
+        entries, where stage may be a dotted prefix and everything after the model is
+        optional, e.g. `fit_score=openai:gpt-4o-mini/1000/20,resume_parser=:gpt-4o`.
+        An empty provider keeps the service's provider.
+        """
+        stages = {}
+        for entry in os.getenv("BLACKTABLE_STAGES", "").split(","):
+            if not entry.strip():
+                continue
+            stage, _, policy = entry.partition("=")
+            target, *limits = policy.strip().split("/")
+            provider, _, model = target.partition(":")
+            max_tokens = limits[0] if len(limits) > 0 else ""
+            timeout = limits[1] if len(limits) > 1 else ""
+            stages[stage.strip()] = {
+                "provider": provider.strip() or None,
+                "model": model.strip() or None,
+                "max_tokens": int(max_tokens) if max_tokens.strip() else None,
+                "timeout": float(timeout) if timeout.strip() else None,
+            }
+        return stages
+
+    @classmethod
+    def get_input_token_budget(cls) -> int:
+        """Get the token budget for long inputs (0 disables compaction)"""
+        return int(os.getenv("BLACKTABLE_INPUT_BUDGET", cls.INPUT_TOKEN_BUDGET))
+
+    @classmethod
+    def get_input_max_list_items(cls) -> int:
+        """Get how many publication-style list entries compaction keeps"""
+        return int(os.getenv("BLACKTABLE_INPUT_MAX_LIST_ITEMS", cls.INPUT_MAX_LIST_ITEMS))
+
+    @classmethod
+    def get_structured_mode(cls) -> str:
+        """Get the structured output mode ("native" or "prompt")"""
+        return os.getenv("BLACKTABLE_STRUCTURED_MODE", cls.STRUCTURED_MODE)
+
+    @classmethod
+    def get_prompt_mode_models(cls) -> Set[str]:
+        """Get response model names that always use the schema-in-prompt path"""
+        names = os.getenv("BLACKTABLE_PROMPT_MODE_MODELS", "")
+        return {name.strip() for name in names.split(",") if name.strip()}
+
+    @classmethod
+    def get_single_flight(cls) -> bool:
+        """Whether identical concurrent structured requests share one provider call"""
+        value = os.getenv("BLACKTABLE_SINGLE_FLIGHT")
+        if value is None:
+            return cls.SINGLE_FLIGHT
+        return value.strip().lower() in ("1", "true", "yes", "on")
+
+    @classmethod
+    def get_prompt_caching(cls) -> bool:
+        """Whether to mark static prompt prefixes for provider-side caching"""
+        value = os.getenv("BLACKTABLE_PROMPT_CACHING")
+        if value is None:
+            return cls.PROMPT_CACHING
+        return value.strip().lower() in ("1", "true", "yes", "on")
+
+    @classmethod
+    def get_http2(cls) -> bool:
+        """Whether to negotiate HTTP/2 with providers (needs the h2 package)"""
+        value = os.getenv("BLACKTABLE_HTTP2")
+        if value is None:
+            return cls.HTTP2
+        return value.strip().lower() in ("1", "true", "yes", "on")
+
+    @classmethod
+    def get_http_max_connections(cls) -> int:
+        """Get the connection pool size per provider"""
+        return int(os.getenv("BLACKTABLE_HTTP_MAX_CONNECTIONS", cls.HTTP_MAX_CONNECTIONS))
+
+    @classmethod
+    def get_http_max_keepalive_connections(cls) -> int:
+        """Get the number of idle connections kept warm per provider"""
+        return int(os.getenv("BLACKTABLE_HTTP_MAX_KEEPALIVE", cls.HTTP_MAX_KEEPALIVE_CONNECTIONS))
+
+    @classmethod
+    def get_rate_limits(cls) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+        """
+        Get configured (rpm, tpm) budgets
+
+        BLACKTABLE_RATE_LIMITS holds comma-separated `key=rpm/tpm` entries, where
+        key is a provider or `provider:model` and either number may be empty,
+        e.g. `openai:gpt-4o=500/30000,anthropic=50/`.
+        """
+        limits = {}
+        for entry in os.getenv("BLACKTABLE_RATE_LIMITS", "").split(","):
+            if not entry.strip():
+                continue
+            key, _, budget = entry.partition("=")
+            rpm, _, tpm = budget.partition("/")
+            limits[key.strip()] = (
+                int(rpm) if rpm.strip() else None,
+                int(tpm) if tpm.strip() else None
+            )
+        return limits
+
+    @classmethod
+    def get_rate_limit_store(cls) -> str:
+        """Get the rate limiter state store ("memory" or "sqlite")"""
+        return os.getenv("BLACKTABLE_RATE_LIMIT_STORE", cls.RATE_LIMIT_STORE)
+
+    @classmethod
+    def get_rate_limit_path(cls) -> str:
+        """Get the SQLite rate limiter state path"""
+        return os.getenv("BLACKTABLE_RATE_LIMIT_PATH", cls.RATE_LIMIT_PATH)
+
+    @classmethod
+    def get_max_concurrency(cls) -> Optional[int]:
+        """Get the most provider calls in flight per model and process (None for no cap)"""
+        value = os.getenv("BLACKTABLE_MAX_CONCURRENCY")
+        return int(value) if value else None
+
+    @classmethod
+    def get_retry_max_attempts(cls) -> int:
+        """Get the attempts per provider call for transient errors"""
+        return int(os.getenv("BLACKTABLE_RETRY_ATTEMPTS", cls.RETRY_MAX_ATTEMPTS))
+
+    @classmethod
+    def get_reask_attempts(cls) -> int:
+        """Get the re-asks allowed when structured output fails validation"""
+        return int(os.getenv("BLACKTABLE_REASK_ATTEMPTS", cls.REASK_ATTEMPTS))
+
+    @classmethod
+    def get_routes(cls) -> List[Tuple[str, str]]:
+        """
+        Get (provider, model) targets of the router provider
+
+        BLACKTABLE_ROUTES holds comma-separated `provider:model` entries in order
+        of preference; a bare provider uses its configured model.
+        """
+        default_models = {"openai": cls.OPENAI_MODEL, "anthropic": cls.ANTHROPIC_MODEL}
+        routes = []
+        for entry in os.getenv("BLACKTABLE_ROUTES", "").split(","):
+            if not entry.strip():
+                continue
+            provider, _, model = entry.strip().partition(":")
+            routes.append((provider, model or default_models.get(provider, "")))
+        return routes
+
+    @classmethod
+    def get_hedge_delay(cls) -> float:
+        """Get the seconds before hedging while latency samples are scarce"""
+        return float(os.getenv("BLACKTABLE_HEDGE_DELAY", cls.HEDGE_DELAY))
+
+    @classmethod
+    def get_replay_mode(cls) -> str:
+        """Get the replay provider mode ("record", "replay" or "fake")"""
+        return os.getenv("BLACKTABLE_REPLAY_MODE", cls.REPLAY_MODE)
+
+    @classmethod
+    def get_replay_cassette(cls) -> str:
+        """Get the cassette file recorded to and replayed from"""
+        return os.getenv("BLACKTABLE_REPLAY_CASSETTE", cls.REPLAY_CASSETTE)
+
+    @classmethod
+    def get_replay_target(cls) -> str:
+        """Get the real provider recorded in record mode"""
+        return os.getenv("BLACKTABLE_REPLAY_TARGET", cls.REPLAY_TARGET)
+
+    @classmethod
+    def get_replay_latency(cls) -> str:
+        """Get the synthetic latency spec, e.g. `lognormal:1.5:0.5` or `recorded`"""
+        return os.getenv("BLACKTABLE_REPLAY_LATENCY", cls.REPLAY_LATENCY)
+
+    @classmethod
+    def get_replay_miss(cls) -> str:
+        """Get what replay does for unrecorded requests ("error" or "fake")"""
+        return os.getenv("BLACKTABLE_REPLAY_MISS", cls.REPLAY_MISS)
+
+    @classmethod
+    def get_telemetry_sinks(cls) -> str:
+        """Get the comma-separated telemetry sink names"""
+        return os.getenv("BLACKTABLE_TELEMETRY", cls.TELEMETRY_SINKS)
+
+    @classmethod
+    def get_telemetry_path(cls) -> str:
+        """Get the JSONL telemetry file path"""
+        return os.getenv("BLACKTABLE_TELEMETRY_PATH", cls.TELEMETRY_PATH)
@@ -0,0 +1,63 @@
+"""
+Local repair of truncated or lightly malformed JSON responses
+"""
+import json
+import re
+from typing import Any, Optional
+
+from .streaming import _close, _scan, parse_partial_json
+
+
+_CODE_FENCE = re.compile(r"```(?:json)?\s*(.*?)\s*(?:```|$)", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+
+
+def _strip_trailing_commas(text: str) -> str:
+    """Remove commas directly before a closing bracket, outside of strings"""
+    result = []
+    last = 0
+    for match in _TRAILING_COMMA.finditer(text):
+        _, in_string, _, _ = _scan(text[:match.start()])
+        if in_string:
+            continue
+        result.append(text[last:match.start()])
+        result.append(match.group(1))
+        last = match.end()
+    result.append(text[last:])
+    return "".join(result)
+
+
+def repair_json(text: str) -> Optional[Any]:
+    """
+    Recover a JSON value from model output that does not parse as-is
+
+    Handles markdown code fences, prose around the document, trailing commas
+    and output cut off mid-document (open strings and brackets are closed, an
+    incomplete trailing member is dropped).
+
+    Args:
+        text: Raw model output
+
+    Returns:
+        Parsed value, or None if nothing usable could be recovered
+    """
+    fenced = _CODE_FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+
+    start = min((index for index in (text.find("{"), text.find("[")) if index >= 0), default=-1)
+    if start < 0:
+        return None
+    text = _strip_trailing_commas(text[start:])
+
+    # Drop trailing prose after a complete document
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text)
+        return value
+    except json.JSONDecodeError:
+        pass
+
+    try:
+        return json.loads(_close(text))
+    except json.JSONDecodeError:
+        return parse_partial_json(text)
@@ -0,0 +1,415 @@
+"""
+Provider backends used by the AI service
+"""
+import json
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, TYPE_CHECKING
+from pydantic import BaseModel
+import httpx
+
+from .clients import get_async_http_client, get_http_client
+from .config import AIConfig
+from .schema import CompiledSchema
+
+if TYPE_CHECKING:
+    import anthropic
+    import openai
+
+
+class CompletionRequest(BaseModel):
+    """Provider-agnostic completion request"""
+    model: str
+    prompt: str
+    system_prompt: Optional[str] = None
+    max_tokens: int = AIConfig.MAX_TOKENS
+    temperature: float = AIConfig.TEMPERATURE
+    json_mode: bool = False
+    # Native structured output: provider-specific schema and its name
+    response_schema: Optional[Dict[str, Any]] = None
+    schema_name: Optional[str] = None
+    # Instructions shared by many requests (e.g. the schema prompt), sent after
+    # the system prompt and ahead of the request-specific prompt
+    static_prompt: Optional[str] = None
+    # Mark the static prefix for provider-side prompt caching
+    cache_prefix: bool = True
+    # Seconds before the provider call is abandoned (None: client default)
+    timeout: Optional[float] = None
+
+
+def static_blocks(request: CompletionRequest) -> List[str]:
+    """System prompt and static instructions, in the order they are sent"""
+    return [block for block in (request.system_prompt, request.static_prompt) if block]
+
+
+class Completion(BaseModel):
+    """Provider-agnostic completion result"""
+    text: str
+    model: str
+    prompt_tokens: int = 0  # all input tokens, including cached ones
+    completion_tokens: int = 0
+    cached_tokens: int = 0  # input tokens served from the provider's prompt cache
+    # Rate-limit headers of the response
+    headers: Dict[str, str] = {}
+
+
+def rate_limit_headers(headers: Any) -> Dict[str, str]:
+    """Keep only the rate-limit related entries of response headers"""
+    if not headers:
+        return {}
+    return {
+        name.lower(): value for name, value in headers.items()
+        if "ratelimit" in name.lower() or name.lower() == "retry-after"
+    }
+
+
+class BaseProvider:
+    """Base class for provider backends"""
+
+    name = "base"
+    # Model to request when the caller has no preference (None: use the configured model)
+    default_model: Optional[str] = None
+
+    def native_schema(self, compiled: CompiledSchema) -> Optional[Dict[str, Any]]:
+        """
+        Schema to send through the provider's native structured-output API
+
+        Returns None when the provider (or this schema) has to fall back to
+        the schema-in-prompt path.
+        """
+        return None
+
+    def is_bad_request(self, error: Exception) -> bool:
+        """Whether error is the provider rejecting the request itself"""
+        return False
+
+    def is_rate_limited(self, error: Exception) -> bool:
+        """Whether error is the provider throttling the caller (HTTP 429)"""
+        return False
+
+    def is_transient(self, error: Exception) -> bool:
+        """Whether retrying the same request may succeed (timeouts, 429s, 5xx)"""
+        return False
+
+    def request_options(self, request: CompletionRequest) -> Dict[str, Any]:
+        """Per-call client options that are not part of the request body"""
+        return {"timeout": request.timeout} if request.timeout is not None else {}
+
+    def error_headers(self, error: Exception) -> Dict[str, str]:
+        """Rate-limit headers carried by an API error"""
+        response = getattr(error, "response", None)
+        return rate_limit_headers(getattr(response, "headers", None))
+
+    def complete(self, request: CompletionRequest) -> Completion:
+        """Run a blocking completion request"""
+        raise NotImplementedError
+
+    async def acomplete(self, request: CompletionRequest) -> Completion:
+        """Run a completion request on the event loop"""
+        raise NotImplementedError
+
+    def stream(self, request: CompletionRequest) -> Iterator[str]:
+        """Run a blocking completion request, yielding text chunks as they arrive"""
+        raise NotImplementedError
+
+    async def astream(self, request: CompletionRequest) -> AsyncIterator[str]:
+        """Async variant of stream"""
+        raise NotImplementedError
+        yield
+
+    def close(self) -> None:
+        """Release resources the provider holds besides the shared HTTP clients"""
+
+
+class OpenAIProvider(BaseProvider):
+    """OpenAI chat completions backend"""
+
+    name = "openai"
+
+    def __init__(self, api_key: str, http_client: httpx.Client = None):
+        """
+        Args:
+            api_key: Provider API key
+            http_client: HTTP client to send requests through; defaults to the
+                process-wide pool for the provider
+        """
+        # The SDK is imported with the first provider, keeping `import blacktable` light
+        import openai
+
+        self.sdk = openai
+        self.api_key = api_key
+        # Retries are handled by the AI service's retry policy
+        self.client = openai.OpenAI(
+            api_key=api_key, http_client=http_client or get_http_client(self.name), max_retries=0
+        )
+        self._async_client = None
+        self._async_http_client = None
+
+    @property
+    def async_client(self) -> "openai.AsyncOpenAI":
+        """Async client on the shared pool of the running event loop"""
+        http_client = get_async_http_client(self.name)
+        if self._async_client is None or self._async_http_client is not http_client:
+            self._async_client = self.sdk.AsyncOpenAI(api_key=self.api_key, http_client=http_client, max_retries=0)
+            self._async_http_client = http_client
+        return self._async_client
+
+    def native_schema(self, compiled: CompiledSchema) -> Optional[Dict[str, Any]]:
+        return compiled.strict_schema
+
+    def is_bad_request(self, error: Exception) -> bool:
+        return isinstance(error, self.sdk.BadRequestError)
+
+    def is_rate_limited(self, error: Exception) -> bool:
+        return isinstance(error, self.sdk.RateLimitError)
+
+    def is_transient(self, error: Exception) -> bool:
+        return isinstance(error, (self.sdk.APIConnectionError, self.sdk.RateLimitError, self.sdk.InternalServerError))
+
+    def _build_kwargs(self, request: CompletionRequest) -> dict:
+        # Prefix caching is automatic but needs an identical prefix: static
+        # content goes first and the request-specific prompt last
+        messages = []
+        if static_blocks(request):
+            messages.append({"role": "system", "content": "\n\n".join(static_blocks(request))})
+        messages.append({"role": "user", "content": request.prompt})
+
+        kwargs = {
+            "model": request.model,
+            "messages": messages,
+            "max_tokens": request.max_tokens,
+            "temperature": request.temperature,
+        }
+        if request.response_schema is not None:
+            kwargs["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": request.schema_name,
+                    "schema": request.response_schema,
+                    "strict": True,
+                },
+            }
+        elif request.json_mode:
+            kwargs["response_format"] = {"type": "json_object"}
+        return kwargs
+
+    def _to_completion(self, response, headers: Any = None) -> Completion:
+        usage = response.usage
+        details = getattr(usage, "prompt_tokens_details", None)
+        return Completion(
+            text=response.choices[0].message.content or "",
+            model=response.model,
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0,
+            cached_tokens=(getattr(details, "cached_tokens", None) or 0) if details else 0,
+            headers=rate_limit_headers(headers)
+        )
+
+    def complete(self, request: CompletionRequest) -> Completion:
+        raw = self.client.chat.completions.with_raw_response.create(
+            **self._build_kwargs(request), **self.request_options(request)
+        )
+        return self._to_completion(raw.parse(), raw.headers)
+
+    async def acomplete(self, request: CompletionRequest) -> Completion:
+        raw = await self.async_client.chat.completions.with_raw_response.create(
+            **self._build_kwargs(request), **self.request_options(request)
+        )
+        return self._to_completion(await raw.parse(), raw.headers)
+
+    def stream(self, request: CompletionRequest) -> Iterator[str]:
+        for chunk in self.client.chat.completions.create(
+            stream=True, **self._build_kwargs(request), **self.request_options(request)
+        ):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def astream(self, request: CompletionRequest) -> AsyncIterator[str]:
+        response = await self.async_client.chat.completions.create(
+            stream=True, **self._build_kwargs(request), **self.request_options(request)
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class AnthropicProvider(BaseProvider):
+    """Anthropic messages backend"""
+
+    name = "anthropic"
+
+    def __init__(self, api_key: str, http_client: httpx.Client = None):
+        """
+        Args:
+            api_key: Provider API key
+            http_client: HTTP client to send requests through; defaults to the
+                process-wide pool for the provider
+        """
+        import anthropic
+
+        self.sdk = anthropic
+        self.api_key = api_key
+        # Retries are handled by the AI service's retry policy
+        self.client = anthropic.Anthropic(
+            api_key=api_key, http_client=http_client or get_http_client(self.name), max_retries=0
+        )
+        self._async_client = None
+        self._async_http_client = None
+
+    @property
+    def async_client(self) -> "anthropic.AsyncAnthropic":
+        """Async client on the shared pool of the running event loop"""
+        http_client = get_async_http_client(self.name)
+        if self._async_client is None or self._async_http_client is not http_client:
+            self._async_client = self.sdk.AsyncAnthropic(api_key=self.api_key, http_client=http_client, max_retries=0)
+            self._async_http_client = http_client
+        return self._async_client
+
+    def native_schema(self, compiled: CompiledSchema) -> Optional[Dict[str, Any]]:
+        # Tool input schemas must describe an object
+        if compiled.schema_dict.get("type") != "object":
+            return None
+        return compiled.schema_dict
+
+    def is_bad_request(self, error: Exception) -> bool:
+        return isinstance(error, self.sdk.BadRequestError)
+
+    def is_rate_limited(self, error: Exception) -> bool:
+        return isinstance(error, self.sdk.RateLimitError)
+
+    def is_transient(self, error: Exception) -> bool:
+        # InternalServerError covers 5xx including 529 overloaded
+        return isinstance(error, (self.sdk.APIConnectionError, self.sdk.RateLimitError, self.sdk.InternalServerError))
+
+    def _build_kwargs(self, request: CompletionRequest) -> dict:
+        kwargs = {
+            "model": request.model,
+            "max_tokens": request.max_tokens,
+            "temperature": request.temperature,
+            "messages": [{"role": "user", "content": request.prompt}],
+        }
+        # Anthropic caches the prefix tools -> system up to a cache_control breakpoint
+        if request.response_schema is not None:
+            kwargs["tools"] = [{
+                "name": request.schema_name,
+                "description": f"Record the response as a {request.schema_name} object.",
+                "input_schema": request.response_schema,
+            }]
+            kwargs["tool_choice"] = {"type": "tool", "name": request.schema_name}
+        system = [{"type": "text", "text": block} for block in static_blocks(request)]
+        if system:
+            kwargs["system"] = system
+        if request.cache_prefix:
+            breakpoint_block = system[-1] if system else kwargs.get("tools", [None])[0]
+            if breakpoint_block is not None:
+                breakpoint_block["cache_control"] = {"type": "ephemeral"}
+        return kwargs
+
+    def _to_completion(self, response, headers: Any = None) -> Completion:
+        tool_inputs = [block.input for block in response.content if getattr(block, "type", None) == "tool_use"]
+        if tool_inputs:
+            text = json.dumps(tool_inputs[0])
+        else:
+            text = "".join(block.text for block in response.content if getattr(block, "type", "text") == "text")
+        usage = response.usage
+        # input_tokens excludes cache reads and writes
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        return Completion(
+            text=text,
+            model=response.model,
+            prompt_tokens=usage.input_tokens + cache_read + cache_write,
+            completion_tokens=usage.output_tokens,
+            cached_tokens=cache_read,
+            headers=rate_limit_headers(headers)
+        )
+
+    def complete(self, request: CompletionRequest) -> Completion:
+        raw = self.client.messages.with_raw_response.create(
+            **self._build_kwargs(request), **self.request_options(request)
+        )
+        return self._to_completion(raw.parse(), raw.headers)
+
+    async def acomplete(self, request: CompletionRequest) -> Completion:
+        raw = await self.async_client.messages.with_raw_response.create(
+            **self._build_kwargs(request), **self.request_options(request)
+        )
+        return self._to_completion(await raw.parse(), raw.headers)
+
+    def _event_text(self, event) -> Optional[str]:
+        """Text or partial tool-input JSON carried by a stream event"""
+        if event.type != "content_block_delta":
+            return None
+        if event.delta.type == "text_delta":
+            return event.delta.text
+        if event.delta.type == "input_json_delta":
+            return event.delta.partial_json
+        return None
+
+    def stream(self, request: CompletionRequest) -> Iterator[str]:
+        for event in self.client.messages.create(
+            stream=True, **self._build_kwargs(request), **self.request_options(request)
+        ):
+            text = self._event_text(event)
+            if text:
+                yield text
+
+    async def astream(self, request: CompletionRequest) -> AsyncIterator[str]:
+        response = await self.async_client.messages.create(
+            stream=True, **self._build_kwargs(request), **self.request_options(request)
+        )
+        async for event in response:
+            text = self._event_text(event)
+            if text:
+                yield text
+
+
+def create_provider(provider: str, config: AIConfig) -> BaseProvider:
+    """
+    Create a provider backend by name
+
+    Args:
+        provider: AI provider ("openai", "anthropic", "router" or "replay")
+        config: AI configuration
+
+    Returns:
+        Provider backend instance
+    """
+    if provider == "replay":
+        from .replay import Cassette, LatencyModel, ReplayProvider
+
+        mode = config.get_replay_mode()
+        return ReplayProvider(
+            mode=mode,
+            cassette=Cassette(config.get_replay_cassette()) if mode != "fake" else None,
+            target=create_provider(config.get_replay_target(), config) if mode == "record" else None,
+            latency=LatencyModel(config.get_replay_latency()),
+            fake_on_miss=config.get_replay_miss() == "fake"
+        )
+    if provider == "router":
+        from .router import RouterProvider, RouteTarget
+
+        routes = config.get_routes()
+        if not routes:
+            raise ValueError("Router provider needs routes in BLACKTABLE_ROUTES")
+        backends: Dict[str, BaseProvider] = {}
+        targets = []
+        for name, model in routes:
+            if name not in backends:
+                backends[name] = create_provider(name, config)
+            targets.append(RouteTarget(backends[name], model))
+        return RouterProvider(
+            targets,
+            hedge_percentile=config.HEDGE_PERCENTILE,
+            hedge_delay=config.get_hedge_delay(),
+            min_samples=config.HEDGE_MIN_SAMPLES
+        )
+    if provider == "openai":
+        api_key = config.get_openai_api_key()
+        if not api_key:
+            raise ValueError("OpenAI API key not found in environment variables")
+        return OpenAIProvider(api_key=api_key)
+    elif provider == "anthropic":
+        api_key = config.get_anthropic_api_key()
+        if not api_key:
+            raise ValueError("Anthropic API key not found in environment variables")
+        return AnthropicProvider(api_key=api_key)
+    raise ValueError(f"Unsupported provider: {provider}")
@@ -0,0 +1,392 @@
+"""
+Client-side rate limiting for provider calls
+
+Each provider/model pair gets a requests-per-minute and a tokens-per-minute
+token bucket. Callers reserve their estimated usage before a call and are
+queued until the buckets can cover it; the reservation is settled with the
+real usage afterwards. Limits adapt AIMD style: every 429 halves the
+effective rate, every successful call wins a little of it back. Limits the
+provider reports in rate-limit headers are adopted when none are configured.
+
+Bucket state lives in a store. The in-memory store serves one process; the
+SQLite store lets several worker processes share one budget.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Mapping, Optional, Tuple, TypeVar
+from pydantic import BaseModel
+
+from .config import AIConfig
+
+
+R = TypeVar("R")
+
+# Longest single sleep while queued, so refunds from other callers are noticed
+MAX_WAIT_STEP = 1.0
+
+
+class RateLimits(BaseModel):
+    """Configured budget for one provider or provider/model pair"""
+    rpm: Optional[int] = None
+    tpm: Optional[int] = None
+
+
+class BucketState(BaseModel):
+    """Shared state of the request and token buckets for one key"""
+    rpm: Optional[float] = None
+    tpm: Optional[float] = None
+    scale: float = 1.0  # AIMD factor applied to rpm and tpm
+    requests: Optional[float] = None  # available request budget
+    tokens: Optional[float] = None  # available token budget
+    updated_at: float = 0.0
+    blocked_until: float = 0.0
+
+
+class Reservation(BaseModel):
+    """Capacity held for one in-flight call"""
+    key: str
+    tokens: int
+
+
+def parse_rate_limit_headers(headers: Mapping[str, str]) -> Dict[str, float]:
+    """
+    Normalize OpenAI and Anthropic rate-limit headers
+
+    Args:
+        headers: Response headers (case-insensitive names)
+
+    Returns:
+        Any of limit_requests, limit_tokens, remaining_requests,
+        remaining_tokens and retry_after that were present
+    """
+    names = {
+        "limit_requests": ("x-ratelimit-limit-requests", "anthropic-ratelimit-requests-limit"),
+        "limit_tokens": ("x-ratelimit-limit-tokens", "anthropic-ratelimit-tokens-limit"),
+        "remaining_requests": ("x-ratelimit-remaining-requests", "anthropic-ratelimit-requests-remaining"),
+        "remaining_tokens": ("x-ratelimit-remaining-tokens", "anthropic-ratelimit-tokens-remaining"),
+        "retry_after": ("retry-after",),
+    }
+    lowered = {name.lower(): value for name, value in headers.items()}
+    parsed: Dict[str, float] = {}
+    for field, candidates in names.items():
+        for candidate in candidates:
+            if candidate in lowered:
+                try:
+                    parsed[field] = float(lowered[candidate])
+                except (TypeError, ValueError):
+                    pass
+                break
+    return parsed
+
+
+class BaseLimiterStore:
+    """Storage for bucket state"""
+
+    def update(self, key: str, fn: Callable[[BucketState], R]) -> R:
+        """
+        Atomically load the state for key, apply fn to it and save it
+
+        Args:
+            key: Bucket key
+            fn: Function mutating the state in place
+
+        Returns:
+            Whatever fn returned
+        """
+        raise NotImplementedError
+
+    def get(self, key: str) -> BucketState:
+        """Snapshot of the state for key"""
+        return self.update(key, lambda state: state.model_copy())
+
+
+class MemoryLimiterStore(BaseLimiterStore):
+    """Bucket state shared by the threads of one process"""
+
+    def __init__(self):
+        self._states: Dict[str, BucketState] = {}
+        self._lock = threading.Lock()
+
+    def update(self, key: str, fn: Callable[[BucketState], R]) -> R:
+        with self._lock:
+            state = self._states.setdefault(key, BucketState())
+            return fn(state)
+
+
+class SQLiteLimiterStore(BaseLimiterStore):
+    """Bucket state shared by every process using the same database file"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Database file path (created if missing)
+        """
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode so BEGIN IMMEDIATE controls the cross-process write lock
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, state TEXT NOT NULL)")
+
+    def update(self, key: str, fn: Callable[[BucketState], R]) -> R:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT state FROM buckets WHERE key = ?", (key,)).fetchone()
+                state = BucketState.model_validate_json(row[0]) if row else BucketState()
+                result = fn(state)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, state) VALUES (?, ?)",
+                    (key, state.model_dump_json())
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return result
+
+    def close(self) -> None:
+        """Close the database connection"""
+        self._conn.close()
+
+
+class RateLimiter:
+    """Token-bucket limiter and concurrency governor for provider calls"""
+
+    def __init__(
+        self,
+        limits: Dict[str, RateLimits] = None,
+        store: BaseLimiterStore = None,
+        max_concurrency: Optional[int] = None,
+        decrease_factor: float = 0.5,
+        increase_step: float = 0.05,
+        min_scale: float = 0.1,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Args:
+            limits: Budgets keyed by "provider" or "provider:model"
+            store: Bucket state store; defaults to in-memory
+            max_concurrency: Most calls in flight per key in this process (None for no cap)
+            decrease_factor: Multiplier applied to the rate on a 429
+            increase_step: Rate fraction regained per successful call
+            min_scale: Lowest fraction of the configured rate
+            clock: Wall-clock time source (shared stores need a common clock)
+        """
+        self.limits = limits or {}
+        self.store = store or MemoryLimiterStore()
+        self.max_concurrency = max_concurrency
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.min_scale = min_scale
+        self.clock = clock
+        self._in_flight: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, provider: str, model: str, tokens: int) -> Reservation:
+        """
+        Reserve capacity for a call, blocking until it is available
+
+        Args:
+            provider: Provider name
+            model: Model name
+            tokens: Estimated prompt plus completion tokens
+
+        Returns:
+            Reservation to settle with release
+        """
+        while True:
+            reservation, wait = self._try_reserve(provider, model, tokens)
+            if reservation is not None:
+                return reservation
+            time.sleep(min(wait, MAX_WAIT_STEP))
+
+    async def aacquire(self, provider: str, model: str, tokens: int) -> Reservation:
+        """
+        Async variant of acquire; waits without blocking the event loop
+
+        Shared stores may wait on a lock held by another process, so their
+        reservations are made in a worker thread.
+        """
+        while True:
+            if isinstance(self.store, MemoryLimiterStore):
+                reservation, wait = self._try_reserve(provider, model, tokens)
+            else:
+                reservation, wait = await self._try_reserve_in_thread(provider, model, tokens)
+            if reservation is not None:
+                return reservation
+            await asyncio.sleep(min(wait, MAX_WAIT_STEP))
+
+    async def _try_reserve_in_thread(
+        self, provider: str, model: str, tokens: int
+    ) -> Tuple[Optional[Reservation], float]:
+        """_try_reserve in a worker thread, handing back a reservation its caller no longer waits for"""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(None, self._try_reserve, provider, model, tokens)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(lambda done: self._release_abandoned(loop, done))
+            raise
+
+    def _release_abandoned(self, loop: asyncio.AbstractEventLoop, done: "asyncio.Future") -> None:
+        """Release a reservation made after its caller was cancelled, off the event loop"""
+        if done.cancelled() or done.exception() is not None:
+            return
+        reservation, _ = done.result()
+        if reservation is None:
+            return
+        try:
+            loop.run_in_executor(None, lambda: self.release(reservation, used_tokens=0))
+        except RuntimeError:
+            # The loop is shutting down
+            self.release(reservation, used_tokens=0)
+
+    def try_acquire(self, provider: str, model: str, tokens: int) -> Optional[Reservation]:
+        """Reserve capacity if it is available right now"""
+        reservation, _ = self._try_reserve(provider, model, tokens)
+        return reservation
+
+    def release(
+        self,
+        reservation: Reservation,
+        used_tokens: Optional[int] = None,
+        headers: Mapping[str, str] = None,
+        rate_limited: bool = False
+    ) -> None:
+        """
+        Settle a reservation once the call has finished
+
+        Args:
+            reservation: Reservation returned by acquire
+            used_tokens: Actual tokens used (None keeps the estimate)
+            headers: Provider response or error headers
+            rate_limited: Whether the provider answered with a 429
+        """
+        with self._lock:
+            self._in_flight[reservation.key] = max(0, self._in_flight.get(reservation.key, 1) - 1)
+
+        info = parse_rate_limit_headers(headers or {})
+        limits = self._limits_for(reservation.key)
+
+        def settle(state: BucketState) -> None:
+            now = self.clock()
+            self._apply_limits(state, limits, info)
+            self._refill(state, now)
+            if used_tokens is not None and state.tokens is not None:
+                state.tokens += reservation.tokens - used_tokens
+            if "remaining_requests" in info and state.requests is not None:
+                state.requests = min(state.requests, info["remaining_requests"])
+            if "remaining_tokens" in info and state.tokens is not None:
+                state.tokens = min(state.tokens, info["remaining_tokens"])
+
+            if rate_limited:
+                state.scale = max(self.min_scale, state.scale * self.decrease_factor)
+                state.requests = min(state.requests or 0.0, 0.0)
+                state.tokens = min(state.tokens or 0.0, 0.0)
+                if "retry_after" in info:
+                    state.blocked_until = max(state.blocked_until, now + info["retry_after"])
+            else:
+                state.scale = min(1.0, state.scale + self.increase_step)
+
+        self.store.update(reservation.key, settle)
+
+    def state(self, provider: str, model: str) -> BucketState:
+        """Current bucket state for a provider/model pair"""
+        return self.store.get(f"{provider}:{model}")
+
+    def _limits_for(self, key: str) -> Optional[RateLimits]:
+        """Configured limits for a key, falling back to the provider-wide entry"""
+        return self.limits.get(key) or self.limits.get(key.split(":", 1)[0])
+
+    def _try_reserve(self, provider: str, model: str, tokens: int) -> Tuple[Optional[Reservation], float]:
+        """Reserve capacity or report how long to wait before trying again"""
+        key = f"{provider}:{model}"
+        limits = self._limits_for(key)
+
+        def reserve(state: BucketState) -> float:
+            now = self.clock()
+            self._apply_limits(state, limits, {})
+            self._refill(state, now)
+            if now < state.blocked_until:
+                return state.blocked_until - now
+
+            wait = 0.0
+            if state.rpm and state.requests < 1:
+                wait = max(wait, (1 - state.requests) * 60 / (state.rpm * state.scale))
+            if state.tpm:
+                # A request larger than the bucket waits for a full bucket instead of forever
+                needed = min(tokens, state.tpm * state.scale)
+                if state.tokens < needed:
+                    wait = max(wait, (needed - state.tokens) * 60 / (state.tpm * state.scale))
+            if wait > 0:
+                return wait
+
+            if state.rpm:
+                state.requests -= 1
+            if state.tpm:
+                state.tokens -= tokens
+            return 0.0
+
+        with self._lock:
+            if self.max_concurrency is not None and self._in_flight.get(key, 0) >= self.max_concurrency:
+                return None, 0.05
+            wait = self.store.update(key, reserve)
+            if wait > 0:
+                return None, wait
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        return Reservation(key=key, tokens=tokens), 0.0
+
+    def _apply_limits(self, state: BucketState, limits: Optional[RateLimits], info: Dict[str, float]) -> None:
+        """Use configured limits, or adopt the ones the provider reports"""
+        if limits is not None:
+            state.rpm = limits.rpm
+            state.tpm = limits.tpm
+            return
+        if "limit_requests" in info:
+            state.rpm = info["limit_requests"]
+        if "limit_tokens" in info:
+            state.tpm = info["limit_tokens"]
+
+    def _refill(self, state: BucketState, now: float) -> None:
+        """Top up both buckets for the time elapsed since the last update"""
+        elapsed = max(0.0, now - state.updated_at) if state.updated_at else 0.0
+        state.updated_at = now
+        if state.rpm:
+            capacity = state.rpm * state.scale
+            state.requests = capacity if state.requests is None else min(capacity, state.requests + capacity * elapsed / 60)
+        else:
+            state.requests = None
+        if state.tpm:
+            capacity = state.tpm * state.scale
+            state.tokens = capacity if state.tokens is None else min(capacity, state.tokens + capacity * elapsed / 60)
+        else:
+            state.tokens = None
+
+
+def create_rate_limiter(config: AIConfig) -> RateLimiter:
+    """
+    Create the rate limiter described by the configuration
+
+    Args:
+        config: AI configuration
+
+    Returns:
+        RateLimiter with an in-memory or SQLite state store
+    """
+    limits = {
+        key: RateLimits(rpm=rpm, tpm=tpm)
+        for key, (rpm, tpm) in config.get_rate_limits().items()
+    }
+    store_name = config.get_rate_limit_store()
+    if store_name == "memory":
+        store = MemoryLimiterStore()
+    elif store_name == "sqlite":
+        store = SQLiteLimiterStore(config.get_rate_limit_path())
+    else:
+        raise ValueError(f"Unsupported rate limit store: {store_name}")
+    return RateLimiter(limits=limits, store=store, max_concurrency=config.get_max_concurrency())
@@ -0,0 +1,373 @@
+"""
+Record/replay and synthetic providers for offline runs and benchmarks
+
+`ReplayProvider` works in three modes:
+
+- record: forward requests to a real provider and append every
+  request/response pair to a cassette file
+- replay: answer from the cassette, keyed by a hash of the request
+- fake: generate schema-valid responses for any response model
+
+Replayed and fake responses can be delayed by a synthetic latency
+distribution so load tests see realistic concurrency.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple
+
+from .providers import BaseProvider, Completion, CompletionRequest, static_blocks
+from .schema import CompiledSchema
+from .tokens import estimate_tokens
+
+
+def request_key(request: CompletionRequest) -> str:
+    """
+    Hash the parts of a request that identify its answer
+
+    The provider-specific schema dialect and the model are left out, so a
+    cassette recorded against one provider replays under any model name.
+
+    Args:
+        request: Completion request
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    payload = json.dumps(
+        {
+            "system_prompt": request.system_prompt,
+            "static_prompt": request.static_prompt,
+            "prompt": request.prompt,
+            "schema_name": request.schema_name,
+            "json_mode": request.json_mode,
+        },
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LatencyModel:
+    """
+    Synthetic latency distribution
+
+    Specs:
+        "none"                     no delay
+        "fixed:<seconds>"          constant delay
+        "uniform:<low>:<high>"     uniform between low and high seconds
+        "lognormal:<median>:<sigma>"  heavy-tailed, like real LLM latency
+        "recorded[:<scale>]"       the latency stored with the cassette entry
+    """
+
+    def __init__(self, spec: str = "none", seed: Optional[int] = None):
+        """
+        Args:
+            spec: Distribution spec (see class docstring)
+            seed: Random seed for reproducible runs
+        """
+        self.spec = spec
+        name, *params = spec.split(":")
+        self.name = name
+        self.params = [float(param) for param in params]
+        if name not in ("none", "fixed", "uniform", "lognormal", "recorded"):
+            raise ValueError(f"Unsupported latency distribution: {spec}")
+        self._random = random.Random(seed)
+
+    def sample(self, recorded: Optional[float] = None) -> float:
+        """
+        Draw one latency in seconds
+
+        Args:
+            recorded: Latency stored with the replayed entry, if any
+        """
+        if self.name == "fixed":
+            return self.params[0]
+        if self.name == "uniform":
+            return self._random.uniform(self.params[0], self.params[1])
+        if self.name == "lognormal":
+            median, sigma = self.params
+            return self._random.lognormvariate(math.log(median), sigma)
+        if self.name == "recorded":
+            scale = self.params[0] if self.params else 1.0
+            return (recorded or 0.0) * scale
+        return 0.0
+
+
+class Cassette:
+    """Request/response pairs stored as JSON Lines"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Cassette file (created on the first recording)
+        """
+        self.path = path
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # Response models recorded on the prompt path, which replay must take again
+        self.prompt_mode_schemas: Set[str] = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        self._add(json.loads(line))
+
+    def _add(self, entry: Dict[str, Any]) -> None:
+        self._entries[entry["key"]] = entry
+        request = entry["request"]
+        if request.get("json_mode") and request.get("schema_name"):
+            self.prompt_mode_schemas.add(request["schema_name"])
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Recorded entry for a request key"""
+        return self._entries.get(key)
+
+    def record(self, key: str, request: CompletionRequest, completion: Completion, latency: float) -> None:
+        """Store a request/response pair"""
+        entry = {
+            "key": key,
+            "request": request.model_dump(exclude={"response_schema"}),
+            "completion": completion.model_dump(exclude={"headers"}),
+            "latency": latency,
+        }
+        with self._lock:
+            self._add(entry)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(entry) + "\n")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def fake_instance(schema: Dict[str, Any], rng: random.Random = None, max_depth: int = 4) -> Any:
+    """
+    Generate a value that validates against a JSON schema
+
+    Supports the keywords pydantic emits: types (including nullable type
+    lists), enum, const, anyOf/oneOf/allOf, $ref into $defs, numeric bounds,
+    string lengths and array item counts. Optional fields are filled too so
+    payload sizes resemble real responses.
+
+    Args:
+        schema: JSON schema (compact, strict or raw pydantic)
+        rng: Random source; pass a seeded one for reproducible output
+        max_depth: Nesting depth after which recursive structures stop growing
+
+    Returns:
+        Generated JSON value
+    """
+    rng = rng or random.Random(0)
+    definitions = schema.get("$defs", {})
+
+    def generate(node: Any, depth: int, name: str) -> Any:
+        if not isinstance(node, dict) or not node:
+            return f"sample {name}".strip()
+        if "$ref" in node:
+            if depth >= max_depth:
+                return None
+            return generate(definitions.get(node["$ref"].split("/")[-1], {}), depth + 1, name)
+        if "const" in node:
+            return node["const"]
+        if "enum" in node:
+            return rng.choice(node["enum"])
+        for keyword in ("anyOf", "oneOf"):
+            if keyword in node:
+                options = [option for option in node[keyword] if option.get("type") != "null"]
+                return generate(options[0] if options else {"type": "null"}, depth, name)
+        if "allOf" in node:
+            merged: Dict[str, Any] = {}
+            for part in node["allOf"]:
+                merged.update(part)
+            return generate(merged, depth, name)
+
+        node_type = node.get("type")
+        if isinstance(node_type, list):
+            non_null = [item for item in node_type if item != "null"]
+            node_type = non_null[0] if non_null else "null"
+        if node_type is None:
+            node_type = "object" if "properties" in node else "string"
+
+        if node_type == "object":
+            if depth >= max_depth and "properties" not in node:
+                return {}
+            return {
+                key: generate(value, depth + 1, key)
+                for key, value in node.get("properties", {}).items()
+            }
+        if node_type == "array":
+            if depth >= max_depth:
+                return []
+            count = max(node.get("minItems", 1), min(node.get("maxItems", 3), rng.randint(1, 3)))
+            return [generate(node.get("items", {}), depth + 1, name) for _ in range(count)]
+        if node_type in ("integer", "number"):
+            low = node.get("minimum", node.get("exclusiveMinimum", 0))
+            high = node.get("maximum", node.get("exclusiveMaximum", low + 100))
+            if node_type == "integer":
+                return rng.randint(math.ceil(low) + ("exclusiveMinimum" in node), math.floor(high) - ("exclusiveMaximum" in node))
+            return round(rng.uniform(low, high), 2)
+        if node_type == "boolean":
+            return rng.random() < 0.5
+        if node_type == "null":
+            return None
+        text = f"sample {name}".strip()
+        min_length = node.get("minLength", 0)
+        if len(text) < min_length:
+            text = text.ljust(min_length, "x")
+        if "maxLength" in node:
+            text = text[:node["maxLength"]]
+        return text
+
+    return generate(schema, 0, "")
+
+
+class ReplayProvider(BaseProvider):
+    """Provider answering from a cassette, recording a real provider, or faking responses"""
+
+    name = "replay"
+
+    def __init__(
+        self,
+        mode: str = "replay",
+        cassette: Optional[Cassette] = None,
+        target: Optional[BaseProvider] = None,
+        latency: Optional[LatencyModel] = None,
+        fake_on_miss: bool = False,
+        seed: int = 0
+    ):
+        """
+        Args:
+            mode: "record", "replay" or "fake"
+            cassette: Cassette to read from or record to (record and replay modes)
+            target: Real provider to record (record mode)
+            latency: Synthetic latency for replayed and fake responses
+            fake_on_miss: In replay mode, fake responses missing from the cassette instead of failing
+            seed: Seed for fake responses (combined with the request hash)
+        """
+        if mode not in ("record", "replay", "fake"):
+            raise ValueError(f"Unsupported replay mode: {mode}")
+        if mode in ("record", "replay") and cassette is None:
+            raise ValueError(f"Replay mode '{mode}' needs a cassette")
+        if mode == "record" and target is None:
+            raise ValueError("Record mode needs a target provider")
+        self.mode = mode
+        self.cassette = cassette
+        self.target = target
+        self.latency = latency or LatencyModel()
+        self.fake_on_miss = fake_on_miss
+        self.seed = seed
+        self.client = target.client if target is not None else None
+        self.default_model = target.default_model if target is not None else None
+
+    def native_schema(self, compiled: CompiledSchema) -> Optional[Dict[str, Any]]:
+        if self.target is not None:
+            return self.target.native_schema(compiled)
+        if self.mode == "replay" and compiled.model_name in self.cassette.prompt_mode_schemas:
+            # Recorded on the prompt path (e.g. a schema the provider cannot
+            # enforce natively), so rebuild the same request to hit its key
+            return None
+        # Requests carry the plain schema, which fake mode generates from
+        return compiled.schema_dict
+
+    def is_bad_request(self, error: Exception) -> bool:
+        return self.target is not None and self.target.is_bad_request(error)
+
+    def is_rate_limited(self, error: Exception) -> bool:
+        return self.target is not None and self.target.is_rate_limited(error)
+
+    def is_transient(self, error: Exception) -> bool:
+        return self.target is not None and self.target.is_transient(error)
+
+    def close(self) -> None:
+        if self.target is not None:
+            self.target.close()
+
+    def _answer(self, request: CompletionRequest) -> Tuple[Completion, float]:
+        """Recorded or generated completion plus the delay to simulate"""
+        key = request_key(request)
+        if self.mode == "replay":
+            entry = self.cassette.get(key)
+            if entry is not None:
+                completion = Completion(**entry["completion"])
+                completion.headers = {}
+                return completion, self.latency.sample(entry.get("latency"))
+            if not self.fake_on_miss:
+                raise ValueError(f"No recorded response for request {key[:12]} in {self.cassette.path}")
+        return self._fake(request, key), self.latency.sample()
+
+    def _fake(self, request: CompletionRequest, key: str) -> Completion:
+        rng = random.Random(f"{self.seed}:{key}")
+        if request.response_schema is not None:
+            text = json.dumps(fake_instance(request.response_schema, rng))
+        elif request.json_mode:
+            text = "{}"
+        else:
+            text = "Synthetic response generated for offline runs."
+        return Completion(
+            text=text,
+            model=request.model,
+            prompt_tokens=sum(estimate_tokens(block) for block in [*static_blocks(request), request.prompt]),
+            completion_tokens=estimate_tokens(text)
+        )
+
+    def _record(self, request: CompletionRequest, completion: Completion, started: float) -> Completion:
+        self.cassette.record(request_key(request), request, completion, time.monotonic() - started)
+        return completion
+
+    def complete(self, request: CompletionRequest) -> Completion:
+        if self.mode == "record":
+            started = time.monotonic()
+            return self._record(request, self.target.complete(request), started)
+        completion, delay = self._answer(request)
+        time.sleep(delay)
+        return completion
+
+    async def acomplete(self, request: CompletionRequest) -> Completion:
+        if self.mode == "record":
+            started = time.monotonic()
+            return self._record(request, await self.target.acomplete(request), started)
+        completion, delay = self._answer(request)
+        await asyncio.sleep(delay)
+        return completion
+
+    def _chunks(self, text: str, size: int = 16) -> List[str]:
+        return [text[index:index + size] for index in range(0, len(text), size)] or [""]
+
+    def stream(self, request: CompletionRequest) -> Iterator[str]:
+        if self.mode == "record":
+            started = time.monotonic()
+            chunks = []
+            for chunk in self.target.stream(request):
+                chunks.append(chunk)
+                yield chunk
+            self._record(request, Completion(text="".join(chunks), model=request.model), started)
+            return
+        completion, delay = self._answer(request)
+        chunks = self._chunks(completion.text)
+        # A fifth of the latency before the first token, the rest spread over the chunks
+        time.sleep(delay * 0.2)
+        for chunk in chunks:
+            yield chunk
+            time.sleep(delay * 0.8 / len(chunks))
+
+    async def astream(self, request: CompletionRequest) -> AsyncIterator[str]:
+        if self.mode == "record":
+            started = time.monotonic()
+            chunks = []
+            async for chunk in self.target.astream(request):
+                chunks.append(chunk)
+                yield chunk
+            self._record(request, Completion(text="".join(chunks), model=request.model), started)
+            return
+        completion, delay = self._answer(request)
+        chunks = self._chunks(completion.text)
+        await asyncio.sleep(delay * 0.2)
+        for chunk in chunks:
+            yield chunk
+            await asyncio.sleep(delay * 0.8 / len(chunks))
@@ -0,0 +1,41 @@
+"""
+Retry policy for transient provider errors
+"""
+import random
+from typing import Optional
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        """
+        Args:
+            max_attempts: Total attempts per call, including the first
+            base_delay: Backoff ceiling in seconds before the first retry
+            max_delay: Largest backoff ceiling in seconds
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, attempt: int) -> bool:
+        """Whether another attempt is allowed after attempt (0-based) failed"""
+        return attempt + 1 < self.max_attempts
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Seconds to wait before the next attempt
+
+        Args:
+            attempt: 0-based index of the attempt that failed
+            retry_after: Wait requested by the provider, if any
+
+        Returns:
+            Random delay up to the exponential ceiling, never below retry_after
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
@@ -0,0 +1,298 @@
+"""
+Latency-aware routing and hedged requests across provider backends
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from .providers import BaseProvider, Completion, CompletionRequest
+from .schema import CompiledSchema
+
+
+# Model name prefixes per provider, to tell which targets can serve a requested model
+PROVIDER_MODEL_PREFIXES: Dict[str, Tuple[str, ...]] = {
+    "openai": ("gpt-", "chatgpt-", "o1", "o3", "o4"),
+    "anthropic": ("claude-",),
+}
+
+class TargetStats:
+    """Rolling latency window and error rate of one route target"""
+
+    def __init__(self, window: int = 200, error_decay: float = 0.1):
+        """
+        Args:
+            window: Number of recent latencies kept
+            error_decay: Weight of the newest outcome in the error rate average
+        """
+        self.latencies = deque(maxlen=window)
+        self.error_rate = 0.0
+        self.error_decay = error_decay
+        self._lock = threading.Lock()
+
+    def record(self, latency: Optional[float] = None, error: bool = False) -> None:
+        """Record one finished call"""
+        with self._lock:
+            if latency is not None and not error:
+                self.latencies.append(latency)
+            self.error_rate += self.error_decay * ((1.0 if error else 0.0) - self.error_rate)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Latency at percentile (0-1) of the window, None without samples"""
+        with self._lock:
+            if not self.latencies:
+                return None
+            ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(percentile * len(ordered)))
+        return ordered[index]
+
+    @property
+    def samples(self) -> int:
+        """Number of latencies in the window"""
+        return len(self.latencies)
+
+
+class RouteTarget:
+    """A provider backend and the model to request from it"""
+
+    def __init__(self, provider: BaseProvider, model: str):
+        self.provider = provider
+        self.model = model
+        self.name = f"{provider.name}:{model}"
+        self.stats = TargetStats()
+
+
+class RouterProvider(BaseProvider):
+    """
+    Provider that routes each call across several backends
+
+    The primary target is drawn at random, weighted by observed latency and
+    error rate. If it has not answered once its latency percentile has
+    passed, a hedged duplicate goes to the best other target and whichever
+    valid response arrives first wins; a failed primary fails over at once.
+    Async calls cancel the losing request and record the time it had taken
+    so far as its latency. Blocking calls cannot interrupt an HTTP call in
+    flight, so the loser finishes in a worker thread and its result is
+    discarded.
+
+    Requests for the router's default model go to each target's own model.
+    A request for another model (a stage policy's model tier) keeps that
+    model on targets whose provider serves it; other targets answer with
+    their own model.
+    """
+
+    name = "router"
+
+    def __init__(
+        self,
+        targets: List[RouteTarget],
+        hedge_percentile: float = 0.95,
+        hedge_delay: float = 10.0,
+        min_samples: int = 20,
+        max_workers: int = 32
+    ):
+        """
+        Args:
+            targets: Route targets, the first being the preferred default
+            hedge_percentile: Latency percentile of the primary after which to hedge
+            hedge_delay: Hedge delay used until a target has min_samples latencies
+            min_samples: Latencies needed before the percentile is trusted
+            max_workers: Worker threads for blocking calls
+        """
+        if not targets:
+            raise ValueError("RouterProvider needs at least one target")
+        self.targets = targets
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.min_samples = min_samples
+        self.client = targets[0].provider.client
+        self.default_model = targets[0].model
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="blacktable-router")
+
+    def native_schema(self, compiled: CompiledSchema) -> Optional[dict]:
+        # One request carries one schema, so native mode needs every target to agree on it
+        schemas = [target.provider.native_schema(compiled) for target in self.targets]
+        if schemas[0] is None or any(schema != schemas[0] for schema in schemas[1:]):
+            return None
+        return schemas[0]
+
+    def is_bad_request(self, error: Exception) -> bool:
+        return any(target.provider.is_bad_request(error) for target in self.targets)
+
+    def is_rate_limited(self, error: Exception) -> bool:
+        return any(target.provider.is_rate_limited(error) for target in self.targets)
+
+    def is_transient(self, error: Exception) -> bool:
+        return any(target.provider.is_transient(error) for target in self.targets)
+
+    def weights(self) -> Dict[str, float]:
+        """
+        Routing weight per target name
+
+        Weight is the success rate over the median latency. Targets without
+        samples are scored with the best known median so they get explored.
+        """
+        medians = {target.name: target.stats.percentile(0.5) for target in self.targets}
+        known = [median for median in medians.values() if median is not None]
+        default_median = min(known) if known else 1.0
+        return {
+            target.name: max(0.01, 1.0 - target.stats.error_rate)
+            / max(0.05, medians[target.name] if medians[target.name] is not None else default_median)
+            for target in self.targets
+        }
+
+    def hedge_after(self, target: RouteTarget) -> float:
+        """Seconds to wait for target before sending a hedged request"""
+        if target.stats.samples < self.min_samples:
+            return self.hedge_delay
+        return target.stats.percentile(self.hedge_percentile)
+
+    def _choose(self) -> Tuple[RouteTarget, Optional[RouteTarget]]:
+        """Pick the primary target and the backup to hedge to"""
+        weights = self.weights()
+        primary = random.choices(self.targets, weights=[weights[target.name] for target in self.targets])[0]
+        others = [target for target in self.targets if target is not primary]
+        backup = max(others, key=lambda target: weights[target.name]) if others else None
+        return primary, backup
+
+    def _target_request(self, target: RouteTarget, request: CompletionRequest) -> CompletionRequest:
+        if request.model and request.model != self.default_model and self._serves(target, request.model):
+            return request
+        return request.model_copy(update={"model": target.model})
+
+    def _serves(self, target: RouteTarget, model: str) -> bool:
+        """Whether the provider of target can run model"""
+        provider = target.provider.name
+        routed = {other.model for other in self.targets if other.provider.name == provider}
+        return model in routed or model.startswith(PROVIDER_MODEL_PREFIXES.get(provider, ()))
+
+    def _is_valid(self, request: CompletionRequest, completion: Completion) -> bool:
+        """Whether a completion is usable; structured requests must return JSON"""
+        if request.json_mode or request.response_schema is not None:
+            try:
+                json.loads(completion.text)
+            except json.JSONDecodeError:
+                return False
+            return True
+        return bool(completion.text)
+
+    def _call(self, target: RouteTarget, request: CompletionRequest) -> Completion:
+        started = time.monotonic()
+        try:
+            completion = target.provider.complete(self._target_request(target, request))
+        except Exception:
+            target.stats.record(error=True)
+            raise
+        target.stats.record(latency=time.monotonic() - started)
+        return completion
+
+    async def _acall(self, target: RouteTarget, request: CompletionRequest) -> Completion:
+        started = time.monotonic()
+        try:
+            completion = await target.provider.acomplete(self._target_request(target, request))
+        except asyncio.CancelledError:
+            # A cancelled hedge loser took at least this long: record it as a
+            # censored latency so a stalling target loses weight
+            target.stats.record(latency=time.monotonic() - started)
+            raise
+        except Exception:
+            target.stats.record(error=True)
+            raise
+        target.stats.record(latency=time.monotonic() - started)
+        return completion
+
+    def complete(self, request: CompletionRequest) -> Completion:
+        primary, backup = self._choose()
+        hedge_at = time.monotonic() + self.hedge_after(primary)
+        pending = {self._executor.submit(self._call, primary, request)}
+        hedged = backup is None
+        errors: List[Exception] = []
+        invalid: Optional[Completion] = None
+
+        while pending:
+            timeout = None if hedged else max(0.0, hedge_at - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    completion = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                if self._is_valid(request, completion):
+                    for other in pending:
+                        other.cancel()
+                    return completion
+                invalid = invalid or completion
+            # Hedge on timeout, fail over at once when the primary came back unusable
+            if not hedged:
+                pending.add(self._executor.submit(self._call, backup, request))
+                hedged = True
+
+        if invalid is not None:
+            return invalid
+        raise errors[0]
+
+    async def acomplete(self, request: CompletionRequest) -> Completion:
+        primary, backup = self._choose()
+        hedge_at = time.monotonic() + self.hedge_after(primary)
+        pending = {asyncio.ensure_future(self._acall(primary, request))}
+        hedged = backup is None
+        errors: List[Exception] = []
+        invalid: Optional[Completion] = None
+
+        try:
+            while pending:
+                timeout = None if hedged else max(0.0, hedge_at - time.monotonic())
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        completion = task.result()
+                    except Exception as e:
+                        errors.append(e)
+                        continue
+                    if self._is_valid(request, completion):
+                        return completion
+                    invalid = invalid or completion
+                if not hedged:
+                    pending.add(asyncio.ensure_future(self._acall(backup, request)))
+                    hedged = True
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if invalid is not None:
+            return invalid
+        raise errors[0]
+
+    def close(self) -> None:
+        """Stop the worker threads of blocking calls and close the target providers"""
+        # Losers of blocking hedges may still be running; their results are discarded anyway
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for target in self.targets:
+            target.provider.close()
+
+    def stream(self, request: CompletionRequest) -> Iterator[str]:
+        # Streams are routed but not hedged: output may already have been yielded
+        target, _ = self._choose()
+        started = time.monotonic()
+        try:
+            yield from target.provider.stream(self._target_request(target, request))
+        except Exception:
+            target.stats.record(error=True)
+            raise
+        target.stats.record(latency=time.monotonic() - started)
+
+    async def astream(self, request: CompletionRequest) -> AsyncIterator[str]:
+        target, _ = self._choose()
+        started = time.monotonic()
+        try:
+            async for chunk in target.provider.astream(self._target_request(target, request)):
+                yield chunk
+        except Exception:
+            target.stats.record(error=True)
+            raise
+        target.stats.record(latency=time.monotonic() - started)
@@ -0,0 +1,304 @@
+"""
+Compact schema prompts for structured responses
+"""
+import hashlib
+import json
+import threading
+import types
+from typing import Any, Dict, Iterable, List, Optional, Type, Union, get_args, get_origin
+from pydantic import BaseModel
+
+from .tokens import estimate_tokens
+
+
+# Keys that cost tokens without telling the model anything it needs
+_DROPPED_KEYS = {"title", "examples"}
+
+# Keywords OpenAI strict structured outputs reject
+_STRICT_UNSUPPORTED_KEYS = {
+    "default", "format", "pattern", "minimum", "maximum", "exclusiveMinimum",
+    "exclusiveMaximum", "multipleOf", "minLength", "maxLength", "minItems", "maxItems"
+}
+
+# A strict schema node must pin its type through one of these keywords
+_TYPED_KEYS = {"type", "anyOf", "$ref", "enum", "const"}
+
+
+def compact_schema(schema: Dict[str, Any], max_description_length: int = 80) -> Dict[str, Any]:
+    """
+    Inline $refs and strip noise from a pydantic JSON schema
+
+    Titles are removed, model-level descriptions are dropped and field
+    descriptions are cut to max_description_length characters. `Optional[X]`
+    unions are collapsed into a type list. Recursive references are kept as
+    $ref with only the definitions they need.
+
+    Args:
+        schema: Schema from `model_json_schema()`
+        max_description_length: Longest field description kept (0 drops them)
+
+    Returns:
+        Compacted schema
+    """
+    definitions = schema.get("$defs", {})
+    kept_definitions: Dict[str, Any] = {}
+
+    def resolve(node: Any, stack: tuple, is_property: bool) -> Any:
+        if isinstance(node, list):
+            return [resolve(item, stack, False) for item in node]
+        if not isinstance(node, dict):
+            return node
+
+        if "$ref" in node:
+            name = node["$ref"].split("/")[-1]
+            if name in stack:
+                if name not in kept_definitions:
+                    kept_definitions[name] = None
+                    kept_definitions[name] = resolve(definitions[name], stack, False)
+                return {"$ref": node["$ref"]}
+            # Model docstrings are dropped; a description on the field itself is kept
+            merged = {k: v for k, v in definitions[name].items() if k != "description"}
+            merged.update({k: v for k, v in node.items() if k != "$ref"})
+            return resolve(merged, stack + (name,), is_property)
+
+        result = {}
+        for key, value in node.items():
+            if key in _DROPPED_KEYS or key == "$defs":
+                continue
+            if key == "description":
+                if not is_property or max_description_length <= 0:
+                    continue
+                if len(value) > max_description_length:
+                    value = value[:max_description_length - 3].rstrip() + "..."
+                result[key] = value
+            elif key == "default" and value in (None, [], {}):
+                continue
+            elif key == "properties":
+                result[key] = {name: resolve(prop, stack, True) for name, prop in value.items()}
+            else:
+                result[key] = resolve(value, stack, False)
+
+        return _collapse_nullable(result)
+
+    compacted = resolve(schema, (), False)
+    if kept_definitions:
+        compacted["$defs"] = kept_definitions
+    return compacted
+
+
+def _collapse_nullable(node: Dict[str, Any]) -> Dict[str, Any]:
+    """Rewrite {"anyOf": [{"type": X, ...}, {"type": "null"}]} as {"type": [X, "null"], ...}"""
+    options = node.get("anyOf")
+    if not options or len(options) != 2:
+        return node
+    non_null = [option for option in options if option != {"type": "null"}]
+    if len(non_null) != 1 or not isinstance(non_null[0].get("type"), str):
+        return node
+    collapsed = {key: value for key, value in node.items() if key != "anyOf"}
+    collapsed.update(non_null[0])
+    collapsed["type"] = [non_null[0]["type"], "null"]
+    return collapsed
+
+
+class _NotStrictCompatible(Exception):
+    """Raised when a schema cannot be expressed in strict mode"""
+
+
+def to_strict_schema(schema: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Convert a compacted schema to the OpenAI strict structured-output subset
+
+    Every object gets `additionalProperties: false` and lists all of its
+    properties as required. Properties keep their own nullability: `Optional`
+    fields accept null, while defaulted fields of other types (e.g. `bool = False`,
+    `List[X] = []`) must be sent, since pydantic would reject a null for them.
+    Unsupported validation keywords are removed.
+
+    Args:
+        schema: Schema from `compact_schema`
+
+    Returns:
+        Strict schema, or None when the schema has free-form objects or
+        untyped values (e.g. `Dict[str, Any]`, `Any`) that strict mode cannot express
+    """
+    def convert(node: Any) -> Any:
+        if isinstance(node, list):
+            return [convert(item) for item in node]
+        if not isinstance(node, dict):
+            return node
+        if not _TYPED_KEYS.intersection(node):
+            # Untyped (Any) values are not allowed in strict mode
+            raise _NotStrictCompatible()
+
+        result = {}
+        for key, value in node.items():
+            if key in _STRICT_UNSUPPORTED_KEYS:
+                continue
+            if key == "properties":
+                result[key] = {name: convert(prop) for name, prop in value.items()}
+            elif key == "$defs":
+                result[key] = {name: convert(definition) for name, definition in value.items()}
+            else:
+                result[key] = convert(value)
+
+        node_type = result.get("type")
+        is_object = node_type == "object" or (isinstance(node_type, list) and "object" in node_type)
+        if is_object:
+            properties = result.get("properties")
+            if not properties or node.get("additionalProperties") not in (None, False):
+                raise _NotStrictCompatible()
+            result["required"] = list(properties)
+            result["additionalProperties"] = False
+        return result
+
+    if schema.get("type") != "object":
+        return None
+    try:
+        return convert(schema)
+    except _NotStrictCompatible:
+        return None
+
+
+def drop_disallowed_nulls(data: Any, model: Type[BaseModel]) -> Any:
+    """
+    Remove nulls sent for defaulted fields whose type does not accept None
+
+    Models often answer `null` for a field they have nothing for, which pydantic
+    rejects for fields such as `bool = False` or `List[X] = []`. Dropping the key
+    lets the default apply instead of failing validation.
+
+    Args:
+        data: Parsed JSON response
+        model: Response model the data is validated against
+
+    Returns:
+        Data without those nulls, at any nesting depth
+    """
+    if not isinstance(data, dict):
+        return data
+    cleaned = dict(data)
+    for name, field in model.model_fields.items():
+        key = field.alias or name
+        if key not in cleaned:
+            continue
+        if cleaned[key] is None:
+            if not field.is_required() and not _allows_none(field.annotation):
+                del cleaned[key]
+        else:
+            cleaned[key] = _drop_nested_nulls(cleaned[key], field.annotation)
+    return cleaned
+
+
+def _drop_nested_nulls(value: Any, annotation: Any) -> Any:
+    """Apply drop_disallowed_nulls to the models nested in a field value"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return drop_disallowed_nulls(value, annotation)
+    origin = get_origin(annotation)
+    if origin is list and isinstance(value, list):
+        item_type = (get_args(annotation) or (Any,))[0]
+        return [_drop_nested_nulls(item, item_type) for item in value]
+    if origin in (Union, types.UnionType):
+        for option in get_args(annotation):
+            is_model = isinstance(option, type) and issubclass(option, BaseModel)
+            if (isinstance(value, dict) and is_model) or (isinstance(value, list) and get_origin(option) is list):
+                return _drop_nested_nulls(value, option)
+    return value
+
+
+def _allows_none(annotation: Any) -> bool:
+    """Whether a field annotation accepts None"""
+    if annotation is None or annotation is type(None) or annotation is Any:
+        return True
+    if get_origin(annotation) in (Union, types.UnionType):
+        return any(_allows_none(option) for option in get_args(annotation))
+    return False
+
+
+class CompiledSchema(BaseModel):
+    """Schema prompt built once per response model"""
+    model_name: str
+    schema_dict: Dict[str, Any]
+    text: str
+    strict_schema: Optional[Dict[str, Any]] = None
+    fingerprint: str
+    token_count: int
+    original_token_count: int
+
+
+class SchemaPromptRegistry:
+    """Builds and memoizes compact schema prompts per response model class"""
+
+    def __init__(self, max_description_length: int = 80):
+        """
+        Args:
+            max_description_length: Longest field description kept in compiled schemas
+        """
+        self.max_description_length = max_description_length
+        self._compiled: Dict[Type[BaseModel], CompiledSchema] = {}
+        self._lock = threading.Lock()
+
+    def get(self, response_model: Type[BaseModel]) -> CompiledSchema:
+        """
+        Get the compiled schema for a response model, building it on first use
+
+        Args:
+            response_model: Pydantic model class
+
+        Returns:
+            CompiledSchema for the model
+        """
+        compiled = self._compiled.get(response_model)
+        if compiled is None:
+            with self._lock:
+                compiled = self._compiled.get(response_model)
+                if compiled is None:
+                    compiled = self._compile(response_model)
+                    self._compiled[response_model] = compiled
+        return compiled
+
+    def _compile(self, response_model: Type[BaseModel]) -> CompiledSchema:
+        schema = response_model.model_json_schema()
+        compacted = compact_schema(schema, self.max_description_length)
+        text = json.dumps(compacted, separators=(",", ":"), ensure_ascii=False)
+        return CompiledSchema(
+            model_name=response_model.__name__,
+            schema_dict=compacted,
+            text=text,
+            strict_schema=to_strict_schema(compacted),
+            fingerprint=hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            token_count=estimate_tokens(text),
+            original_token_count=estimate_tokens(json.dumps(schema, indent=2))
+        )
+
+    def report(self, models: Optional[Iterable[Type[BaseModel]]] = None) -> List[Dict[str, Any]]:
+        """
+        Report schema prompt sizes, compiling any models passed in
+
+        Args:
+            models: Models to include; defaults to every model compiled so far
+
+        Returns:
+            One dict per model with compact and original token counts
+        """
+        if models is not None:
+            compiled = [self.get(model) for model in models]
+        else:
+            compiled = list(self._compiled.values())
+        return [
+            {
+                "model": item.model_name,
+                "tokens": item.token_count,
+                "original_tokens": item.original_token_count,
+                "saved_tokens": item.original_token_count - item.token_count,
+            }
+            for item in compiled
+        ]
+
+    def clear(self) -> None:
+        """Forget all compiled schemas"""
+        with self._lock:
+            self._compiled.clear()
+
+
+# Process-wide registry shared by AI services
+schema_registry = SchemaPromptRegistry()
@@ -0,0 +1,133 @@
+"""
+Coalescing of identical in-flight calls
+
+While a call for a key is running, further calls for the same key wait for
+it and share its result instead of starting their own. Blocking callers are
+coalesced across threads, async callers across the tasks of one event loop.
+"""
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+
+R = TypeVar("R")
+
+
+class SingleFlightStats:
+    """Counters for coalesced calls"""
+
+    def __init__(self):
+        self.calls = 0  # calls that ran
+        self.deduplicated = 0  # calls that waited for another one instead
+
+    @property
+    def dedup_rate(self) -> float:
+        """Fraction of calls served by another in-flight call"""
+        total = self.calls + self.deduplicated
+        return self.deduplicated / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        """Counters as a plain dict"""
+        return {"calls": self.calls, "deduplicated": self.deduplicated, "dedup_rate": self.dedup_rate}
+
+
+class _Call:
+    """A blocking call in flight"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and shares its outcome with concurrent callers"""
+
+    def __init__(self):
+        self.stats = SingleFlightStats()
+        self._calls: Dict[str, _Call] = {}
+        # Tasks are bound to their event loop, so they are kept per loop
+        self._tasks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], R]) -> Tuple[R, bool]:
+        """
+        Run fn, or wait for the call already running for key
+
+        Args:
+            key: Identity of the call
+            fn: Function producing the result
+
+        Returns:
+            (result, shared) where shared is True if another caller's result was reused
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.stats.calls += 1
+            else:
+                self.stats.deduplicated += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[R]]) -> Tuple[R, bool]:
+        """
+        Async variant of do
+
+        The call runs as its own task, so a caller that is cancelled does not
+        cancel the call for the callers still waiting on it.
+
+        Args:
+            key: Identity of the call
+            fn: Coroutine function producing the result
+
+        Returns:
+            (result, shared) where shared is True if another caller's result was reused
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            tasks = self._tasks.setdefault(loop, {})
+            task = tasks.get(key)
+            shared = task is not None
+            if shared:
+                self.stats.deduplicated += 1
+            else:
+                task = loop.create_task(fn())
+                tasks[key] = task
+                self.stats.calls += 1
+                task.add_done_callback(lambda done: self._forget(tasks, key, done))
+        return await asyncio.shield(task), shared
+
+    def _forget(self, tasks: Dict[str, asyncio.Task], key: str, task: asyncio.Task) -> None:
+        """Drop a finished task, marking its error as retrieved if every caller gave up"""
+        with self._lock:
+            if tasks.get(key) is task:
+                del tasks[key]
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        """Number of keys with a call running"""
+        with self._lock:
+            return len(self._calls) + sum(len(tasks) for tasks in self._tasks.values())
@@ -0,0 +1,116 @@
+"""
+Per-stage model tiering for AI service calls
+
+Components label every call with a stage such as
+`fit_score.parse_job_requirements`. A stage policy picks the provider, model
+and generation limits for those calls, so lightweight stages can run on small
+fast models while quality-critical ones keep the large model.
+
+Policies match by dotted prefix: a `fit_score` entry applies to every
+`fit_score.*` stage, and a more specific entry overrides it field by field.
+"""
+import os
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+
+from .config import AIConfig
+
+
+class StagePolicy(BaseModel):
+    """Provider and generation settings for a stage; unset fields keep the service defaults"""
+    provider: Optional[str] = None
+    model: Optional[str] = None
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    timeout: Optional[float] = None  # seconds per provider call
+    input_budget: Optional[int] = None  # tokens of long input (resume, job description) sent
+
+
+class StagePolicies:
+    """Stage policies resolved by dotted prefix"""
+
+    def __init__(self, policies: Dict[str, StagePolicy] = None):
+        """
+        Args:
+            policies: Policies keyed by stage or stage prefix
+        """
+        self.policies = policies or {}
+
+    def resolve(self, stage: Optional[str]) -> StagePolicy:
+        """
+        Merge the policies matching a stage, most specific last
+
+        Args:
+            stage: Stage label (None resolves to an empty policy)
+
+        Returns:
+            Effective policy for the stage
+        """
+        merged: Dict[str, Any] = {}
+        if stage:
+            parts = stage.split(".")
+            for depth in range(1, len(parts) + 1):
+                policy = self.policies.get(".".join(parts[:depth]))
+                if policy is not None:
+                    merged.update(policy.model_dump(exclude_none=True))
+        return StagePolicy(**merged)
+
+    def __bool__(self) -> bool:
+        return bool(self.policies)
+
+
+def load_stage_file(path: str) -> Dict[str, StagePolicy]:
+    """
+    Read stage policies from a YAML file (needs PyYAML)
+
+    The file maps stages to policies, optionally under a top-level `stages` key:
+
+        stages:
+          fit_score.parse_job_requirements:
+            model: gpt-4o-mini
+            max_tokens: 1000
+            timeout: 20
+
+    Args:
+        path: YAML file path
+
+    Returns:
+        Policies keyed by stage
+    """
+    try:
+        import yaml
+    except ImportError:
+        raise ImportError("Stage policy files require the PyYAML package")
+
+    with open(path, encoding="utf-8") as file:
+        data = yaml.safe_load(file) or {}
+    if not isinstance(data, dict):
+        raise ValueError(f"Stage policy file must contain a mapping: {path}")
+    stages = data.get("stages", data)
+    return {str(stage): StagePolicy(**(settings or {})) for stage, settings in stages.items()}
+
+
+def create_stage_policies(config: AIConfig) -> StagePolicies:
+    """
+    Create the stage policies described by the configuration
+
+    Entries from BLACKTABLE_STAGES override the ones read from
+    BLACKTABLE_STAGES_FILE field by field.
+
+    Args:
+        config: AI configuration
+
+    Returns:
+        StagePolicies instance
+    """
+    policies: Dict[str, StagePolicy] = {}
+    path = config.get_stages_file()
+    if path:
+        if not os.path.exists(path):
+            raise ValueError(f"Stage policy file not found: {path}")
+        policies.update(load_stage_file(path))
+    for stage, settings in config.get_stage_models().items():
+        base = policies[stage].model_dump(exclude_none=True) if stage in policies else {}
+        base.update({key: value for key, value in settings.items() if value is not None})
+        policies[stage] = StagePolicy(**base)
+    return StagePolicies(policies)
@@ -0,0 +1,180 @@
+"""
+Incremental parsing of streamed structured responses
+"""
+import enum
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Type, Union, get_args, get_origin
+from pydantic import BaseModel, create_model
+
+
+_STRUCTURAL_CHARS = set(',:{}[]"')
+
+
+def _scan(text: str) -> Tuple[List[str], bool, bool, List[int]]:
+    """
+    Scan JSON text outside of strings
+
+    Returns:
+        (open bracket stack, whether text ends inside a string, whether it ends
+        on an unfinished escape, positions of structural characters usable as
+        cut points)
+    """
+    stack: List[str] = []
+    cut_points: List[int] = []
+    in_string = False
+    escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append(char)
+            cut_points.append(index)
+        elif char in "}]":
+            if stack:
+                stack.pop()
+        elif char == ",":
+            cut_points.append(index)
+    return stack, in_string, escaped, cut_points
+
+
+def _close(text: str) -> str:
+    """Close an open string and all open brackets of truncated JSON"""
+    stack, in_string, escaped, _ = _scan(text)
+    if in_string:
+        # Drop a dangling escape so the closing quote is not swallowed
+        if escaped:
+            text = text[:-1]
+        text += '"'
+    text = text.rstrip()
+    if text.endswith(","):
+        text = text[:-1]
+    closers = {"{": "}", "[": "]"}
+    return text + "".join(closers[bracket] for bracket in reversed(stack))
+
+
+def parse_partial_json(text: str) -> Optional[Any]:
+    """
+    Parse the longest valid prefix of truncated JSON
+
+    Open strings and brackets are closed; an incomplete trailing member (a key
+    without a value, a half-written literal) is dropped.
+
+    Args:
+        text: JSON text that may be cut off mid-document
+
+    Returns:
+        Parsed value, or None if no usable prefix exists yet
+    """
+    start = min((index for index in (text.find("{"), text.find("[")) if index >= 0), default=-1)
+    if start < 0:
+        return None
+    candidate = text[start:]
+
+    while candidate:
+        try:
+            return json.loads(_close(candidate))
+        except json.JSONDecodeError:
+            pass
+        _, _, _, cut_points = _scan(candidate)
+        if not cut_points:
+            return None
+        cut = cut_points[-1]
+        # Keep an opening bracket, drop everything from a trailing comma on
+        candidate = candidate[:cut + 1] if candidate[cut] in "{[" and cut + 1 < len(candidate) else candidate[:cut]
+    return None
+
+
+class PartialJSONParser:
+    """Accumulates streamed text and re-parses it when the structure may have changed"""
+
+    def __init__(self, min_chars_between_parses: int = 64):
+        """
+        Args:
+            min_chars_between_parses: Plain text received before re-parsing
+                without a structural character (bounds the quadratic re-parse cost)
+        """
+        self.text = ""
+        self.min_chars_between_parses = min_chars_between_parses
+        self._last_value = None
+        self._last_parsed_length = 0
+
+    def feed(self, chunk: str) -> Optional[Any]:
+        """
+        Add a chunk of streamed text
+
+        Args:
+            chunk: Newly received text
+
+        Returns:
+            The newly parsed value when it changed, otherwise None
+        """
+        self.text += chunk
+        structural = bool(_STRUCTURAL_CHARS.intersection(chunk))
+        if not structural and len(self.text) - self._last_parsed_length < self.min_chars_between_parses:
+            return None
+        self._last_parsed_length = len(self.text)
+        value = parse_partial_json(self.text)
+        if value is None or value == self._last_value:
+            return None
+        self._last_value = value
+        return value
+
+
+_partial_models: Dict[Type[BaseModel], Type[BaseModel]] = {}
+_partial_models_lock = threading.RLock()
+
+
+def make_partial_model(model: Type[BaseModel]) -> Type[BaseModel]:
+    """
+    Build a variant of model whose fields, recursively, are all optional
+
+    Partial models accept the incomplete objects produced while a response is
+    still streaming. Field constraints are dropped and enums relax to strings
+    so half-written values do not fail validation.
+
+    Args:
+        model: Pydantic model class
+
+    Returns:
+        Partial model class (memoized per model)
+    """
+    with _partial_models_lock:
+        partial = _partial_models.get(model)
+        if partial is not None:
+            return partial
+
+        fields = {
+            name: (Optional[_partial_annotation(field.annotation)], None)
+            for name, field in model.model_fields.items()
+        }
+        partial = create_model(f"Partial{model.__name__}", __doc__=model.__doc__, **fields)
+        _partial_models[model] = partial
+        return partial
+
+
+def _partial_annotation(annotation: Any) -> Any:
+    if isinstance(annotation, type):
+        if issubclass(annotation, BaseModel):
+            return make_partial_model(annotation)
+        if issubclass(annotation, enum.Enum):
+            return str
+        return annotation
+
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+    if origin in (list, List):
+        return List[_partial_annotation(args[0])] if args else list
+    if origin in (dict, Dict):
+        return Dict[args[0], _partial_annotation(args[1])] if args else dict
+    if origin is Union:
+        return Union[tuple(_partial_annotation(arg) for arg in args)]
+    return annotation
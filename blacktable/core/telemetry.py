@@ -0,0 +1,256 @@
+"""
+Per-call telemetry for AI service requests
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field
+
+
+# USD per million tokens: (input, cached input, output)
+MODEL_PRICES: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "claude-3-haiku": (0.25, 0.03, 1.25),
+    "claude-3-5-haiku": (0.80, 0.08, 4.00),
+    "claude-3-sonnet": (3.00, 0.30, 15.00),
+    "claude-3-5-sonnet": (3.00, 0.30, 15.00),
+    "claude-3-7-sonnet": (3.00, 0.30, 15.00),
+    "claude-3-opus": (15.00, 1.50, 75.00),
+}
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> Optional[float]:
+    """
+    Estimate the USD cost of a call from list prices
+
+    Args:
+        model: Model name; dated snapshots match their family by prefix
+        prompt_tokens: Input tokens, including cached ones
+        completion_tokens: Output tokens
+        cached_tokens: Input tokens served from the provider's prompt cache
+
+    Returns:
+        Estimated cost, or None for models without a known price
+    """
+    matches = [name for name in MODEL_PRICES if model.startswith(name)]
+    if not matches:
+        return None
+    input_price, cached_price, output_price = MODEL_PRICES[max(matches, key=len)]
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (uncached * input_price + cached_tokens * cached_price + completion_tokens * output_price) / 1_000_000
+
+
+class CallRecord(BaseModel):
+    """Telemetry for one AI service call"""
+    timestamp: float = Field(default_factory=time.time)
+    stage: Optional[str] = None
+    provider: str
+    model: str
+    kind: str  # "structured", "text", "stream" or "reask"
+    cache_hit: bool = False
+    deduplicated: bool = False  # answered by an identical call already in flight
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    queue_time: float = 0.0  # seconds waiting for rate limiter budget
+    time_to_first_token: Optional[float] = None  # streams only
+    latency: float = 0.0  # seconds from sending the request to the full response
+    cost: Optional[float] = None
+    error: Optional[str] = None
+
+
+class BaseTelemetrySink:
+    """Destination for call records"""
+
+    def emit(self, record: CallRecord) -> None:
+        """Handle one call record"""
+        raise NotImplementedError
+
+
+class RingBufferSink(BaseTelemetrySink):
+    """Keeps the most recent call records in memory"""
+
+    def __init__(self, max_records: int = 1000):
+        """
+        Args:
+            max_records: Records kept before the oldest are dropped
+        """
+        self._records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def emit(self, record: CallRecord) -> None:
+        with self._lock:
+            self._records.append(record)
+
+    def records(self, stage: Optional[str] = None) -> List[CallRecord]:
+        """Buffered records, optionally for one stage"""
+        with self._lock:
+            records = list(self._records)
+        return [record for record in records if stage is None or record.stage == stage]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Aggregate buffered records per stage
+
+        Returns:
+            Per stage: calls, errors, cache_hits, deduplicated, prompt/completion/cached tokens,
+            cost, total and p95 latency, and total queue time
+        """
+        grouped: Dict[str, List[CallRecord]] = {}
+        for record in self.records():
+            grouped.setdefault(record.stage or "unlabeled", []).append(record)
+
+        summary = {}
+        for stage, records in grouped.items():
+            latencies = sorted(
+                record.latency for record in records if not (record.cache_hit or record.deduplicated)
+            )
+            summary[stage] = {
+                "calls": len(records),
+                "errors": sum(1 for record in records if record.error),
+                "cache_hits": sum(1 for record in records if record.cache_hit),
+                "deduplicated": sum(1 for record in records if record.deduplicated),
+                "prompt_tokens": sum(record.prompt_tokens for record in records),
+                "completion_tokens": sum(record.completion_tokens for record in records),
+                "cached_tokens": sum(record.cached_tokens for record in records),
+                "cost": sum(record.cost or 0.0 for record in records),
+                "latency": sum(latencies),
+                "p95_latency": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else 0.0,
+                "queue_time": sum(record.queue_time for record in records),
+            }
+        return summary
+
+    def clear(self) -> None:
+        """Drop all buffered records"""
+        with self._lock:
+            self._records.clear()
+
+
+class JSONLSink(BaseTelemetrySink):
+    """Appends call records to a JSON Lines file"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: File to append to (created if missing)
+        """
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def emit(self, record: CallRecord) -> None:
+        line = record.model_dump_json() + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(line)
+
+
+_prometheus_metrics = None
+_prometheus_lock = threading.Lock()
+
+
+def _get_prometheus_metrics():
+    """Create the Prometheus metrics once per process"""
+    global _prometheus_metrics
+    with _prometheus_lock:
+        if _prometheus_metrics is None:
+            from prometheus_client import Counter, Histogram
+
+            labels = ["stage", "provider", "model"]
+            _prometheus_metrics = {
+                "calls": Counter("blacktable_llm_calls_total", "AI service calls", labels + ["outcome"]),
+                "tokens": Counter("blacktable_llm_tokens_total", "Tokens used", labels + ["kind"]),
+                "cost": Counter("blacktable_llm_cost_usd_total", "Estimated cost in USD", labels),
+                "latency": Histogram("blacktable_llm_latency_seconds", "Response latency", labels),
+                "queue": Histogram("blacktable_llm_queue_seconds", "Rate limiter wait", labels),
+            }
+        return _prometheus_metrics
+
+
+class PrometheusSink(BaseTelemetrySink):
+    """Exports call records as Prometheus metrics (needs prometheus_client)"""
+
+    def __init__(self):
+        try:
+            self.metrics = _get_prometheus_metrics()
+        except ImportError:
+            raise ImportError("PrometheusSink requires the prometheus_client package")
+
+    def emit(self, record: CallRecord) -> None:
+        labels = {"stage": record.stage or "unlabeled", "provider": record.provider, "model": record.model}
+        if record.cache_hit:
+            outcome = "cache_hit"
+        elif record.deduplicated:
+            outcome = "deduplicated"
+        else:
+            outcome = "error" if record.error else "ok"
+        self.metrics["calls"].labels(outcome=outcome, **labels).inc()
+        if record.cache_hit or record.deduplicated:
+            return
+        for kind in ("prompt", "completion", "cached"):
+            tokens = getattr(record, f"{kind}_tokens")
+            if tokens:
+                self.metrics["tokens"].labels(kind=kind, **labels).inc(tokens)
+        if record.cost:
+            self.metrics["cost"].labels(**labels).inc(record.cost)
+        self.metrics["latency"].labels(**labels).observe(record.latency)
+        self.metrics["queue"].labels(**labels).observe(record.queue_time)
+
+
+class Telemetry:
+    """Fans call records out to sinks"""
+
+    def __init__(self, sinks: List[BaseTelemetrySink] = None):
+        """
+        Args:
+            sinks: Record destinations
+        """
+        self.sinks = sinks or []
+
+    def emit(self, record: CallRecord) -> None:
+        """Send a record to every sink; a failing sink never breaks the call"""
+        for sink in self.sinks:
+            try:
+                sink.emit(record)
+            except Exception as e:
+                print(f"Warning: telemetry sink {type(sink).__name__} failed: {e}")
+
+    @property
+    def ring(self) -> Optional[RingBufferSink]:
+        """The first in-memory sink, if any"""
+        return next((sink for sink in self.sinks if isinstance(sink, RingBufferSink)), None)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage aggregates of the in-memory sink"""
+        return self.ring.summary() if self.ring else {}
+
+
+def create_telemetry(sinks: str, jsonl_path: str = None) -> Telemetry:
+    """
+    Create telemetry from a comma-separated list of sink names
+
+    Args:
+        sinks: Any of "memory", "jsonl" and "prometheus"; "none" disables telemetry
+        jsonl_path: File for the JSONL sink
+
+    Returns:
+        Telemetry instance
+    """
+    created: List[BaseTelemetrySink] = []
+    for name in (name.strip() for name in sinks.split(",")):
+        if name in ("", "none", "off"):
+            continue
+        if name == "memory":
+            created.append(RingBufferSink())
+        elif name == "jsonl":
+            created.append(JSONLSink(jsonl_path))
+        elif name == "prometheus":
+            created.append(PrometheusSink())
+        else:
+            raise ValueError(f"Unsupported telemetry sink: {name}")
+    return Telemetry(created)
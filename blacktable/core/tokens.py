@@ -0,0 +1,143 @@
+"""
+Token estimation and counting helpers
+"""
+import math
+import threading
+from typing import Dict, Optional
+
+
+# Rough average for English prose and JSON with GPT/Claude style BPE tokenizers
+CHARS_PER_TOKEN = 4
+# Claude's tokenizer splits text into somewhat more tokens than OpenAI's
+CLAUDE_CHARS_PER_TOKEN = 3.5
+
+# Model families counted with tiktoken, and the encoding to use when tiktoken
+# does not know the exact model name yet
+OPENAI_ENCODINGS = {
+    "gpt-4o": "o200k_base",
+    "gpt-4.1": "o200k_base",
+    "o1": "o200k_base",
+    "o3": "o200k_base",
+    "o4": "o200k_base",
+    "gpt-4": "cl100k_base",
+    "gpt-3.5": "cl100k_base",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in text
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Approximate token count
+    """
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class TokenCounter:
+    """Counts tokens the way one model's tokenizer does"""
+
+    # Whether counts come from the model's real tokenizer
+    exact = False
+
+    def count(self, text: str) -> int:
+        """Number of tokens in text"""
+        raise NotImplementedError
+
+
+class HeuristicCounter(TokenCounter):
+    """Character-ratio estimate for models without a local tokenizer"""
+
+    def __init__(self, chars_per_token: float = CHARS_PER_TOKEN):
+        """
+        Args:
+            chars_per_token: Average characters per token
+        """
+        self.chars_per_token = chars_per_token
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return math.ceil(len(text) / self.chars_per_token)
+
+
+class TiktokenCounter(TokenCounter):
+    """Exact counts for OpenAI models (needs tiktoken)"""
+
+    exact = True
+
+    def __init__(self, model: str):
+        """
+        Args:
+            model: OpenAI model name
+        """
+        import tiktoken
+
+        try:
+            self.encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            family = max((name for name in OPENAI_ENCODINGS if model.startswith(name)), key=len, default=None)
+            self.encoding = tiktoken.get_encoding(OPENAI_ENCODINGS.get(family, "o200k_base"))
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        # Special-token text in resumes is content, not control tokens
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+_counters: Dict[str, TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(model: Optional[str] = None) -> TokenCounter:
+    """
+    Get the token counter for a model
+
+    OpenAI models are counted exactly with tiktoken when it is installed.
+    Anthropic only counts tokens through its API, so Claude models (and
+    anything unknown) use a character-ratio estimate.
+
+    Args:
+        model: Model name (None for the generic estimate)
+
+    Returns:
+        Token counter, shared per model
+    """
+    key = model or ""
+    with _counters_lock:
+        counter = _counters.get(key)
+        if counter is None:
+            counter = _create_counter(key)
+            _counters[key] = counter
+        return counter
+
+
+def _create_counter(model: str) -> TokenCounter:
+    if model.startswith("claude"):
+        return HeuristicCounter(CLAUDE_CHARS_PER_TOKEN)
+    if any(model.startswith(name) for name in OPENAI_ENCODINGS):
+        try:
+            return TiktokenCounter(model)
+        except ImportError:
+            pass
+    return HeuristicCounter()
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Count the tokens of text for a model
+
+    Args:
+        text: Text to measure
+        model: Model name (None for the generic estimate)
+
+    Returns:
+        Token count, exact where a local tokenizer is available
+    """
+    return get_token_counter(model).count(text)
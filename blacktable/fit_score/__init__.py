@@ -1,7 +1,9 @@
 """
 FIT_Score module
 """
-from .matcher import FITScoreMatcher
+import importlib
+from typing import Any, List
+
 from .models import FITScoreResult, JobRequirements, DetailedAnalysis, SkillMatch, Strength, Gap
 
 __all__ = [
@@ -13,3 +15,15 @@ __all__ = [
     "Strength",
     "Gap"
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name == "FITScoreMatcher":
+        value = importlib.import_module(".matcher", __name__).FITScoreMatcher
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
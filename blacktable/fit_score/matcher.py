@@ -1,24 +1,27 @@
 """
 FIT_Score Matcher - Main matching class
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from ..core.ai_service import AIService
+from ..core.batch import BaseBatchBackend, BatchRequest
+from ..core.clients import get_ai_service
 from ..resume_parser.models import ResumeData
-from .models import FITScoreResult, JobRequirements, DetailedAnalysis
+from .models import FITScoreResult, JobRequirements, DetailedAnalysis, OverallScoreResponse
 from .analyzer import FITScoreAnalyzer
 
 
 class FITScoreMatcher:
     """AI-powered resume and job description matcher"""
     
-    def __init__(self, ai_provider: str = "openai"):
+    def __init__(self, ai_provider: str = "openai", ai_service: Optional[AIService] = None):
         """
         Initialize FIT Score Matcher
         
         Args:
             ai_provider: AI service provider ("openai" or "anthropic")
+            ai_service: AI service to use; defaults to the shared service for ai_provider
         """
-        self.ai_service = AIService(provider=ai_provider)
+        self.ai_service = ai_service or get_ai_service(ai_provider)
         self.analyzer = FITScoreAnalyzer()
     
     def calculate_fit_score(
@@ -54,10 +57,156 @@ class FITScoreMatcher:
             resume_data, job_requirements, detailed_analysis, component_scores
         )
         
-        # Step 5: Generate recommendations
+        # Step 5 & 6: Generate recommendations and create final result
+        return self._build_result(detailed_analysis, component_scores, overall_score)
+    
+    async def acalculate_fit_score(
+        self, 
+        resume_data: ResumeData, 
+        job_description: str
+    ) -> FITScoreResult:
+        """
+        Async variant of calculate_fit_score
+        
+        Args:
+            resume_data: Parsed resume data
+            job_description: Job description text
+            
+        Returns:
+            FITScoreResult: Complete FIT analysis
+        """
+        job_requirements = await self._aparse_job_requirements(job_description)
+        detailed_analysis = await self._aperform_detailed_analysis(resume_data, job_requirements)
+        component_scores = self.analyzer.calculate_component_scores(
+            detailed_analysis.skill_matches,
+            detailed_analysis.experience_matches,
+            detailed_analysis.education_match
+        )
+        overall_score = await self._acalculate_overall_score(
+            resume_data, job_requirements, detailed_analysis, component_scores
+        )
+        return self._build_result(detailed_analysis, component_scores, overall_score)
+    
+    def calculate_fit_scores_batch(
+        self,
+        pairs: List[Tuple[ResumeData, str]],
+        poll_interval: float = 30.0,
+        timeout: Optional[float] = None,
+        backend: BaseBatchBackend = None
+    ) -> List[Optional[FITScoreResult]]:
+        """
+        Calculate many FIT scores through the provider's offline batch API
+
+        The pipeline runs as three batches: job requirement parsing (one request
+        per distinct job description), assessments, then overall scores.
+        Failed assessments and scores fall back as in calculate_fit_score.
+
+        Args:
+            pairs: (resume data, job description) pairs
+            poll_interval: Seconds between batch status polls
+            timeout: Give up on a batch after this many seconds
+            backend: Batch backend; defaults to the one matching the provider
+
+        Returns:
+            FITScoreResult per pair, in order; None where the job description
+            could not be parsed
+        """
+        batch_options = {"poll_interval": poll_interval, "timeout": timeout, "backend": backend}
+
+        # Stage 1: parse each distinct job description once
+        job_ids: Dict[str, str] = {}
+        job_batch = []
+        for _, job_description in pairs:
+            if job_description in job_ids:
+                continue
+            job_ids[job_description] = f"job-{len(job_ids)}"
+            system_prompt, extraction_prompt = self._build_job_requirements_prompts(job_description)
+            job_batch.append(BatchRequest(
+                custom_id=job_ids[job_description],
+                prompt=extraction_prompt,
+                response_model=JobRequirements,
+                system_prompt=system_prompt
+            ))
+        job_results = self.ai_service.run_batch(job_batch, **batch_options)
+
+        # Stage 2: assessments for pairs with parsed requirements
+        contexts: Dict[int, Dict[str, Any]] = {}
+        assessment_batch = []
+        for index, (resume_data, job_description) in enumerate(pairs):
+            job_result = job_results[job_ids[job_description]]
+            if not job_result.ok:
+                continue
+            job_requirements = job_result.result
+            local_analysis = self._perform_local_analysis(resume_data, job_requirements)
+            contexts[index] = {
+                "resume_data": resume_data,
+                "job_requirements": job_requirements,
+                "local_analysis": local_analysis
+            }
+            system_prompt, assessment_prompt = self._build_assessment_prompts(
+                resume_data,
+                job_requirements,
+                local_analysis["skill_matches"],
+                local_analysis["experience_matches"],
+                local_analysis["education_match"]
+            )
+            assessment_batch.append(BatchRequest(
+                custom_id=f"assessment-{index}",
+                prompt=assessment_prompt,
+                system_prompt=system_prompt
+            ))
+        assessment_results = self.ai_service.run_batch(assessment_batch, **batch_options) if assessment_batch else {}
+
+        # Stage 3: overall scores
+        score_batch = []
+        for index, context in contexts.items():
+            assessment_result = assessment_results[f"assessment-{index}"]
+            overall_assessment = (
+                assessment_result.result.strip() if assessment_result.ok
+                else "Assessment could not be generated automatically."
+            )
+            detailed_analysis = DetailedAnalysis(overall_assessment=overall_assessment, **context["local_analysis"])
+            component_scores = self.analyzer.calculate_component_scores(
+                detailed_analysis.skill_matches,
+                detailed_analysis.experience_matches,
+                detailed_analysis.education_match
+            )
+            context["detailed_analysis"] = detailed_analysis
+            context["component_scores"] = component_scores
+            system_prompt, scoring_prompt = self._build_overall_score_prompts(
+                context["resume_data"], context["job_requirements"], detailed_analysis, component_scores
+            )
+            score_batch.append(BatchRequest(
+                custom_id=f"score-{index}",
+                prompt=scoring_prompt,
+                response_model=OverallScoreResponse,
+                system_prompt=system_prompt
+            ))
+        score_results = self.ai_service.run_batch(score_batch, **batch_options) if score_batch else {}
+
+        results: List[Optional[FITScoreResult]] = []
+        for index in range(len(pairs)):
+            context = contexts.get(index)
+            if context is None:
+                results.append(None)
+                continue
+            score_result = score_results[f"score-{index}"]
+            overall_score = (
+                score_result.result.model_dump() if score_result.ok
+                else self._fallback_overall_score(context["component_scores"])
+            )
+            results.append(self._build_result(context["detailed_analysis"], context["component_scores"], overall_score))
+        return results
+    
+    def _build_result(
+        self,
+        detailed_analysis: DetailedAnalysis,
+        component_scores: Dict[str, float],
+        overall_score: Dict[str, Any]
+    ) -> FITScoreResult:
+        """Generate recommendations and assemble the final FIT score result"""
         recommendations = self._generate_recommendations(detailed_analysis)
         
-        # Step 6: Create final result
         return FITScoreResult(
             score=overall_score["score"],
             category=overall_score["category"],
@@ -76,6 +225,38 @@ class FITScoreMatcher:
     
     def _parse_job_requirements(self, job_description: str) -> JobRequirements:
         """Parse job description to extract structured requirements"""
+        system_prompt, extraction_prompt = self._build_job_requirements_prompts(job_description)
+        
+        try:
+            job_requirements = self.ai_service.generate_structured_response(
+                prompt=extraction_prompt,
+                response_model=JobRequirements,
+                system_prompt=system_prompt,
+                stage="fit_score.parse_job_requirements"
+            )
+            return job_requirements
+        except Exception as e:
+            raise ValueError(f"Failed to parse job requirements: {e}")
+    
+    async def _aparse_job_requirements(self, job_description: str) -> JobRequirements:
+        """Async variant of _parse_job_requirements"""
+        system_prompt, extraction_prompt = self._build_job_requirements_prompts(job_description)
+        
+        try:
+            return await self.ai_service.agenerate_structured_response(
+                prompt=extraction_prompt,
+                response_model=JobRequirements,
+                system_prompt=system_prompt,
+                stage="fit_score.parse_job_requirements"
+            )
+        except Exception as e:
+            raise ValueError(f"Failed to parse job requirements: {e}")
+    
+    def _build_job_requirements_prompts(self, job_description: str) -> Tuple[str, str]:
+        """Build the (system prompt, extraction prompt) pair for a job description"""
+        job_description, report = self.ai_service.fit_input(job_description, stage="fit_score.parse_job_requirements")
+        if report.compacted:
+            print(f"Warning: job description compacted to fit the token budget: {report.summary()}")
         system_prompt = """
 You are an expert at analyzing job descriptions and extracting structured requirements.
 Extract all relevant information including required skills, preferred skills, experience requirements, 
@@ -100,16 +281,7 @@ Extract:
 
 Be thorough and accurate in extraction.
 """
-        
-        try:
-            job_requirements = self.ai_service.generate_structured_response(
-                prompt=extraction_prompt,
-                response_model=JobRequirements,
-                system_prompt=system_prompt
-            )
-            return job_requirements
-        except Exception as e:
-            raise ValueError(f"Failed to parse job requirements: {e}")
+        return system_prompt, extraction_prompt
     
     def _perform_detailed_analysis(
         self, 
@@ -117,6 +289,43 @@ Be thorough and accurate in extraction.
         job_requirements: JobRequirements
     ) -> DetailedAnalysis:
         """Perform detailed analysis of resume vs job requirements"""
+        local_analysis = self._perform_local_analysis(resume_data, job_requirements)
+        
+        # Generate overall assessment using AI
+        overall_assessment = self._generate_overall_assessment(
+            resume_data,
+            job_requirements,
+            local_analysis["skill_matches"],
+            local_analysis["experience_matches"],
+            local_analysis["education_match"]
+        )
+        
+        return DetailedAnalysis(overall_assessment=overall_assessment, **local_analysis)
+    
+    async def _aperform_detailed_analysis(
+        self, 
+        resume_data: ResumeData, 
+        job_requirements: JobRequirements
+    ) -> DetailedAnalysis:
+        """Async variant of _perform_detailed_analysis"""
+        local_analysis = self._perform_local_analysis(resume_data, job_requirements)
+        
+        overall_assessment = await self._agenerate_overall_assessment(
+            resume_data,
+            job_requirements,
+            local_analysis["skill_matches"],
+            local_analysis["experience_matches"],
+            local_analysis["education_match"]
+        )
+        
+        return DetailedAnalysis(overall_assessment=overall_assessment, **local_analysis)
+    
+    def _perform_local_analysis(
+        self, 
+        resume_data: ResumeData, 
+        job_requirements: JobRequirements
+    ) -> Dict[str, Any]:
+        """Run the non-AI part of the detailed analysis"""
         
         # Analyze skill matches
         skill_matches = self.analyzer.analyze_skill_matches(
@@ -143,19 +352,13 @@ Be thorough and accurate in extraction.
         # Identify gaps
         gaps = self.analyzer.identify_gaps(skill_matches, experience_matches)
         
-        # Generate overall assessment using AI
-        overall_assessment = self._generate_overall_assessment(
-            resume_data, job_requirements, skill_matches, experience_matches, education_match
-        )
-        
-        return DetailedAnalysis(
-            skill_matches=skill_matches,
-            experience_matches=experience_matches,
-            education_match=education_match,
-            strengths=strengths,
-            gaps=gaps,
-            overall_assessment=overall_assessment
-        )
+        return {
+            "skill_matches": skill_matches,
+            "experience_matches": experience_matches,
+            "education_match": education_match,
+            "strengths": strengths,
+            "gaps": gaps
+        }
     
     def _calculate_overall_score(
         self, 
@@ -165,6 +368,52 @@ Be thorough and accurate in extraction.
         component_scores: Dict[str, float]
     ) -> Dict[str, Any]:
         """Calculate overall FIT score using AI analysis"""
+        system_prompt, scoring_prompt = self._build_overall_score_prompts(
+            resume_data, job_requirements, detailed_analysis, component_scores
+        )
+        
+        try:
+            response = self.ai_service.generate_structured_response(
+                prompt=scoring_prompt,
+                response_model=OverallScoreResponse,
+                system_prompt=system_prompt,
+                stage="fit_score.overall_score"
+            )
+            return response.model_dump()
+        except Exception as e:
+            return self._fallback_overall_score(component_scores)
+    
+    async def _acalculate_overall_score(
+        self, 
+        resume_data: ResumeData,
+        job_requirements: JobRequirements,
+        detailed_analysis: DetailedAnalysis,
+        component_scores: Dict[str, float]
+    ) -> Dict[str, Any]:
+        """Async variant of _calculate_overall_score"""
+        system_prompt, scoring_prompt = self._build_overall_score_prompts(
+            resume_data, job_requirements, detailed_analysis, component_scores
+        )
+        
+        try:
+            response = await self.ai_service.agenerate_structured_response(
+                prompt=scoring_prompt,
+                response_model=OverallScoreResponse,
+                system_prompt=system_prompt,
+                stage="fit_score.overall_score"
+            )
+            return response.model_dump()
+        except Exception as e:
+            return self._fallback_overall_score(component_scores)
+    
+    def _build_overall_score_prompts(
+        self, 
+        resume_data: ResumeData,
+        job_requirements: JobRequirements,
+        detailed_analysis: DetailedAnalysis,
+        component_scores: Dict[str, float]
+    ) -> Tuple[str, str]:
+        """Build the (system prompt, scoring prompt) pair for the overall score"""
         
         system_prompt = """
 You are an expert recruiter calculating a comprehensive FIT score between a candidate and job position.
@@ -199,51 +448,26 @@ Provide:
 
 Consider both current fit and future potential.
 """
+        return system_prompt, scoring_prompt
+    
+    def _fallback_overall_score(self, component_scores: Dict[str, float]) -> Dict[str, Any]:
+        """Weighted overall score used when the AI scoring call fails"""
+        weighted_score = (
+            component_scores["skill_score"] * 0.4 +
+            component_scores["experience_score"] * 0.4 +
+            component_scores["education_score"] * 0.2
+        )
         
-        try:
-            from pydantic import BaseModel
-            
-            class OverallScoreResponse(BaseModel):
-                score: float
-                category: str
-                confidence: float
-                potential_score: float
-                summary: str
-                hiring_recommendation: str
-            
-            response = self.ai_service.generate_structured_response(
-                prompt=scoring_prompt,
-                response_model=OverallScoreResponse,
-                system_prompt=system_prompt
-            )
-            
-            return {
-                "score": response.score,
-                "category": response.category,
-                "confidence": response.confidence,
-                "potential_score": response.potential_score,
-                "summary": response.summary,
-                "hiring_recommendation": response.hiring_recommendation
-            }
-            
-        except Exception as e:
-            # Fallback calculation
-            weighted_score = (
-                component_scores["skill_score"] * 0.4 +
-                component_scores["experience_score"] * 0.4 +
-                component_scores["education_score"] * 0.2
-            )
-            
-            category = "excellent" if weighted_score >= 85 else "good" if weighted_score >= 70 else "fair" if weighted_score >= 50 else "poor"
-            
-            return {
-                "score": weighted_score,
-                "category": category,
-                "confidence": 0.7,
-                "potential_score": min(100, weighted_score + 10),
-                "summary": f"Calculated FIT score of {weighted_score:.1f} based on component analysis",
-                "hiring_recommendation": "recommend" if weighted_score >= 70 else "consider"
-            }
+        category = "excellent" if weighted_score >= 85 else "good" if weighted_score >= 70 else "fair" if weighted_score >= 50 else "poor"
+        
+        return {
+            "score": weighted_score,
+            "category": category,
+            "confidence": 0.7,
+            "potential_score": min(100, weighted_score + 10),
+            "summary": f"Calculated FIT score of {weighted_score:.1f} based on component analysis",
+            "hiring_recommendation": "recommend" if weighted_score >= 70 else "consider"
+        }
     
     def _generate_overall_assessment(
         self,
@@ -254,6 +478,52 @@ Consider both current fit and future potential.
         education_match
     ) -> str:
         """Generate overall assessment text using AI"""
+        system_prompt, assessment_prompt = self._build_assessment_prompts(
+            resume_data, job_requirements, skill_matches, experience_matches, education_match
+        )
+        
+        try:
+            assessment = self.ai_service.generate_text_response(
+                prompt=assessment_prompt,
+                system_prompt=system_prompt,
+                stage="fit_score.overall_assessment"
+            )
+            return assessment.strip()
+        except Exception:
+            return "Assessment could not be generated automatically."
+    
+    async def _agenerate_overall_assessment(
+        self,
+        resume_data: ResumeData,
+        job_requirements: JobRequirements,
+        skill_matches: List,
+        experience_matches: List,
+        education_match
+    ) -> str:
+        """Async variant of _generate_overall_assessment"""
+        system_prompt, assessment_prompt = self._build_assessment_prompts(
+            resume_data, job_requirements, skill_matches, experience_matches, education_match
+        )
+        
+        try:
+            assessment = await self.ai_service.agenerate_text_response(
+                prompt=assessment_prompt,
+                system_prompt=system_prompt,
+                stage="fit_score.overall_assessment"
+            )
+            return assessment.strip()
+        except Exception:
+            return "Assessment could not be generated automatically."
+    
+    def _build_assessment_prompts(
+        self,
+        resume_data: ResumeData,
+        job_requirements: JobRequirements,
+        skill_matches: List,
+        experience_matches: List,
+        education_match
+    ) -> Tuple[str, str]:
+        """Build the (system prompt, assessment prompt) pair"""
         
         system_prompt = "You are an expert recruiter providing concise assessment of candidate fit."
         
@@ -270,15 +540,7 @@ Key Points:
 
 Provide a 2-3 sentence assessment focusing on key strengths and any notable concerns.
 """
-        
-        try:
-            assessment = self.ai_service.generate_text_response(
-                prompt=assessment_prompt,
-                system_prompt=system_prompt
-            )
-            return assessment.strip()
-        except Exception:
-            return "Assessment could not be generated automatically."
+        return system_prompt, assessment_prompt
     
     def _generate_recommendations(self, detailed_analysis: DetailedAnalysis) -> List[str]:
         """Generate hiring recommendations based on analysis"""
@@ -89,6 +89,16 @@ class FITScoreResult(BaseModel):
     hiring_recommendation: str  # "strongly_recommend", "recommend", "consider", "not_recommend"
 
 
+class OverallScoreResponse(BaseModel):
+    """AI response for the overall FIT score stage"""
+    score: float
+    category: str
+    confidence: float
+    potential_score: float
+    summary: str
+    hiring_recommendation: str
+
+
 # this is created to maintain consistency with the existing codebase
 class RandomVariable(BaseModel):
     """Placeholder for random variable"""
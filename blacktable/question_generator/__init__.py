@@ -1,7 +1,9 @@
 """
 Question Generator module
 """
-from .generator import QuestionGenerator
+import importlib
+from typing import Any, List
+
 from .models import Question, QuestionSet, QuestionType, InterviewRound, QuestionDifficulty
 
 __all__ = [
@@ -12,3 +14,15 @@ __all__ = [
     "InterviewRound",
     "QuestionDifficulty"
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name == "QuestionGenerator":
+        value = importlib.import_module(".generator", __name__).QuestionGenerator
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -1,11 +1,15 @@
 """
 Question Generator - Main generator class
 """
-from typing import List, Dict, Any
+import asyncio
+from typing import AsyncIterator, Iterator, List, Dict, Any, Optional, Tuple
+from pydantic import BaseModel
 from ..core.ai_service import AIService
+from ..core.clients import get_ai_service
+from ..core.streaming import make_partial_model
 from ..resume_parser.models import ResumeData
 from .models import (
-    Question, QuestionSet, StandardQuestionRequest, PersonalizedQuestionRequest,
+    Question, QuestionSet, QuestionResponse, StandardQuestionRequest, PersonalizedQuestionRequest,
     InterviewRound, QuestionType, QuestionDifficulty
 )
 from .templates import QuestionTemplates
@@ -14,14 +18,15 @@ from .templates import QuestionTemplates
 class QuestionGenerator:
     """AI-powered interview question generator"""
     
-    def __init__(self, ai_provider: str = "openai"):
+    def __init__(self, ai_provider: str = "openai", ai_service: Optional[AIService] = None):
         """
         Initialize Question Generator
         
         Args:
             ai_provider: AI service provider ("openai" or "anthropic")
+            ai_service: AI service to use; defaults to the shared service for ai_provider
         """
-        self.ai_service = AIService(provider=ai_provider)
+        self.ai_service = ai_service or get_ai_service(ai_provider)
         self.templates = QuestionTemplates()
     
     def generate_standard_questions(
@@ -45,43 +50,16 @@ class QuestionGenerator:
         Returns:
             List of generated questions
         """
-        if difficulty_levels is None:
-            difficulty_levels = ["medium"]
-        
-        # Convert string to enum
-        round_enum = InterviewRound(interview_round)
-        
-        # Get prompt template
-        system_prompt = self.templates.get_standard_prompt_template(round_enum)
-        
-        generation_prompt = f"""
-Generate {question_count} interview questions for the following job:
-
-Job Description:
-{job_description}
-
-Requirements:
-- Interview Round: {interview_round}
-- Focus Area: {focus_area}
-- Difficulty Levels: {', '.join(difficulty_levels)}
-- Generate diverse question types appropriate for this round
-- Include expected answer points for each question
-- Suggest follow-up questions where relevant
-
-Format the response as a JSON object with a "questions" array containing question objects.
-"""
+        system_prompt, generation_prompt = self._build_standard_prompts(
+            job_description, interview_round, focus_area, question_count, difficulty_levels
+        )
         
         try:
-            # Create a temporary model for the response
-            from pydantic import BaseModel
-            
-            class QuestionResponse(BaseModel):
-                questions: List[Question]
-            
             response = self.ai_service.generate_structured_response(
                 prompt=generation_prompt,
                 response_model=QuestionResponse,
-                system_prompt=system_prompt
+                system_prompt=system_prompt,
+                stage="question_generator.standard_questions"
             )
             
             return response.questions
@@ -89,6 +67,114 @@ Format the response as a JSON object with a "questions" array containing questio
         except Exception as e:
             raise ValueError(f"Failed to generate standard questions: {e}")
     
+    async def agenerate_standard_questions(
+        self,
+        job_description: str,
+        interview_round: str,
+        focus_area: str,
+        question_count: int = 10,
+        difficulty_levels: List[str] = None
+    ) -> List[Question]:
+        """
+        Async variant of generate_standard_questions
+        
+        Args:
+            job_description: Job description text
+            interview_round: Type of interview round
+            focus_area: Specific area of focus
+            question_count: Number of questions to generate
+            difficulty_levels: List of difficulty levels
+            
+        Returns:
+            List of generated questions
+        """
+        system_prompt, generation_prompt = self._build_standard_prompts(
+            job_description, interview_round, focus_area, question_count, difficulty_levels
+        )
+        
+        try:
+            response = await self.ai_service.agenerate_structured_response(
+                prompt=generation_prompt,
+                response_model=QuestionResponse,
+                system_prompt=system_prompt,
+                stage="question_generator.standard_questions"
+            )
+            return response.questions
+        except Exception as e:
+            raise ValueError(f"Failed to generate standard questions: {e}")
+    
+    def stream_standard_question_set(
+        self,
+        job_description: str,
+        interview_round: str,
+        focus_area: str,
+        question_count: int = 10,
+        difficulty_levels: List[str] = None
+    ) -> Iterator[BaseModel]:
+        """
+        Generate standard questions, yielding a progressively filled QuestionSet
+        
+        Args:
+            job_description: Job description text
+            interview_round: Type of interview round
+            focus_area: Specific area of focus
+            question_count: Number of questions to generate
+            difficulty_levels: List of difficulty levels
+            
+        Yields:
+            Partial question sets (all fields optional), then the final QuestionSet
+        """
+        system_prompt, generation_prompt = self._build_standard_prompts(
+            job_description, interview_round, focus_area, question_count, difficulty_levels
+        )
+        
+        try:
+            for response in self.ai_service.stream_structured_response(
+                prompt=generation_prompt,
+                response_model=QuestionResponse,
+                system_prompt=system_prompt,
+                stage="question_generator.standard_questions"
+            ):
+                yield self._streamed_question_set(job_description, interview_round, focus_area, response)
+        except Exception as e:
+            raise ValueError(f"Failed to generate standard questions: {e}")
+    
+    async def astream_standard_question_set(
+        self,
+        job_description: str,
+        interview_round: str,
+        focus_area: str,
+        question_count: int = 10,
+        difficulty_levels: List[str] = None
+    ) -> AsyncIterator[BaseModel]:
+        """
+        Async variant of stream_standard_question_set
+        
+        Args:
+            job_description: Job description text
+            interview_round: Type of interview round
+            focus_area: Specific area of focus
+            question_count: Number of questions to generate
+            difficulty_levels: List of difficulty levels
+            
+        Yields:
+            Partial question sets (all fields optional), then the final QuestionSet
+        """
+        system_prompt, generation_prompt = self._build_standard_prompts(
+            job_description, interview_round, focus_area, question_count, difficulty_levels
+        )
+        
+        try:
+            async for response in self.ai_service.astream_structured_response(
+                prompt=generation_prompt,
+                response_model=QuestionResponse,
+                system_prompt=system_prompt,
+                stage="question_generator.standard_questions"
+            ):
+                yield self._streamed_question_set(job_description, interview_round, focus_area, response)
+        except Exception as e:
+            raise ValueError(f"Failed to generate standard questions: {e}")
+    
     def generate_personalized_questions(
         self,
         resume_data: ResumeData,
@@ -108,50 +194,16 @@ Format the response as a JSON object with a "questions" array containing questio
         Returns:
             List of personalized questions
         """
-        # Extract relevant information from resume
-        candidate_info = self._extract_candidate_context(resume_data)
-        
-        system_prompt = f"""
-You are an expert interviewer creating personalized questions based on the candidate's specific background.
-Focus on their actual experience, projects, and skills to create targeted questions that reveal depth of knowledge and experience.
-
-Interview Round: {interview_round}
-"""
-        
-        generation_prompt = f"""
-Generate {question_count} personalized interview questions based on the candidate's resume and the job requirements.
-
-Job Description:
-{job_description}
-
-Candidate Background:
-- Name: {candidate_info['name']}
-- Total Experience: {candidate_info['total_experience']} years
-- Current/Recent Role: {candidate_info['recent_role']}
-- Key Skills: {', '.join(candidate_info['skills'][:10])}  # Top 10 skills
-- Recent Projects: {candidate_info['recent_projects']}
-- Education: {candidate_info['education']}
-
-Create questions that:
-1. Probe specific experiences mentioned in their resume
-2. Assess depth of knowledge in their claimed skills
-3. Explore their project work and technical decisions
-4. Understand their growth and learning from past roles
-5. Connect their background to the job requirements
-
-Each question should reference specific elements from their resume and be tailored to their experience level.
-"""
+        system_prompt, generation_prompt = self._build_personalized_prompts(
+            resume_data, job_description, interview_round, question_count
+        )
         
         try:
-            from pydantic import BaseModel
-            
-            class PersonalizedQuestionResponse(BaseModel):
-                questions: List[Question]
-            
             response = self.ai_service.generate_structured_response(
                 prompt=generation_prompt,
-                response_model=PersonalizedQuestionResponse,
-                system_prompt=system_prompt
+                response_model=QuestionResponse,
+                system_prompt=system_prompt,
+                stage="question_generator.personalized_questions"
             )
             
             # Mark questions as personalized
@@ -163,6 +215,42 @@ Each question should reference specific elements from their resume and be tailor
         except Exception as e:
             raise ValueError(f"Failed to generate personalized questions: {e}")
     
+    async def agenerate_personalized_questions(
+        self,
+        resume_data: ResumeData,
+        job_description: str,
+        interview_round: str,
+        question_count: int = 5
+    ) -> List[Question]:
+        """
+        Async variant of generate_personalized_questions
+        
+        Args:
+            resume_data: Parsed resume data
+            job_description: Job description text
+            interview_round: Type of interview round
+            question_count: Number of questions to generate
+            
+        Returns:
+            List of personalized questions
+        """
+        system_prompt, generation_prompt = self._build_personalized_prompts(
+            resume_data, job_description, interview_round, question_count
+        )
+        
+        try:
+            response = await self.ai_service.agenerate_structured_response(
+                prompt=generation_prompt,
+                response_model=QuestionResponse,
+                system_prompt=system_prompt,
+                stage="question_generator.personalized_questions"
+            )
+            for question in response.questions:
+                question.is_personalized = True
+            return response.questions
+        except Exception as e:
+            raise ValueError(f"Failed to generate personalized questions: {e}")
+    
     def generate_mixed_question_set(
         self,
         resume_data: ResumeData,
@@ -205,6 +293,145 @@ Each question should reference specific elements from their resume and be tailor
             question_count=personalized_count
         )
         
+        return self._assemble_question_set(
+            job_description, interview_round, focus_area, standard_questions, personalized_questions
+        )
+    
+    async def agenerate_mixed_question_set(
+        self,
+        resume_data: ResumeData,
+        job_description: str,
+        interview_round: str,
+        focus_area: str,
+        total_questions: int = 15,
+        personalized_ratio: float = 0.3
+    ) -> QuestionSet:
+        """
+        Async variant of generate_mixed_question_set
+        
+        The standard and personalized batches are generated concurrently.
+        
+        Args:
+            resume_data: Parsed resume data
+            job_description: Job description text
+            interview_round: Type of interview round
+            focus_area: Specific area of focus
+            total_questions: Total number of questions
+            personalized_ratio: Ratio of personalized questions (0.0 to 1.0)
+            
+        Returns:
+            QuestionSet with mixed questions
+        """
+        personalized_count = int(total_questions * personalized_ratio)
+        standard_count = total_questions - personalized_count
+        
+        standard_questions, personalized_questions = await asyncio.gather(
+            self.agenerate_standard_questions(
+                job_description=job_description,
+                interview_round=interview_round,
+                focus_area=focus_area,
+                question_count=standard_count
+            ),
+            self.agenerate_personalized_questions(
+                resume_data=resume_data,
+                job_description=job_description,
+                interview_round=interview_round,
+                question_count=personalized_count
+            )
+        )
+        
+        return self._assemble_question_set(
+            job_description, interview_round, focus_area, standard_questions, personalized_questions
+        )
+    
+    def _build_standard_prompts(
+        self,
+        job_description: str,
+        interview_round: str,
+        focus_area: str,
+        question_count: int,
+        difficulty_levels: List[str] = None
+    ) -> Tuple[str, str]:
+        """Build the (system prompt, generation prompt) pair for standard questions"""
+        if difficulty_levels is None:
+            difficulty_levels = ["medium"]
+        
+        # Convert string to enum
+        round_enum = InterviewRound(interview_round)
+        
+        # Get prompt template
+        system_prompt = self.templates.get_standard_prompt_template(round_enum)
+        
+        generation_prompt = f"""
+Generate {question_count} interview questions for the following job:
+
+Job Description:
+{job_description}
+
+Requirements:
+- Interview Round: {interview_round}
+- Focus Area: {focus_area}
+- Difficulty Levels: {', '.join(difficulty_levels)}
+- Generate diverse question types appropriate for this round
+- Include expected answer points for each question
+- Suggest follow-up questions where relevant
+
+Format the response as a JSON object with a "questions" array containing question objects.
+"""
+        return system_prompt, generation_prompt
+    
+    def _build_personalized_prompts(
+        self,
+        resume_data: ResumeData,
+        job_description: str,
+        interview_round: str,
+        question_count: int
+    ) -> Tuple[str, str]:
+        """Build the (system prompt, generation prompt) pair for personalized questions"""
+        # Extract relevant information from resume
+        candidate_info = self._extract_candidate_context(resume_data)
+        
+        system_prompt = f"""
+You are an expert interviewer creating personalized questions based on the candidate's specific background.
+Focus on their actual experience, projects, and skills to create targeted questions that reveal depth of knowledge and experience.
+
+Interview Round: {interview_round}
+"""
+        
+        generation_prompt = f"""
+Generate {question_count} personalized interview questions based on the candidate's resume and the job requirements.
+
+Job Description:
+{job_description}
+
+Candidate Background:
+- Name: {candidate_info['name']}
+- Total Experience: {candidate_info['total_experience']} years
+- Current/Recent Role: {candidate_info['recent_role']}
+- Key Skills: {', '.join(candidate_info['skills'][:10])}  # Top 10 skills
+- Recent Projects: {candidate_info['recent_projects']}
+- Education: {candidate_info['education']}
+
+Create questions that:
+1. Probe specific experiences mentioned in their resume
+2. Assess depth of knowledge in their claimed skills
+3. Explore their project work and technical decisions
+4. Understand their growth and learning from past roles
+5. Connect their background to the job requirements
+
+Each question should reference specific elements from their resume and be tailored to their experience level.
+"""
+        return system_prompt, generation_prompt
+    
+    def _assemble_question_set(
+        self,
+        job_description: str,
+        interview_round: str,
+        focus_area: str,
+        standard_questions: List[Question],
+        personalized_questions: List[Question]
+    ) -> QuestionSet:
+        """Combine and re-number standard and personalized questions into a QuestionSet"""
         # Combine questions
         all_questions = standard_questions + personalized_questions
         
@@ -222,6 +449,30 @@ Each question should reference specific elements from their resume and be tailor
             personalized_questions_count=len(personalized_questions)
         )
     
+    def _streamed_question_set(
+        self,
+        job_description: str,
+        interview_round: str,
+        focus_area: str,
+        response: BaseModel
+    ) -> BaseModel:
+        """Wrap a streamed (partial or final) QuestionResponse in a question set"""
+        if isinstance(response, QuestionResponse):
+            return self._assemble_question_set(
+                job_description, interview_round, focus_area, response.questions, []
+            )
+        
+        questions = response.questions or []
+        return make_partial_model(QuestionSet)(
+            job_title=self._extract_job_title(job_description),
+            interview_round=interview_round,
+            focus_area=focus_area,
+            questions=questions,
+            total_questions=len(questions),
+            standard_questions_count=len(questions),
+            personalized_questions_count=0
+        )
+    
     def _extract_candidate_context(self, resume_data: ResumeData) -> Dict[str, Any]:
         """Extract relevant context from resume for personalized questions"""
         resume = resume_data.resume
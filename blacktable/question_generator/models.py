@@ -44,6 +44,11 @@ class Question(BaseModel):
     source_context: Optional[str] = None  # Context from resume if personalized
 
 
+class QuestionResponse(BaseModel):
+    """AI response wrapper for a batch of generated questions"""
+    questions: List[Question]
+
+
 class QuestionSet(BaseModel):
     """Set of questions for an interview"""
     job_title: str
@@ -1,7 +1,9 @@
 """
 Resume Parser module
 """
-from .parser import ResumeParser
+import importlib
+from typing import Any, List
+
 from .models import ResumeData, Resume, About, WorkExperience, Project, Education, CandidateOverall
 
 __all__ = [
@@ -14,3 +16,17 @@ __all__ = [
     "Education",
     "CandidateOverall"
 ]
+
+
+def __getattr__(name: str) -> Any:
+    # The parser pulls in docling and the AI service, so it loads on first access;
+    # the models stay importable on their own
+    if name == "ResumeParser":
+        value = importlib.import_module(".parser", __name__).ResumeParser
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
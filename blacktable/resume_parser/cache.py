@@ -0,0 +1,160 @@
+"""
+On-disk cache of document conversions
+
+Converting a PDF or DOCX runs Docling's layout and table models, which takes
+seconds per page. The same resume is often uploaded several times (parse,
+then fit score, then application analysis), so converted markdown is stored
+keyed by the SHA-256 of the file bytes and the converter configuration.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ..core.cache import CacheStats
+
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path: str) -> str:
+    """
+    Hash a file's contents without reading it into memory at once
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Hex SHA-256 digest of the file bytes
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_conversion_key(content_hash: str, converter_config: Dict[str, Any]) -> str:
+    """
+    Key a conversion by file content and converter configuration
+
+    Args:
+        content_hash: SHA-256 of the file bytes
+        converter_config: Settings that change the converter's output
+
+    Returns:
+        Hex SHA-256 digest identifying the conversion
+    """
+    payload = json.dumps(
+        {"content": content_hash, "converter": converter_config}, sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ConversionCache:
+    """Size-bounded SQLite store of converted markdown, evicting least recently used entries"""
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024):
+        """
+        Args:
+            path: Database file path (created on first use)
+            max_bytes: Total size of stored markdown and metadata kept
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Database connection, opened on first use"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS conversions ("
+                    "key TEXT PRIMARY KEY, markdown TEXT NOT NULL, metadata TEXT NOT NULL, "
+                    "size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+                )
+        return self._conn
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Look up a conversion
+
+        Args:
+            key: Conversion key from make_conversion_key
+
+        Returns:
+            (markdown, metadata), or None on a miss
+        """
+        with self._lock:
+            row = self.conn.execute("SELECT markdown, metadata FROM conversions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE conversions SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.stats.hits += 1
+            return row[0], json.loads(row[1])
+
+    def set(self, key: str, markdown: str, metadata: Dict[str, Any]) -> None:
+        """
+        Store a conversion, evicting old entries beyond the size bound
+
+        Args:
+            key: Conversion key from make_conversion_key
+            markdown: Converted markdown
+            metadata: JSON-serializable details of the conversion
+        """
+        encoded = json.dumps(metadata)
+        size = len(markdown.encode("utf-8")) + len(encoded)
+        if size > self.max_bytes:
+            return
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO conversions (key, markdown, metadata, size, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, markdown, encoded, size, time.time())
+            )
+            self.stats.writes += 1
+            self._evict()
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache fits its size bound"""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM conversions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self.conn.execute("SELECT key, size FROM conversions ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM conversions WHERE key = ?", (key,))
+            total -= size
+            self.stats.evictions += 1
+
+    def size(self) -> int:
+        """Total bytes of stored entries"""
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM conversions").fetchone()[0]
+
+    def clear(self) -> None:
+        """Remove every entry"""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM conversions")
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM conversions").fetchone()[0]
@@ -0,0 +1,301 @@
+"""
+Lightweight extractors for documents that need no layout analysis
+
+DOCX, HTML, Markdown, RTF and plain text carry their structure in the file
+itself, so they are turned into markdown directly instead of loading
+Docling's layout pipeline. The output follows Docling's markdown shape:
+`#` headings, `-` list items, pipe tables and blank lines between blocks.
+"""
+import io
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+def text_to_markdown(data: bytes) -> str:
+    """Decode a plain text or Markdown file"""
+    return _decode(data).replace("\r\n", "\n").replace("\r", "\n")
+
+
+def docx_to_markdown(data: bytes) -> str:
+    """
+    Convert a DOCX file to markdown (needs python-docx)
+
+    Args:
+        data: DOCX file bytes
+
+    Returns:
+        Markdown with the document's headings, lists, paragraphs and tables in order
+    """
+    import docx
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    document = docx.Document(io.BytesIO(data))
+    blocks: List[str] = []
+
+    # Resumes often keep the name and contact details in the page header
+    for section in document.sections[:1]:
+        for paragraph in section.header.paragraphs:
+            if paragraph.text.strip():
+                blocks.append(paragraph.text.strip())
+
+    for element in document.element.body.iterchildren():
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag == "p":
+            block = _docx_paragraph(Paragraph(element, document))
+        elif tag == "tbl":
+            block = _table_to_markdown([[cell.text for cell in row.cells] for row in Table(element, document).rows])
+        else:
+            block = None
+        if block:
+            blocks.append(block)
+    return _join_blocks(blocks)
+
+
+def _docx_paragraph(paragraph) -> Optional[str]:
+    """Markdown for one DOCX paragraph"""
+    text = paragraph.text.strip()
+    if not text:
+        return None
+    style = (paragraph.style.name if paragraph.style is not None else "") or ""
+    if style == "Title":
+        return f"# {text}"
+    heading = re.match(r"Heading (\d)", style)
+    if heading:
+        return f"{'#' * min(int(heading.group(1)) + 1, 6)} {text}"
+    properties = paragraph._p.pPr
+    if "List" in style or (properties is not None and properties.numPr is not None):
+        return f"- {text}"
+    return text
+
+
+class _HTMLToMarkdown(HTMLParser):
+    """Collects the text of an HTML page as markdown blocks"""
+
+    SKIPPED = {"script", "style", "noscript", "template", "svg", "head", "nav", "button", "form"}
+    BLOCKS = {"p", "div", "section", "article", "header", "footer", "main", "aside", "ul", "ol", "dl", "dd", "dt",
+              "blockquote", "pre", "address", "figure", "table", "hr"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks: List[str] = []
+        self.current: List[str] = []
+        self.prefix = ""
+        self.skip_depth = 0
+        self.rows: Optional[List[List[str]]] = None
+        self.cell: Optional[List[str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED:
+            self.skip_depth += 1
+        elif self.skip_depth:
+            return
+        elif tag in ("h1", "h2", "h3", "h4", "h5", "h6"):
+            self._flush()
+            self.prefix = "#" * int(tag[1]) + " "
+        elif tag == "li":
+            self._flush()
+            self.prefix = "- "
+        elif tag == "br":
+            self.current.append("\n")
+        elif tag == "table":
+            self._flush()
+            self.rows = []
+        elif tag == "tr" and self.rows is not None:
+            self.rows.append([])
+        elif tag in ("td", "th") and self.rows is not None:
+            self.cell = []
+        elif tag in self.BLOCKS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif self.skip_depth:
+            return
+        elif tag in ("td", "th") and self.cell is not None:
+            if self.rows:
+                self.rows[-1].append(" ".join("".join(self.cell).split()))
+            self.cell = None
+        elif tag == "table" and self.rows is not None:
+            table = _table_to_markdown([row for row in self.rows if row])
+            if table:
+                self.blocks.append(table)
+            self.rows = None
+        elif tag in ("h1", "h2", "h3", "h4", "h5", "h6", "li") or tag in self.BLOCKS:
+            self._flush()
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        if self.cell is not None:
+            self.cell.append(data)
+        elif self.rows is None:
+            self.current.append(data)
+
+    def _flush(self):
+        lines = [" ".join(line.split()) for line in "".join(self.current).split("\n")]
+        text = "\n".join(line for line in lines if line)
+        if text:
+            self.blocks.append(self.prefix + text)
+        self.current = []
+        self.prefix = ""
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def html_to_markdown(data: bytes) -> str:
+    """
+    Convert an HTML page (e.g. a saved LinkedIn profile) to markdown
+
+    Args:
+        data: HTML file bytes
+
+    Returns:
+        Markdown of the page text, without scripts, styles and navigation
+    """
+    parser = _HTMLToMarkdown()
+    parser.feed(_decode(data))
+    parser.close()
+    return _join_blocks(parser.blocks)
+
+
+# RTF destinations whose text is not document content
+_RTF_SKIPPED_DESTINATIONS = {
+    "fonttbl", "colortbl", "stylesheet", "info", "pict", "object", "header", "footer", "headerl", "headerr",
+    "footerl", "footerr", "footnote", "field", "fldinst", "themedata", "colorschememapping", "latentstyles",
+    "datastore", "xmlnstbl", "listtable", "listoverridetable", "rsidtbl", "generator", "filetbl", "revtbl",
+}
+_RTF_TOKEN = re.compile(r"\\([a-z]{1,32})(-?\d{1,10})? ?|\\'([0-9a-f]{2})|\\([^a-z])|([{}])|[\r\n]+|(.)", re.IGNORECASE)
+_RTF_SPECIAL = {"par": "\n", "sect": "\n\n", "page": "\n\n", "line": "\n", "tab": "\t", "emdash": "\u2014",
+                "endash": "\u2013", "bullet": "\u2022", "lquote": "\u2018", "rquote": "\u2019",
+                "ldblquote": "\u201c", "rdblquote": "\u201d", "row": "\n", "cell": " | "}
+
+
+def rtf_to_text(content: str) -> str:
+    """
+    Extract the text of an RTF document
+
+    Args:
+        content: RTF source
+
+    Returns:
+        Plain text with paragraph breaks
+    """
+    stack = []
+    ignorable = False
+    unicode_skip = 1
+    skip = 0
+    out: List[str] = []
+    for match in _RTF_TOKEN.finditer(content):
+        word, argument, hex_code, symbol, brace, char = match.groups()
+        if brace:
+            skip = 0
+            if brace == "{":
+                stack.append((unicode_skip, ignorable))
+            elif stack:
+                unicode_skip, ignorable = stack.pop()
+        elif symbol:
+            skip = 0
+            if symbol == "*":
+                ignorable = True
+            elif not ignorable and symbol in "\\{}":
+                out.append(symbol)
+            elif not ignorable and symbol == "~":
+                out.append("\u00a0")
+            elif not ignorable and symbol == "-":
+                continue
+        elif word:
+            skip = 0
+            word = word.lower()
+            if word in _RTF_SKIPPED_DESTINATIONS:
+                ignorable = True
+            elif ignorable:
+                continue
+            elif word in _RTF_SPECIAL:
+                out.append(_RTF_SPECIAL[word])
+            elif word == "uc":
+                unicode_skip = int(argument or 1)
+            elif word == "u" and argument:
+                code = int(argument)
+                out.append(chr(code + 65536 if code < 0 else code))
+                skip = unicode_skip
+        elif hex_code:
+            if skip > 0:
+                skip -= 1
+            elif not ignorable:
+                out.append(bytes([int(hex_code, 16)]).decode("cp1252", errors="replace"))
+        elif char:
+            if skip > 0:
+                skip -= 1
+            elif not ignorable:
+                out.append(char)
+    return "".join(out)
+
+
+def rtf_to_markdown(data: bytes) -> str:
+    """Convert an RTF file to markdown paragraphs"""
+    # RTF is 7-bit; other bytes only appear in non-conforming files
+    text = rtf_to_text(data.decode("latin-1"))
+    return _join_blocks([line.strip() for line in text.split("\n")])
+
+
+# Extractor and converter name by file extension
+EXTRACTORS: Dict[str, Callable[[bytes], str]] = {
+    ".txt": text_to_markdown,
+    ".md": text_to_markdown,
+    ".markdown": text_to_markdown,
+    ".docx": docx_to_markdown,
+    ".html": html_to_markdown,
+    ".htm": html_to_markdown,
+    ".rtf": rtf_to_markdown,
+}
+EXTRACTOR_NAMES = {
+    ".txt": "text",
+    ".md": "markdown",
+    ".markdown": "markdown",
+    ".docx": "python-docx",
+    ".html": "html",
+    ".htm": "html",
+    ".rtf": "rtf",
+}
+
+
+def get_extractor(file_path: str) -> Optional[Callable[[bytes], str]]:
+    """
+    Get the direct extractor for a file
+
+    Args:
+        file_path: Path or name of the document file
+
+    Returns:
+        Extractor function, or None when the format needs Docling
+    """
+    return EXTRACTORS.get(Path(file_path).suffix.lower())
+
+
+def _table_to_markdown(rows: List[List[str]]) -> Optional[str]:
+    """Pipe table for rows of cell texts, first row as header"""
+    rows = [[" ".join(cell.split()).replace("|", "\\|") for cell in row] for row in rows]
+    rows = [row for row in rows if any(row)]
+    if not rows:
+        return None
+    width = max(len(row) for row in rows)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    lines = ["| " + " | ".join(rows[0]) + " |", "|" + "---|" * width]
+    lines.extend("| " + " | ".join(row) + " |" for row in rows[1:])
+    return "\n".join(lines)
+
+
+def _join_blocks(blocks: List[str]) -> str:
+    """Join markdown blocks with blank lines"""
+    return "\n\n".join(block for block in blocks if block) + "\n"
+
+
+def _decode(data: bytes) -> str:
+    """Decode text bytes, honouring a UTF-8 byte order mark"""
+    return data.decode("utf-8-sig", errors="replace")
@@ -0,0 +1,370 @@
+"""
+Bulk resume ingest
+
+Streams resumes from a directory or a zip archive (read member by member,
+never extracted to disk) through conversion and extraction, and writes one
+record per resume to a JSONL file or a SQLite database:
+
+    read -> convert (worker pool) -> bounded queue -> extract (async) -> write
+
+At most `max_pending` documents are held between reading and the end of
+extraction, so memory stays flat however large the archive is. Records are
+written as soon as each resume finishes, and the output doubles as the
+checkpoint: running the same ingest again skips resumes that were already
+parsed and retries the ones that failed.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional, Set, TextIO, Tuple
+
+from pydantic import BaseModel, Field
+
+from .models import ResumeData
+from .parser import ResumeParser
+
+
+class IngestRecord(BaseModel):
+    """Outcome of ingesting one resume"""
+    source: str  # path relative to the ingested directory, or the archive member name
+    sha256: Optional[str] = None
+    ok: bool
+    converter: Optional[str] = None
+    data: Optional[ResumeData] = None
+    error: Optional[str] = None
+    duration: float = 0.0  # seconds from reading the file to the parsed result
+    timestamp: float = Field(default_factory=time.time)
+
+
+class IngestStats:
+    """Running counts, throughput and error rate of an ingest"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.skipped = 0
+        self.parsed = 0
+        self.failed = 0
+
+    @property
+    def done(self) -> int:
+        """Resumes finished in this run, parsed or failed"""
+        return self.parsed + self.failed
+
+    def summary(self) -> dict:
+        """Counts, resumes per second and the share of failed resumes"""
+        elapsed = time.monotonic() - self.started
+        return {
+            "parsed": self.parsed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "elapsed": round(elapsed, 1),
+            "per_second": round(self.done / elapsed, 2) if elapsed > 0 else 0.0,
+            "error_rate": round(self.failed / self.done, 4) if self.done else 0.0,
+        }
+
+    def line(self) -> str:
+        """One-line progress report"""
+        summary = self.summary()
+        return (
+            f"parsed {summary['parsed']}, failed {summary['failed']}, skipped {summary['skipped']} "
+            f"| {summary['per_second']:.2f} resumes/s | error rate {summary['error_rate']:.1%} "
+            f"| {summary['elapsed']:.0f}s"
+        )
+
+
+class BaseIngestSink:
+    """Destination for ingest records, also serving as the checkpoint"""
+
+    def completed(self) -> Set[str]:
+        """Sources already parsed successfully by earlier runs"""
+        raise NotImplementedError
+
+    def write(self, record: IngestRecord) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class JSONLIngestSink(BaseIngestSink):
+    """Appends one JSON record per line, flushed as each resume finishes"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: File to append to (created if missing)
+        """
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file: Optional[TextIO] = None
+
+    def completed(self) -> Set[str]:
+        done = set()
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by an interrupted run
+                    continue
+                if record.get("ok"):
+                    done.add(record["source"])
+                else:
+                    done.discard(record.get("source"))
+        return done
+
+    def write(self, record: IngestRecord) -> None:
+        if self._file is None:
+            complete = _ends_with_newline(self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+            if not complete:
+                # Finish the line an interrupted run left behind
+                self._file.write("\n")
+        self._file.write(record.model_dump_json() + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SQLiteIngestSink(BaseIngestSink):
+    """Stores records in a SQLite table, one row per source, committed as each resume finishes"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Database file (created if missing)
+        """
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS resumes ("
+            "source TEXT PRIMARY KEY, sha256 TEXT, ok INTEGER NOT NULL, converter TEXT, data TEXT, "
+            "error TEXT, duration REAL, timestamp REAL)"
+        )
+        self.conn.commit()
+
+    def completed(self) -> Set[str]:
+        return {row[0] for row in self.conn.execute("SELECT source FROM resumes WHERE ok = 1")}
+
+    def write(self, record: IngestRecord) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO resumes (source, sha256, ok, converter, data, error, duration, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record.source,
+                    record.sha256,
+                    int(record.ok),
+                    record.converter,
+                    record.data.model_dump_json() if record.data is not None else None,
+                    record.error,
+                    record.duration,
+                    record.timestamp,
+                )
+            )
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def create_ingest_sink(path: str) -> BaseIngestSink:
+    """
+    Create the sink for an output path
+
+    Args:
+        path: Output file; .sqlite, .sqlite3 and .db write SQLite, anything else JSONL
+
+    Returns:
+        Ingest sink
+    """
+    if os.path.splitext(path)[1].lower() in (".sqlite", ".sqlite3", ".db"):
+        return SQLiteIngestSink(path)
+    return JSONLIngestSink(path)
+
+
+def iter_sources(path: str, is_supported: Callable[[str], bool]) -> Iterator[Tuple[str, Callable[[], bytes]]]:
+    """
+    List the resumes in a directory tree or zip archive without reading them yet
+
+    Args:
+        path: Directory or .zip file
+        is_supported: Whether a file name has a supported format
+
+    Yields:
+        (source name, function reading the file bytes), in sorted order; archive
+        members must be read before the next item is requested
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in sorted(archive.infolist(), key=lambda info: info.filename):
+                name = os.path.basename(info.filename)
+                if info.is_dir() or name.startswith(".") or not is_supported(name):
+                    continue
+                yield info.filename, lambda info=info: archive.read(info)
+        return
+
+    if not os.path.isdir(path):
+        raise ValueError(f"Not a directory or zip archive: {path}")
+    for root, directories, files in os.walk(path):
+        directories.sort()
+        for name in sorted(files):
+            if name.startswith(".") or not is_supported(name):
+                continue
+            file_path = os.path.join(root, name)
+            yield os.path.relpath(file_path, path), lambda file_path=file_path: _read_file(file_path)
+
+
+async def ingest(
+    source: str,
+    sink: BaseIngestSink,
+    parser: ResumeParser,
+    concurrency: int = 8,
+    max_pending: int = 32,
+    limit: Optional[int] = None,
+    progress_interval: float = 5.0,
+    progress: Optional[TextIO] = sys.stderr
+) -> IngestStats:
+    """
+    Parse every resume in a directory or zip archive into a sink
+
+    Args:
+        source: Directory or .zip file of resumes
+        sink: Destination and checkpoint of the records
+        parser: Resume parser; its document processor converts (on its worker pool, if any)
+        concurrency: Resumes extracted by the AI service at the same time
+        max_pending: Most resumes held in memory between reading and the written record
+        limit: Stop after this many new resumes (None ingests everything)
+        progress_interval: Seconds between progress lines
+        progress: Stream for progress lines (None stays quiet)
+
+    Returns:
+        Final statistics of the run
+    """
+    if concurrency < 1 or max_pending < concurrency:
+        raise ValueError("Ingest needs concurrency >= 1 and max_pending >= concurrency")
+    stats = IngestStats()
+    completed = sink.completed()
+    processor = parser.document_processor
+    # Bounds the documents in flight; the queue holds converted resumes waiting for extraction
+    pending = asyncio.Semaphore(max_pending)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+    conversions: Set[asyncio.Task] = set()
+    # Without a worker pool documents convert inline, and pdfium is not thread-safe
+    converter_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="blacktable-ingest")
+    loop = asyncio.get_running_loop()
+
+    def finish(record: IngestRecord) -> None:
+        sink.write(record)
+        if record.ok:
+            stats.parsed += 1
+        else:
+            stats.failed += 1
+        pending.release()
+
+    async def convert(name: str, data: bytes, started: float) -> None:
+        content_hash = hashlib.sha256(data).hexdigest()
+        try:
+            future = await loop.run_in_executor(
+                converter_thread, processor.submit_bytes, data, os.path.basename(name), content_hash
+            )
+            del data
+            conversion = await asyncio.wrap_future(future)
+        except Exception as e:
+            finish(IngestRecord(
+                source=name, sha256=content_hash, ok=False, error=f"Failed to convert resume: {e}",
+                duration=time.monotonic() - started
+            ))
+            return
+        await queue.put((name, conversion, started))
+
+    async def read_sources() -> None:
+        submitted = 0
+        for name, read in iter_sources(source, processor.is_supported_format):
+            if name in completed:
+                stats.skipped += 1
+                continue
+            if limit is not None and submitted >= limit:
+                break
+            await pending.acquire()
+            started = time.monotonic()
+            # Read before moving on: archive members can only be read while the archive is open
+            try:
+                data = await asyncio.to_thread(read)
+            except Exception as e:
+                finish(IngestRecord(source=name, ok=False, error=f"Failed to read resume: {e}"))
+                continue
+            task = asyncio.create_task(convert(name, data, started))
+            conversions.add(task)
+            task.add_done_callback(conversions.discard)
+            submitted += 1
+        if conversions:
+            await asyncio.gather(*conversions)
+
+    async def extract() -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            name, conversion, started = item
+            try:
+                resume_data = await parser.aparse_resume_from_text(conversion.markdown)
+                record = IngestRecord(
+                    source=name, sha256=conversion.sha256, ok=True, converter=conversion.converter,
+                    data=resume_data, duration=time.monotonic() - started
+                )
+            except Exception as e:
+                record = IngestRecord(
+                    source=name, sha256=conversion.sha256, ok=False, converter=conversion.converter,
+                    error=str(e), duration=time.monotonic() - started
+                )
+            finish(record)
+
+    async def report() -> None:
+        while True:
+            await asyncio.sleep(progress_interval)
+            print(stats.line(), file=progress, flush=True)
+
+    extractors = [asyncio.create_task(extract()) for _ in range(concurrency)]
+    reporter = asyncio.create_task(report()) if progress is not None else None
+    try:
+        await read_sources()
+        for _ in extractors:
+            await queue.put(None)
+        await asyncio.gather(*extractors)
+    finally:
+        for task in [*extractors, *conversions]:
+            task.cancel()
+        if reporter is not None:
+            reporter.cancel()
+        converter_thread.shutdown(wait=False, cancel_futures=True)
+    if progress is not None:
+        print(stats.line(), file=progress, flush=True)
+    return stats
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def _ends_with_newline(path: str) -> bool:
+    """Whether a file is missing, empty or ends with a complete line"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return True
+    with open(path, "rb") as file:
+        file.seek(-1, os.SEEK_END)
+        return file.read(1) == b"\n"
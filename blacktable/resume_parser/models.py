@@ -100,3 +100,27 @@ class Resume(BaseModel):
 class ResumeData(BaseModel):
     """Root resume data model"""
     resume: Optional[Resume] = None
+
+
+# Sub-schemas for sectioned extraction, one model call per resume section
+class WorkExperienceSection(BaseModel):
+    """Work experience section model"""
+    WorkExperience: List[WorkExperienceInfo] = Field(default_factory=list)
+
+
+class ProjectSection(BaseModel):
+    """Projects section model"""
+    Projects: List[Project] = Field(default_factory=list)
+
+
+class EducationSection(BaseModel):
+    """Education section model"""
+    Education: List[EducationInfo] = Field(default_factory=list)
+
+
+class ProfileSection(BaseModel):
+    """Contact details, summary, skills and everything else outside the other sections"""
+    About: Optional[AboutInfo] = None
+    CandidateOverall: Optional[CandidateOverallInfo] = None
+    Publications: Optional[List[str]] = Field(default_factory=list)
+    Weblinks: Optional[List[Weblink]] = Field(default_factory=list)
@@ -1,116 +1,464 @@
 """
 Resume Parser - Main parser class
 """
-from typing import Optional
-from .models import ResumeData
-from .utils import DocumentProcessor
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple, Type, Union
+from pydantic import BaseModel
+from .models import EducationSection, ProfileSection, ProjectSection, ResumeData, WorkExperienceSection
+from .preextract import PreExtracted, apply_pre_extracted, pre_extract
+from .sections import merge_resume_sections, split_resume_sections
+from .utils import ConversionResult, DocumentProcessor
 from ..core.ai_service import AIService
+from ..core.batch import BaseBatchBackend, BatchRequest, BatchResult
+from ..core.clients import get_ai_service
+from ..core.config import AIConfig
+
+
+SYSTEM_PROMPT = """
+You are an expert resume parser. Extract all relevant information from the resume and structure it according to the provided JSON schema.
+
+Guidelines:
+- Extract all information accurately
+- If information is not present, use null or empty arrays as appropriate
+- For work experience, assign sequential IDs starting from 1
+- For projects and education, also use sequential IDs
+- Parse dates in a readable format (e.g., "October 2023", "June 2023")
+- Extract skills from throughout the resume
+- Calculate total work experience in years
+- Be thorough in extracting descriptions and achievements
+"""
+
+SECTION_SYSTEM_PROMPT = """
+You are an expert resume parser. You are given one section of a resume, covering {description}. Extract the information it contains and structure it according to the provided JSON schema.
+
+Guidelines:
+- Extract all information accurately
+- If information is not present, use null or empty arrays as appropriate
+- Parse dates in a readable format (e.g., "October 2023", "June 2023")
+- List the skills mentioned for each entry
+- Be thorough in extracting descriptions and achievements
+"""
+
+# Sub-schema and contents of each resume section
+SECTION_SCHEMAS: Dict[str, Tuple[Type[BaseModel], str]] = {
+    "profile": (ProfileSection, "personal details, summary, skills, achievements, certificates and links"),
+    "experience": (WorkExperienceSection, "work experience, including internships"),
+    "projects": (ProjectSection, "projects"),
+    "education": (EducationSection, "education"),
+}
 
 
 class ResumeParser:
     """AI-powered resume parser"""
-    
-    def __init__(self, ai_provider: str = "openai"):
+
+    def __init__(
+        self,
+        ai_provider: str = "openai",
+        ai_service: Optional[AIService] = None,
+        sectioned: Optional[bool] = None,
+        pre_extract: Optional[bool] = None
+    ):
         """
         Initialize Resume Parser
-        
+
         Args:
             ai_provider: AI service provider ("openai" or "anthropic")
+            ai_service: AI service to use; defaults to the shared service for ai_provider
+            sectioned: Extract experience, projects, education and the rest of the
+                resume in concurrent calls (defaults to AIConfig.get_resume_sectioned())
+            pre_extract: Find emails, phone numbers and links locally and have the model
+                skip them (defaults to AIConfig.get_resume_pre_extract())
         """
         self.document_processor = DocumentProcessor()
-        self.ai_service = AIService(provider=ai_provider)
-    
+        self.ai_service = ai_service or get_ai_service(ai_provider)
+        self.sectioned = AIConfig.get_resume_sectioned() if sectioned is None else sectioned
+        self.pre_extract = AIConfig.get_resume_pre_extract() if pre_extract is None else pre_extract
+
     def parse_resume(self, file_path: str) -> ResumeData:
         """
         Parse resume from file and extract structured data
-        
+
         Args:
             file_path: Path to the resume file
-            
+
         Returns:
             ResumeData: Structured resume data
         """
-        # Validate file format
-        if not self.document_processor.is_supported_format(file_path):
-            raise ValueError(f"Unsupported file format: {file_path}")
-        
-        # Convert document to markdown
-        markdown_content = self.document_processor.convert_to_markdown(file_path)
-        
-        # Create prompt for AI extraction
-        system_prompt = """
-You are an expert resume parser. Extract all relevant information from the resume and structure it according to the provided JSON schema. 
+        markdown_content = self._convert_file(file_path)
 
-Guidelines:
-- Extract all information accurately
-- If information is not present, use null or empty arrays as appropriate
-- For work experience, assign sequential IDs starting from 1
-- For projects and education, also use sequential IDs
-- Parse dates in a readable format (e.g., "October 2023", "June 2023")
-- Extract skills from throughout the resume
-- Calculate total work experience in years
-- Be thorough in extracting descriptions and achievements
-"""
-        
-        extraction_prompt = f"""
-Please parse the following resume content and extract all information according to the JSON schema:
+        try:
+            return self._generate_resume(markdown_content)
+        except Exception as e:
+            raise ValueError(f"Failed to parse resume: {e}")
 
-Resume Content:
-{markdown_content}
+    async def aparse_resume(self, file_path: str) -> ResumeData:
+        """
+        Async variant of parse_resume
+
+        Document conversion runs in a worker thread so the event loop stays free.
+
+        Args:
+            file_path: Path to the resume file
+
+        Returns:
+            ResumeData: Structured resume data
+        """
+        markdown_content = await asyncio.to_thread(self._convert_file, file_path)
 
-Extract all personal information, work experience, projects, education, skills, achievements, and any other relevant details. Ensure all data is properly structured and accurate.
-"""
-        
-        # Generate structured response using AI
         try:
-            resume_data = self.ai_service.generate_structured_response(
-                prompt=extraction_prompt,
-                response_model=ResumeData,
-                system_prompt=system_prompt
-            )
-            return resume_data
+            return await self._agenerate_resume(markdown_content)
+        except Exception as e:
+            raise ValueError(f"Failed to parse resume: {e}")
+
+    def parse_resume_bytes(self, data: bytes, filename: str, content_hash: Optional[str] = None) -> ResumeData:
+        """
+        Parse a resume held in memory, e.g. an upload, without writing it to disk
+
+        Args:
+            data: Resume file bytes
+            filename: Original file name (its extension selects the converter)
+            content_hash: SHA-256 of data if already known, so the conversion
+                cache is checked without hashing again
+
+        Returns:
+            ResumeData: Structured resume data
+        """
+        markdown_content = self._convert_bytes(data, filename, content_hash)
+
+        try:
+            return self._generate_resume(markdown_content)
+        except Exception as e:
+            raise ValueError(f"Failed to parse resume: {e}")
+
+    async def aparse_resume_bytes(self, data: bytes, filename: str, content_hash: Optional[str] = None) -> ResumeData:
+        """
+        Async variant of parse_resume_bytes
+
+        Args:
+            data: Resume file bytes
+            filename: Original file name (its extension selects the converter)
+            content_hash: SHA-256 of data if already known
+
+        Returns:
+            ResumeData: Structured resume data
+        """
+        markdown_content = await asyncio.to_thread(self._convert_bytes, data, filename, content_hash)
+
+        try:
+            return await self._agenerate_resume(markdown_content)
         except Exception as e:
             raise ValueError(f"Failed to parse resume: {e}")
-    
+
     def parse_resume_from_text(self, text_content: str) -> ResumeData:
         """
         Parse resume from text content directly
-        
+
         Args:
             text_content: Resume text content
-            
+
         Returns:
             ResumeData: Structured resume data
         """
-        system_prompt = """
-You are an expert resume parser. Extract all relevant information from the resume and structure it according to the provided JSON schema. 
+        try:
+            return self._generate_resume(text_content)
+        except Exception as e:
+            raise ValueError(f"Failed to parse resume text: {e}")
 
-Guidelines:
-- Extract all information accurately
-- If information is not present, use null or empty arrays as appropriate
-- For work experience, assign sequential IDs starting from 1
-- For projects and education, also use sequential IDs
-- Parse dates in a readable format (e.g., "October 2023", "June 2023")
-- Extract skills from throughout the resume
-- Calculate total work experience in years
-- Be thorough in extracting descriptions and achievements
-"""
-        
-        extraction_prompt = f"""
-Please parse the following resume content and extract all information according to the JSON schema:
+    async def aparse_resume_from_text(self, text_content: str) -> ResumeData:
+        """
+        Async variant of parse_resume_from_text
 
-Resume Content:
-{text_content}
+        Args:
+            text_content: Resume text content
 
-Extract all personal information, work experience, projects, education, skills, achievements, and any other relevant details. Ensure all data is properly structured and accurate.
-"""
-        
+        Returns:
+            ResumeData: Structured resume data
+        """
         try:
-            resume_data = self.ai_service.generate_structured_response(
+            return await self._agenerate_resume(text_content)
+        except Exception as e:
+            raise ValueError(f"Failed to parse resume text: {e}")
+
+    def stream_resume_from_text(self, text_content: str) -> Iterator[BaseModel]:
+        """
+        Parse resume text, yielding partially filled results as the AI streams them
+
+        Sections such as About and WorkExperience become available while later
+        sections are still being generated.
+
+        Args:
+            text_content: Resume text content
+
+        Yields:
+            Partial resume data (all fields optional), then the final ResumeData
+        """
+        # Partial results keep showing the contact fields, so the model is not told to skip them
+        pre_extracted = self._pre_extract(text_content)
+        system_prompt, extraction_prompt = self._build_extraction_prompts(text_content)
+
+        try:
+            for resume_data in self.ai_service.stream_structured_response(
+                prompt=extraction_prompt,
+                response_model=ResumeData,
+                system_prompt=system_prompt,
+                stage="resume_parser.parse_resume"
+            ):
+                yield self._apply_pre_extracted(resume_data, pre_extracted)
+        except Exception as e:
+            raise ValueError(f"Failed to parse resume text: {e}")
+
+    async def astream_resume(self, file_path: str) -> AsyncIterator[BaseModel]:
+        """
+        Async streaming variant of parse_resume
+
+        Args:
+            file_path: Path to the resume file
+
+        Yields:
+            Partial resume data (all fields optional), then the final ResumeData
+        """
+        markdown_content = await asyncio.to_thread(self._convert_file, file_path)
+        async for resume_data in self.astream_resume_from_text(markdown_content):
+            yield resume_data
+
+    async def astream_resume_bytes(
+        self, data: bytes, filename: str, content_hash: Optional[str] = None
+    ) -> AsyncIterator[BaseModel]:
+        """
+        Async streaming variant of parse_resume_bytes
+
+        Args:
+            data: Resume file bytes
+            filename: Original file name (its extension selects the converter)
+            content_hash: SHA-256 of data if already known
+
+        Yields:
+            Partial resume data (all fields optional), then the final ResumeData
+        """
+        markdown_content = await asyncio.to_thread(self._convert_bytes, data, filename, content_hash)
+        async for resume_data in self.astream_resume_from_text(markdown_content):
+            yield resume_data
+
+    async def astream_resume_from_text(self, text_content: str) -> AsyncIterator[BaseModel]:
+        """
+        Async variant of stream_resume_from_text
+
+        Args:
+            text_content: Resume text content
+
+        Yields:
+            Partial resume data (all fields optional), then the final ResumeData
+        """
+        pre_extracted = self._pre_extract(text_content)
+        system_prompt, extraction_prompt = self._build_extraction_prompts(text_content)
+
+        try:
+            async for resume_data in self.ai_service.astream_structured_response(
+                prompt=extraction_prompt,
+                response_model=ResumeData,
+                system_prompt=system_prompt,
+                stage="resume_parser.parse_resume"
+            ):
+                yield self._apply_pre_extracted(resume_data, pre_extracted)
+        except Exception as e:
+            raise ValueError(f"Failed to parse resume: {e}")
+
+    def parse_resumes_batch(
+        self,
+        file_paths: List[str],
+        poll_interval: float = 30.0,
+        timeout: Optional[float] = None,
+        backend: BaseBatchBackend = None
+    ) -> Dict[str, BatchResult]:
+        """
+        Parse many resumes through the provider's offline batch API
+
+        Meant for bulk jobs that do not need interactive latency. Files that
+        cannot be converted are reported as failed results instead of
+        aborting the batch.
+
+        Args:
+            file_paths: Paths to resume files
+            poll_interval: Seconds between batch status polls
+            timeout: Give up after this many seconds (None waits indefinitely)
+            backend: Batch backend; defaults to the one matching the provider
+
+        Returns:
+            BatchResult (ResumeData on success) keyed by file path
+        """
+        results: Dict[str, BatchResult] = {}
+        requests: List[BatchRequest] = []
+        paths_by_id: Dict[str, str] = {}
+        pre_extracted_by_id: Dict[str, Optional[PreExtracted]] = {}
+        conversions = self._convert_files(file_paths)
+        for index, file_path in enumerate(file_paths):
+            custom_id = f"resume-{index}"
+            conversion = conversions[file_path]
+            if isinstance(conversion, Exception):
+                results[file_path] = BatchResult(custom_id=custom_id, error=f"Failed to convert resume: {conversion}")
+                continue
+            pre_extracted = self._pre_extract(conversion.markdown)
+            system_prompt, extraction_prompt = self._build_extraction_prompts(conversion.markdown, pre_extracted)
+            paths_by_id[custom_id] = file_path
+            pre_extracted_by_id[custom_id] = pre_extracted
+            requests.append(BatchRequest(
+                custom_id=custom_id,
                 prompt=extraction_prompt,
                 response_model=ResumeData,
                 system_prompt=system_prompt
+            ))
+
+        if requests:
+            batch_results = self.ai_service.run_batch(
+                requests, poll_interval=poll_interval, timeout=timeout, backend=backend
+            )
+            for custom_id, result in batch_results.items():
+                if result.ok:
+                    result.result = self._apply_pre_extracted(result.result, pre_extracted_by_id[custom_id])
+                results[paths_by_id[custom_id]] = result
+        return results
+
+    def _convert_file(self, file_path: str) -> str:
+        """Validate the file format and convert the document to markdown"""
+        if not self.document_processor.is_supported_format(file_path):
+            raise ValueError(f"Unsupported file format: {file_path}")
+
+        return self.document_processor.convert_to_markdown(file_path)
+
+    def _convert_bytes(self, data: bytes, filename: str, content_hash: Optional[str] = None) -> str:
+        """Validate the file format and convert in-memory document bytes to markdown"""
+        if not self.document_processor.is_supported_format(filename):
+            raise ValueError(f"Unsupported file format: {filename}")
+
+        return self.document_processor.convert_bytes(data, filename, content_hash).markdown
+
+    def _convert_files(self, file_paths: List[str]) -> Dict[str, Union[ConversionResult, Exception]]:
+        """Convert many documents in parallel, reporting unsupported formats and failures per file"""
+        supported = [path for path in file_paths if self.document_processor.is_supported_format(path)]
+        conversions = self.document_processor.convert_many(supported)
+        for file_path in file_paths:
+            if file_path not in conversions:
+                conversions[file_path] = ValueError(f"Unsupported file format: {file_path}")
+        return conversions
+
+    def _generate_resume(self, content: str) -> ResumeData:
+        """Extract ResumeData from resume content, section by section when sectioned"""
+        pre_extracted = self._pre_extract(content)
+        sections = self._split_sections(content)
+        if sections is None:
+            system_prompt, extraction_prompt = self._build_extraction_prompts(content, pre_extracted)
+            resume_data = self.ai_service.generate_structured_response(
+                prompt=extraction_prompt,
+                response_model=ResumeData,
+                system_prompt=system_prompt,
+                stage="resume_parser.parse_resume"
             )
+        else:
+            with ThreadPoolExecutor(max_workers=len(sections), thread_name_prefix="blacktable-sections") as executor:
+                futures = {
+                    kind: executor.submit(self._generate_section, kind, text, pre_extracted)
+                    for kind, text in sections.items()
+                }
+                resume_data = merge_resume_sections({kind: future.result() for kind, future in futures.items()})
+        return self._apply_pre_extracted(resume_data, pre_extracted)
+
+    async def _agenerate_resume(self, content: str) -> ResumeData:
+        """Async variant of _generate_resume"""
+        pre_extracted = self._pre_extract(content)
+        sections = self._split_sections(content)
+        if sections is None:
+            system_prompt, extraction_prompt = self._build_extraction_prompts(content, pre_extracted)
+            resume_data = await self.ai_service.agenerate_structured_response(
+                prompt=extraction_prompt,
+                response_model=ResumeData,
+                system_prompt=system_prompt,
+                stage="resume_parser.parse_resume"
+            )
+        else:
+            results = await asyncio.gather(*(
+                self._agenerate_section(kind, text, pre_extracted) for kind, text in sections.items()
+            ))
+            resume_data = merge_resume_sections(dict(zip(sections, results)))
+        return self._apply_pre_extracted(resume_data, pre_extracted)
+
+    def _pre_extract(self, content: str) -> Optional[PreExtracted]:
+        """Contact fields and links found locally, or None when pre-extraction is off"""
+        return pre_extract(content) if self.pre_extract else None
+
+    @staticmethod
+    def _apply_pre_extracted(resume_data: BaseModel, pre_extracted: Optional[PreExtracted]) -> BaseModel:
+        """Fill locally extracted fields into a final result; partial results pass through"""
+        if pre_extracted is None or not isinstance(resume_data, ResumeData):
             return resume_data
-        except Exception as e:
-            raise ValueError(f"Failed to parse resume text: {e}")
+        return apply_pre_extracted(resume_data, pre_extracted)
+
+    def _split_sections(self, content: str) -> Optional[Dict[str, str]]:
+        """Sections to extract separately, or None to extract the resume in one call"""
+        if not self.sectioned:
+            return None
+        sections = split_resume_sections(content)
+        # Without recognised headings everything lands in the profile
+        if set(sections) <= {"profile"}:
+            return None
+        return sections
+
+    def _generate_section(self, kind: str, content: str, pre_extracted: Optional[PreExtracted] = None) -> BaseModel:
+        """Extract one resume section against its sub-schema"""
+        response_model, system_prompt, extraction_prompt = self._build_section_prompts(kind, content, pre_extracted)
+        return self.ai_service.generate_structured_response(
+            prompt=extraction_prompt,
+            response_model=response_model,
+            system_prompt=system_prompt,
+            stage=f"resume_parser.parse_resume.{kind}"
+        )
+
+    async def _agenerate_section(
+        self, kind: str, content: str, pre_extracted: Optional[PreExtracted] = None
+    ) -> BaseModel:
+        """Async variant of _generate_section"""
+        response_model, system_prompt, extraction_prompt = self._build_section_prompts(kind, content, pre_extracted)
+        return await self.ai_service.agenerate_structured_response(
+            prompt=extraction_prompt,
+            response_model=response_model,
+            system_prompt=system_prompt,
+            stage=f"resume_parser.parse_resume.{kind}"
+        )
+
+    def _build_section_prompts(
+        self, kind: str, content: str, pre_extracted: Optional[PreExtracted] = None
+    ) -> Tuple[Type[BaseModel], str, str]:
+        """Build the (sub-schema, system prompt, extraction prompt) for one resume section"""
+        content, report = self.ai_service.fit_input(content, stage=f"resume_parser.parse_resume.{kind}")
+        if report.compacted:
+            print(f"Warning: resume {kind} section compacted to fit the token budget: {report.summary()}")
+        response_model, description = SECTION_SCHEMAS[kind]
+        extraction_prompt = f"""
+Please parse the following resume section and extract its information according to the JSON schema:
+
+Resume Section:
+{content}
+"""
+        # Only the profile schema holds the contact fields and links
+        if pre_extracted is not None and kind == "profile":
+            extraction_prompt += pre_extracted.instructions()
+        return response_model, SECTION_SYSTEM_PROMPT.format(description=description), extraction_prompt
+
+    def _build_extraction_prompts(
+        self, content: str, pre_extracted: Optional[PreExtracted] = None
+    ) -> Tuple[str, str]:
+        """Build the (system prompt, extraction prompt) pair for resume content, skipping pre-extracted fields"""
+        content, report = self.ai_service.fit_input(content, stage="resume_parser.parse_resume")
+        if report.compacted:
+            print(f"Warning: resume content compacted to fit the token budget: {report.summary()}")
+        extraction_prompt = f"""
+Please parse the following resume content and extract all information according to the JSON schema:
+
+Resume Content:
+{content}
+
+Extract all personal information, work experience, projects, education, skills, achievements, and any other relevant details. Ensure all data is properly structured and accurate.
+"""
+        if pre_extracted is not None:
+            extraction_prompt += pre_extracted.instructions()
+        return SYSTEM_PROMPT, extraction_prompt
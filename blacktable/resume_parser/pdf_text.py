@@ -0,0 +1,180 @@
+"""
+Fast text-layer extraction for digitally generated PDFs
+
+Most resumes are exported from a word processor and carry a clean text layer,
+which pdfium reads in milliseconds. Docling's layout and OCR models are only
+needed for scans, garbled font encodings and complex layouts, so the text
+layer is checked first:
+
+- text density: too few characters per page means a scan or an image-only PDF
+- garbled glyphs: private-use, control and replacement characters from fonts
+  without a usable Unicode mapping
+- columns: two-column layouts are read column by column; more complex layouts
+  are left to Docling
+"""
+import re
+import threading
+import unicodedata
+from typing import List, Optional, Tuple, Union
+from pydantic import BaseModel
+
+
+MIN_CHARS_PER_PAGE = 200
+MAX_GARBLED_RATIO = 0.02
+MAX_COLUMNS = 2
+# A column gutter is crossed by at most this fraction of text lines...
+MAX_GUTTER_CROSSING = 0.05
+# ...and each side holds at least this fraction of the text width
+MIN_COLUMN_SHARE = 0.2
+
+# pdfium is not thread-safe; conversions run from request and ingest threads
+_pdfium_lock = threading.Lock()
+
+
+class TextLayerQuality(BaseModel):
+    """How usable a PDF's text layer is"""
+    pages: int
+    chars: int  # non-whitespace characters
+    chars_per_page: float
+    garbled_ratio: float
+    columns: int  # most columns found on a page
+    ok: bool
+    reason: Optional[str] = None  # why Docling is needed
+
+
+def extract_pdf_text(source: Union[str, bytes]) -> Tuple[str, TextLayerQuality]:
+    """
+    Read the text layer of a PDF in reading order (needs pypdfium2)
+
+    Args:
+        source: Path to the PDF, or its bytes
+
+    Returns:
+        (text, quality of the text layer)
+    """
+    import pypdfium2 as pdfium
+
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(source)
+        try:
+            page_texts = []
+            max_columns = 1
+            for index in range(len(pdf)):
+                page = pdf[index]
+                textpage = page.get_textpage()
+                try:
+                    width, _ = page.get_size()
+                    rects = [textpage.get_rect(i) for i in range(textpage.count_rects())]
+                    columns = find_columns(rects, width)
+                    max_columns = max(max_columns, len(columns))
+                    if len(columns) == 1:
+                        page_texts.append(textpage.get_text_range())
+                    else:
+                        page_texts.append("\n".join(
+                            textpage.get_text_bounded(left=left, right=right) for left, right in columns
+                        ))
+                finally:
+                    textpage.close()
+                    page.close()
+            page_count = len(pdf)
+        finally:
+            pdf.close()
+
+    text = "\n\n".join(_normalize(page_text) for page_text in page_texts).strip()
+    return text, assess_text_layer(text, page_count, max_columns)
+
+
+def assess_text_layer(text: str, pages: int, columns: int) -> TextLayerQuality:
+    """
+    Decide whether extracted text is good enough to skip Docling
+
+    Args:
+        text: Extracted text
+        pages: Page count
+        columns: Most columns found on a page
+
+    Returns:
+        TextLayerQuality with ok set and, if not ok, the reason
+    """
+    visible = [char for char in text if not char.isspace()]
+    garbled = sum(1 for char in visible if _is_garbled(char))
+    chars_per_page = len(visible) / pages if pages else 0.0
+    garbled_ratio = garbled / len(visible) if visible else 0.0
+
+    reason = None
+    if chars_per_page < MIN_CHARS_PER_PAGE:
+        reason = f"sparse text layer ({chars_per_page:.0f} characters per page)"
+    elif garbled_ratio > MAX_GARBLED_RATIO:
+        reason = f"garbled text ({garbled_ratio:.1%} unmapped glyphs)"
+    elif columns > MAX_COLUMNS:
+        reason = f"complex layout ({columns} columns)"
+    return TextLayerQuality(
+        pages=pages,
+        chars=len(visible),
+        chars_per_page=chars_per_page,
+        garbled_ratio=garbled_ratio,
+        columns=columns,
+        ok=reason is None,
+        reason=reason
+    )
+
+
+def find_columns(rects: List[Tuple[float, float, float, float]], width: float) -> List[Tuple[float, float]]:
+    """
+    Split a page into text columns at gutters that no text line crosses
+
+    Args:
+        rects: Text line boxes as (left, bottom, right, top)
+        width: Page width
+
+    Returns:
+        (left, right) bounds of each column, left to right
+    """
+    gutter = _find_gutter(rects)
+    if gutter is None:
+        return [(0.0, width)]
+    left_rects = [rect for rect in rects if rect[2] <= gutter]
+    right_rects = [rect for rect in rects if rect[0] >= gutter]
+    left_columns = find_columns(left_rects, gutter)
+    right_columns = [(max(left, gutter), right) for left, right in find_columns(right_rects, width)]
+    return [(left, min(right, gutter)) for left, right in left_columns] + right_columns
+
+
+def _find_gutter(rects: List[Tuple[float, float, float, float]]) -> Optional[float]:
+    """The x position splitting rects into two substantial columns, if there is one"""
+    if len(rects) < 6:
+        return None
+    total_width = sum(right - left for left, _, right, _ in rects) or 1.0
+    best, best_crossing = None, None
+    # Candidate gutters sit just right of a line's end
+    for x in sorted({rect[2] for rect in rects}):
+        crossing = sum(1 for left, _, right, _ in rects if left < x < right)
+        if crossing > MAX_GUTTER_CROSSING * len(rects):
+            continue
+        left_share = sum(right - left for left, _, right, _ in rects if right <= x) / total_width
+        right_share = sum(right - left for left, _, right, _ in rects if left >= x) / total_width
+        if left_share < MIN_COLUMN_SHARE or right_share < MIN_COLUMN_SHARE:
+            continue
+        if best_crossing is None or crossing < best_crossing:
+            best, best_crossing = x, crossing
+    if best is None:
+        return None
+    # Centre the gutter in the empty band
+    next_start = min((rect[0] for rect in rects if rect[0] >= best), default=best)
+    return (best + next_start) / 2
+
+
+def _is_garbled(char: str) -> bool:
+    """Whether a character comes from a glyph without a Unicode mapping"""
+    if char in "\ufffd\ufffe":
+        return True
+    return unicodedata.category(char) in ("Co", "Cn", "Cc")
+
+
+def _normalize(text: str) -> str:
+    """Normalize line endings, soft hyphens and blank runs of extracted text"""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    # pdfium marks hyphens it inserted at line breaks with U+0002
+    text = text.replace("\x02\n", "").replace("\x02", "-")
+    text = "\n".join(line.rstrip() for line in text.split("\n"))
+    return re.sub(r"\n{3,}", "\n\n", text)
@@ -0,0 +1,137 @@
+"""
+Worker processes for document conversion
+
+Docling conversion is CPU-bound and holds the GIL for long stretches, so a
+process converts one document at a time no matter how many threads submit
+work. ConverterPool runs conversions in worker processes that each build and
+warm their own converter once, and recycles workers after a number of tasks
+to contain the memory growth of long-running model pipelines.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, List, Optional, Union
+
+from .utils import ConversionResult, DocumentProcessor
+
+
+def create_docling_converter() -> Any:
+    """Build a Docling converter with its PDF pipeline (layout and table models) loaded"""
+    from docling.document_converter import DocumentConverter
+
+    converter = DocumentConverter()
+    try:
+        from docling.datamodel.base_models import InputFormat
+
+        converter.initialize_pipeline(InputFormat.PDF)
+    except Exception:
+        # Older Docling versions build their pipelines on first conversion
+        pass
+    return converter
+
+
+# Converter owned by the current worker process
+_worker_processor: Optional[DocumentProcessor] = None
+
+
+def _init_worker(converter_factory: Callable[[], Any]) -> None:
+    """Build this worker's converter before it takes any task"""
+    global _worker_processor
+    _worker_processor = DocumentProcessor(cache=None, pool=None)
+    _worker_processor._converter = converter_factory()
+
+
+def _convert_in_worker(
+    source: Union[str, bytes], content_hash: str, pdf_fast_path: bool, filename: Optional[str]
+) -> ConversionResult:
+    _worker_processor.pdf_fast_path = pdf_fast_path
+    return _worker_processor._convert_document(source, content_hash, filename)
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+class ConverterPool:
+    """Pool of worker processes, each holding a warm document converter"""
+
+    def __init__(
+        self,
+        workers: int,
+        max_tasks_per_child: Optional[int] = 50,
+        converter_factory: Callable[[], Any] = create_docling_converter
+    ):
+        """
+        Args:
+            workers: Number of worker processes
+            max_tasks_per_child: Conversions after which a worker is replaced (None never replaces)
+            converter_factory: Picklable top-level function building a worker's converter
+        """
+        if workers < 1:
+            raise ValueError("Converter pool needs at least one worker")
+        self.workers = workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.converter_factory = converter_factory
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """Process pool, started on first use"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # Forked workers would inherit the parent's threads and locks; spawn starts clean
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                        initargs=(self.converter_factory,),
+                        max_tasks_per_child=self.max_tasks_per_child
+                    )
+        return self._executor
+
+    def submit(
+        self,
+        source: Union[str, bytes],
+        content_hash: str,
+        pdf_fast_path: bool = True,
+        filename: Optional[str] = None
+    ) -> "Future[ConversionResult]":
+        """
+        Convert a document in a worker process
+
+        Args:
+            source: Path to the document file, or its bytes
+            content_hash: SHA-256 of the file bytes
+            pdf_fast_path: Try a PDF's text layer before Docling
+            filename: Original file name when source is bytes
+
+        Returns:
+            Future resolving to the ConversionResult
+        """
+        return self.executor.submit(_convert_in_worker, source, content_hash, pdf_fast_path, filename)
+
+    def warm(self) -> List[int]:
+        """
+        Start every worker and build its converter now instead of on the first documents
+
+        Returns:
+            Process ids of the ready workers
+        """
+        futures = [self.executor.submit(_ready) for _ in range(self.workers)]
+        return sorted({future.result() for future in futures})
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
+
+    def __enter__(self) -> "ConverterPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
@@ -0,0 +1,191 @@
+"""
+Local pre-extraction of contact fields
+
+Email addresses, phone numbers and profile links follow fixed formats and are
+found with regular expressions far faster and more reliably than the model
+writes them out. They are extracted before the model call, the model is told
+to leave them (and the total work experience, which is computed from the role
+dates) empty, and the local values are filled into its result afterwards.
+"""
+import datetime
+import re
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from .models import About, Resume, ResumeData, Weblink
+from .timeline import total_experience_years
+
+
+_EMAIL = re.compile(r"(?<![\w.+-])[A-Za-z0-9][A-Za-z0-9._%+-]*@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+_PHONE = re.compile(r"(?<![\w/.])\+?\(?\d[\d \t().-]{7,}\d(?![\w/])")
+_PHONE_LABEL = re.compile(r"\b(phone|mobile|mob|tel|telephone|cell|contact|whatsapp)\b", re.IGNORECASE)
+_YEAR = re.compile(r"(?:19|20)\d{2}")
+_MONTH_YEAR = re.compile(r"\b\d{1,2}[./-](?:19|20)\d{2}\b")
+# Unlabelled numbers must look like phone numbers: international, or grouped like "(555) 123-4567"
+_PHONE_FORMAT = re.compile(r"\+\d.*|\(?\d{2,5}\)?(?:[ .-]\d{2,5}){1,3}")
+
+# Platform names by domain
+PLATFORMS = {
+    "linkedin.com": "LinkedIn",
+    "github.com": "GitHub",
+    "gitlab.com": "GitLab",
+    "bitbucket.org": "Bitbucket",
+    "leetcode.com": "LeetCode",
+    "kaggle.com": "Kaggle",
+    "stackoverflow.com": "Stack Overflow",
+    "medium.com": "Medium",
+    "behance.net": "Behance",
+    "dribbble.com": "Dribbble",
+    "twitter.com": "Twitter",
+    "x.com": "X",
+    "hackerrank.com": "HackerRank",
+    "codeforces.com": "Codeforces",
+    "scholar.google.com": "Google Scholar",
+    "orcid.org": "ORCID",
+}
+_PLATFORM_DOMAINS = "|".join(re.escape(domain) for domain in sorted(PLATFORMS, key=len, reverse=True))
+# Full URLs, plus bare profile links such as "github.com/jane"
+_URL = re.compile(
+    r"(?:https?://|www\.)[^\s<>()\[\]{}\"'|]+"
+    rf"|(?<![@\w.])(?:[\w-]+\.)?(?:{_PLATFORM_DOMAINS})/[^\s<>()\[\]{{}}\"'|,;]+",
+    re.IGNORECASE
+)
+
+
+class PreExtracted(BaseModel):
+    """Fields found in resume text without the model"""
+    Email: Optional[str] = None
+    Mobile: Optional[str] = None
+    Linkedin: Optional[str] = None
+    Weblinks: List[Weblink] = Field(default_factory=list)
+
+    def instructions(self) -> str:
+        """Prompt note telling the model which fields to leave empty"""
+        fields = [f"About.{name}" for name in ("Email", "Mobile", "Linkedin") if getattr(self, name)]
+        fields.append("About.TotalWorkExperience")
+        note = f"\nThese fields are filled in automatically, leave them null: {', '.join(fields)}."
+        if self.Weblinks:
+            links = ", ".join(weblink.Link for weblink in self.Weblinks)
+            note += f"\nThese links are already extracted, list only other links in Weblinks: {links}"
+        return note + "\n"
+
+
+def pre_extract(text: str) -> PreExtracted:
+    """
+    Find the email address, phone number and profile links in resume text
+
+    Args:
+        text: Resume markdown or plain text
+
+    Returns:
+        PreExtracted with the first email and phone number and every distinct link
+    """
+    # Docling escapes underscores in markdown
+    text = text.replace("\\_", "_")
+    pre_extracted = PreExtracted(Email=_find_email(text), Mobile=_find_phone(text))
+
+    seen = set()
+    for match in _URL.finditer(text):
+        link = _clean_link(match.group(0))
+        key = _link_key(link)
+        if not key or key in seen or "@" in key:
+            continue
+        seen.add(key)
+        platform = _platform(key)
+        pre_extracted.Weblinks.append(Weblink(Platform=platform, Link=link))
+        if platform == "LinkedIn" and pre_extracted.Linkedin is None:
+            pre_extracted.Linkedin = link
+    return pre_extracted
+
+
+def apply_pre_extracted(
+    resume_data: ResumeData, pre_extracted: PreExtracted, today: datetime.date = None
+) -> ResumeData:
+    """
+    Fill locally extracted fields into a model result, local values winning
+
+    Args:
+        resume_data: Result of the model
+        pre_extracted: Fields found by pre_extract
+        today: Date that ongoing roles run until (defaults to today)
+
+    Returns:
+        Copy of resume_data with the contact fields, links and TotalWorkExperience set
+    """
+    resume = resume_data.resume.model_copy(deep=True) if resume_data.resume else Resume()
+    if resume.About is None:
+        resume.About = About()
+
+    for name in ("Email", "Mobile", "Linkedin"):
+        value = getattr(pre_extracted, name)
+        if value:
+            setattr(resume.About, name, value)
+    total_experience = total_experience_years(resume.WorkExperience or [], today)
+    if total_experience is not None:
+        resume.About.TotalWorkExperience = total_experience
+
+    weblinks = list(pre_extracted.Weblinks)
+    seen = {_link_key(weblink.Link) for weblink in weblinks}
+    for weblink in resume.Weblinks or []:
+        key = _link_key(weblink.Link or "")
+        if key and key in seen:
+            continue
+        seen.add(key)
+        weblinks.append(weblink)
+    resume.Weblinks = weblinks
+    return ResumeData(resume=resume)
+
+
+def _find_email(text: str) -> Optional[str]:
+    match = _EMAIL.search(text)
+    return match.group(0).rstrip(".") if match else None
+
+
+def _find_phone(text: str) -> Optional[str]:
+    """
+    First phone number on a labelled line ("Phone: ..."), else the first
+    unlabelled one formatted like a phone number
+
+    Bare digit runs such as order, account or ISBN numbers are left to the model.
+    """
+    formatted = None
+    for line in text.split("\n"):
+        labelled = _PHONE_LABEL.search(line) is not None
+        for match in _PHONE.finditer(line):
+            number = " ".join(match.group(0).split())
+            digits = re.sub(r"\D", "", number)
+            if not 10 <= len(digits) <= 15:
+                continue
+            # Date ranges such as "2019 - 2021 2022" or "01.2019 - 03.2020"
+            groups = re.findall(r"\d+", number)
+            if all(_YEAR.fullmatch(group) for group in groups) or _MONTH_YEAR.search(number):
+                continue
+            if labelled:
+                return number
+            if formatted is None and _PHONE_FORMAT.fullmatch(number):
+                formatted = number
+    return formatted
+
+
+def _clean_link(link: str) -> str:
+    link = link.rstrip(".,;:!?*_")
+    if not re.match(r"https?://", link, re.IGNORECASE):
+        link = "https://" + link
+    return link
+
+
+def _link_key(link: str) -> str:
+    """Link without scheme, www and trailing slash, for de-duplication"""
+    key = re.sub(r"^https?://", "", link.strip(), flags=re.IGNORECASE).lower()
+    if key.startswith("www."):
+        key = key[4:]
+    return key.rstrip("/")
+
+
+def _platform(key: str) -> str:
+    host = key.split("/", 1)[0]
+    for domain, platform in PLATFORMS.items():
+        if host == domain or host.endswith("." + domain):
+            return platform
+    return "Website"
@@ -0,0 +1,198 @@
+"""
+Local resume segmentation
+
+Splits converted resume markdown into the parts that are extracted by
+separate model calls: work experience, projects, education and everything
+else (contact details, summary, skills, achievements and so on). Headings
+are recognised from Docling's `#` headings, short standalone lines such as
+"Work Experience" and ALL-CAPS heading words that PDF text layers run into
+the first line of a page ("EDUCATION IILM University, ...").
+
+The per-section results are merged back into one ResumeData with sequential
+IDs, skills collected from every section and total work experience computed
+from the role dates.
+"""
+import datetime
+import re
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from .models import (
+    About, CandidateOverall, EducationSection, ProfileSection, ProjectSection, Resume, ResumeData,
+    WorkExperienceSection,
+)
+from .timeline import total_experience_years
+
+
+# Section kinds, in the order they are returned
+SECTION_KINDS = ("profile", "experience", "projects", "education")
+
+SECTION_HEADINGS: Dict[str, Tuple[str, ...]] = {
+    "experience": (
+        "experience", "work experience", "professional experience", "relevant experience", "industry experience",
+        "employment", "employment history", "work history", "career history", "internships", "internship",
+        "internship experience", "experience and internships",
+    ),
+    "projects": (
+        "projects", "project", "personal projects", "academic projects", "key projects", "selected projects",
+        "side projects", "project experience", "project work",
+    ),
+    "education": (
+        "education", "academic background", "academics", "academic qualifications", "educational qualifications",
+        "qualifications", "education and training", "academic details",
+    ),
+    "profile": (
+        "summary", "professional summary", "profile", "about", "about me", "objective", "career objective",
+        "skills", "technical skills", "key skills", "core competencies", "certifications", "certificates",
+        "awards", "achievements", "honors", "honours", "awards and achievements", "publications", "interests",
+        "hobbies", "languages", "extracurricular activities", "extracurriculars", "activities", "volunteering",
+        "volunteer experience", "leadership", "references", "contact", "personal details", "personal information",
+    ),
+}
+_HEADING_KINDS = {heading: kind for kind, headings in SECTION_HEADINGS.items() for heading in headings}
+_LONGEST_HEADING = max(len(heading.split()) for heading in _HEADING_KINDS)
+
+_MARKDOWN_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+(.*)$")
+_CAPS_WORD = re.compile(r"^[A-Z&/]+:?$")
+_LIST_ITEM = re.compile(r"^\s*[-*•]\s")
+_PAGE_BREAK = re.compile(r"^\s*(<!--\s*page ?break\s*-->|page \d+( of \d+)?|\d+\s*/\s*\d+)\s*$", re.IGNORECASE)
+
+
+def split_resume_sections(markdown: str) -> Dict[str, str]:
+    """
+    Split resume markdown into sections
+
+    Text before the first recognised heading belongs to the profile. Unknown
+    headings, such as a job title under Experience, stay in the current section.
+
+    Args:
+        markdown: Resume markdown
+
+    Returns:
+        Section text by kind ("profile", "experience", "projects", "education"),
+        with empty sections left out
+    """
+    lines: Dict[str, List[str]] = {kind: [] for kind in SECTION_KINDS}
+    current = "profile"
+    page_start = True
+    for line in markdown.split("\n"):
+        kind = heading_kind(line, page_start)
+        if kind is not None:
+            current = kind
+        lines[current].append(line)
+        if _PAGE_BREAK.match(line):
+            page_start = True
+        elif line.strip():
+            page_start = False
+
+    sections = {}
+    for kind in SECTION_KINDS:
+        text = "\n".join(lines[kind]).strip()
+        if text:
+            sections[kind] = text
+    return sections
+
+
+def heading_kind(line: str, page_start: bool = False) -> Optional[str]:
+    """
+    Section kind a line starts, if it is a section heading
+
+    Args:
+        line: One line of resume markdown
+        page_start: Whether the line is the first one of a page, where
+            ALL-CAPS heading words may run into the text after them
+
+    Returns:
+        Section kind, or None for ordinary lines and unknown headings
+    """
+    markdown_heading = _MARKDOWN_HEADING.match(line)
+    if markdown_heading:
+        # "## Work Experience & Internships" starts with a known heading
+        words = _words(markdown_heading.group(1))
+        for length in range(min(len(words), _LONGEST_HEADING), 0, -1):
+            kind = _HEADING_KINDS.get(" ".join(words[:length]))
+            if kind is not None:
+                return kind
+        return None
+
+    # "- Leadership" is a list item, not a heading
+    if _LIST_ITEM.match(line):
+        return None
+    words = _words(line)
+    if 0 < len(words) <= _LONGEST_HEADING:
+        kind = _HEADING_KINDS.get(" ".join(words))
+        if kind is not None:
+            return kind
+    if not page_start:
+        # Elsewhere leading caps are as likely a job title ("PROJECT MANAGER Acme Corp")
+        return None
+
+    # "EXPERIENCE Outlier Sept 2023 - Present ..." from PDF text layers
+    caps = []
+    for word in line.split()[:_LONGEST_HEADING]:
+        if not _CAPS_WORD.match(word):
+            break
+        caps.append(word)
+    for length in range(len(caps), 0, -1):
+        kind = _HEADING_KINDS.get(" ".join(_words(" ".join(caps[:length]))))
+        if kind is not None:
+            return kind
+    return None
+
+
+def _words(text: str) -> List[str]:
+    """Lowercase words of a heading, without markup and punctuation"""
+    return re.sub(r"[^a-z]+", " ", text.lower().replace("&", " and ")).split()
+
+
+def merge_resume_sections(results: Dict[str, BaseModel], today: datetime.date = None) -> ResumeData:
+    """
+    Merge per-section extraction results into one ResumeData
+
+    Args:
+        results: Extracted section models by kind; missing kinds are treated as empty
+        today: Date that ongoing roles run until (defaults to today)
+
+    Returns:
+        ResumeData with IDs numbered from 1 in each list, the profile skills
+        extended by the skills of every role and project, and TotalWorkExperience
+        computed from the role dates when any of them can be parsed
+    """
+    profile = results.get("profile") or ProfileSection()
+    experience = results.get("experience") or WorkExperienceSection()
+    projects = results.get("projects") or ProjectSection()
+    education = results.get("education") or EducationSection()
+
+    work_experience = _numbered(experience.WorkExperience)
+    project_list = _numbered(projects.Projects)
+
+    about = (profile.About or About()).model_copy()
+    total_experience = total_experience_years(work_experience, today)
+    if total_experience is not None:
+        about.TotalWorkExperience = total_experience
+
+    overall = (profile.CandidateOverall or CandidateOverall()).model_copy()
+    skills = list(overall.Skills or [])
+    seen = {skill.strip().lower() for skill in skills}
+    for entry in work_experience + project_list:
+        for skill in entry.Skills or []:
+            if skill and skill.strip().lower() not in seen:
+                seen.add(skill.strip().lower())
+                skills.append(skill)
+    overall.Skills = skills
+
+    return ResumeData(resume=Resume(
+        About=about,
+        WorkExperience=work_experience,
+        Projects=project_list,
+        Publications=profile.Publications or [],
+        Education=_numbered(education.Education),
+        CandidateOverall=overall,
+        Weblinks=profile.Weblinks or []
+    ))
+
+
+def _numbered(items: List[BaseModel]) -> List[BaseModel]:
+    """Copies of the items with IDs numbered from 1"""
+    return [item.model_copy(update={"ID": index}) for index, item in enumerate(items or [], start=1)]
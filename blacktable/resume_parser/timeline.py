@@ -0,0 +1,157 @@
+"""
+Date parsing and experience arithmetic for resume timelines
+
+Resume dates come in many shapes ("Oct 2023", "10/2023", "2023-10", "2019",
+"Present"). They are parsed to (year, month) pairs so that total work
+experience can be computed locally instead of trusting the model's sum.
+"""
+import datetime
+import re
+from typing import List, Optional, Tuple
+
+from .models import WorkExperience
+
+
+YearMonth = Tuple[int, int]
+
+MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3, "apr": 4, "april": 4,
+    "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7, "aug": 8, "august": 8, "sep": 9, "sept": 9,
+    "september": 9, "oct": 10, "october": 10, "nov": 11, "november": 11, "dec": 12, "december": 12,
+}
+PRESENT = re.compile(r"\b(present|current|currently|now|today|ongoing|till date|to date)\b", re.IGNORECASE)
+
+_MONTH_NAME = "|".join(sorted(MONTHS, key=len, reverse=True))
+_MONTH_YEAR = re.compile(rf"\b({_MONTH_NAME})\.?,?\s*'?(\d{{4}}|\d{{2}})\b", re.IGNORECASE)
+_NUMERIC_MONTH_YEAR = re.compile(r"\b(0?[1-9]|1[0-2])\s*[/.\-]\s*((?:19|20)\d{2})\b")
+_YEAR_MONTH = re.compile(r"\b((?:19|20)\d{2})\s*[/.\-]\s*(0?[1-9]|1[0-2])\b")
+_YEAR = re.compile(r"\b((?:19|20)\d{2})\b")
+# Range separators: dashes ("2019-2021", "Jan 2019 - Mar 2020"), "to", "until", "till"
+_RANGE_SEPARATOR = re.compile(
+    r"\s*[‐-―]+\s*|\s+-+\s+|(?<=\d{4})-(?=\d{4}|[a-z])|\s+(?:to|until|till)\s+", re.IGNORECASE
+)
+
+
+def parse_date(text: Optional[str], end: bool = False, today: datetime.date = None) -> Optional[YearMonth]:
+    """
+    Parse a resume date
+
+    Args:
+        text: Date text such as "October 2023", "10/2023", "2019" or "Present"
+        end: Whether the date ends a period (a bare year then means December)
+        today: Date that "Present" refers to (defaults to today)
+
+    Returns:
+        (year, month), or None if no date is recognised
+    """
+    if not text:
+        return None
+    if PRESENT.search(text):
+        today = today or datetime.date.today()
+        return today.year, today.month
+
+    match = _MONTH_YEAR.search(text)
+    if match:
+        year = int(match.group(2))
+        if year < 100:
+            year += 2000 if year < 70 else 1900
+        return year, MONTHS[match.group(1).lower()]
+    match = _NUMERIC_MONTH_YEAR.search(text)
+    if match:
+        return int(match.group(2)), int(match.group(1))
+    match = _YEAR_MONTH.search(text)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    match = _YEAR.search(text)
+    if match:
+        return int(match.group(1)), 12 if end else 1
+    return None
+
+
+def parse_date_range(
+    text: Optional[str], today: datetime.date = None
+) -> Tuple[Optional[YearMonth], Optional[YearMonth]]:
+    """
+    Parse a period such as "Sept 2023 - Present" or "2016 to 2020"
+
+    Args:
+        text: Period text
+        today: Date that "Present" refers to (defaults to today)
+
+    Returns:
+        (start, end), either of which may be None
+    """
+    if not text:
+        return None, None
+    parts = [part for part in _RANGE_SEPARATOR.split(text.strip(), maxsplit=1) if part.strip()]
+    if len(parts) < 2:
+        return parse_date(text, today=today), None
+    return parse_date(parts[0], today=today), parse_date(parts[1], end=True, today=today)
+
+
+def months_between(start: YearMonth, end: YearMonth) -> int:
+    """Months covered from the start month through the end month (inclusive)"""
+    return (end[0] - start[0]) * 12 + end[1] - start[1] + 1
+
+
+def total_experience_months(experiences: List[WorkExperience], today: datetime.date = None) -> Optional[int]:
+    """
+    Months of work experience, counting overlapping roles once
+
+    A role without an end date is treated as ongoing.
+
+    Args:
+        experiences: Work experience entries
+        today: Date that ongoing roles run until (defaults to today)
+
+    Returns:
+        Total months, or None if no role has a parseable start date
+    """
+    today = today or datetime.date.today()
+    current = (today.year, today.month)
+    periods = []
+    for experience in experiences:
+        timeline = experience.Timeline
+        if timeline is None:
+            continue
+        start = parse_date(timeline.Start, today=today)
+        if start is None:
+            continue
+        end = parse_date(timeline.End, end=True, today=today) if timeline.End else current
+        if end is None:
+            continue
+        end = min(end, current)
+        if end >= start:
+            periods.append((start, end))
+    if not periods:
+        return None
+
+    periods.sort()
+    total = 0
+    merged_start, merged_end = periods[0]
+    for start, end in periods[1:]:
+        if months_between(merged_end, start) <= 2:
+            # Overlapping or back-to-back
+            merged_end = max(merged_end, end)
+        else:
+            total += months_between(merged_start, merged_end)
+            merged_start, merged_end = start, end
+    total += months_between(merged_start, merged_end)
+    return total
+
+
+def total_experience_years(experiences: List[WorkExperience], today: datetime.date = None) -> Optional[int]:
+    """
+    Whole years of work experience, counting overlapping roles once
+
+    Args:
+        experiences: Work experience entries
+        today: Date that ongoing roles run until (defaults to today)
+
+    Returns:
+        Years rounded to the nearest whole year, or None if no role has a parseable start date
+    """
+    months = total_experience_months(experiences, today)
+    if months is None:
+        return None
+    return int(months / 12 + 0.5)
@@ -1,54 +1,365 @@
 """
 Utility functions for Resume Parser
 """
+import hashlib
+import io
 import os
+import time
+from concurrent.futures import Future
+from importlib import metadata
 from pathlib import Path
-from docling.document_converter import DocumentConverter
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Union
+from pydantic import BaseModel
+
+from .cache import ConversionCache, hash_file, make_conversion_key
+from .extractors import EXTRACTOR_NAMES, EXTRACTORS, get_extractor
+from .pdf_text import extract_pdf_text
+from ..core.config import AIConfig
+
+if TYPE_CHECKING:
+    from .pool import ConverterPool
+
+
+# Formats that need Docling's layout analysis (PDFs try their text layer first)
+DOCLING_FORMATS = {'.pdf', '.doc'}
+
+
+class ConversionResult(BaseModel):
+    """A document converted to markdown"""
+    markdown: str
+    sha256: str  # of the file bytes
+    format: str  # file extension without the dot
+    converter: str  # direct extractor ("text", "markdown", "python-docx", "html", "rtf"), "pdfium" or "docling"
+    fallback_reason: Optional[str] = None  # why a PDF's text layer was not used
+    pages: Optional[int] = None
+    duration: float = 0.0  # seconds spent converting (0 when served from the cache)
+    cached: bool = False
 
 
 class DocumentProcessor:
     """Document processing utilities"""
-    
-    def __init__(self):
-        self.converter = DocumentConverter()
-    
+
+    _UNSET = object()
+
+    def __init__(
+        self,
+        cache: Optional[ConversionCache] = _UNSET,
+        pool: Optional["ConverterPool"] = _UNSET,
+        pdf_fast_path: Optional[bool] = None
+    ):
+        """
+        Args:
+            cache: Conversion cache; defaults to the configured on-disk cache,
+                pass None to convert every time
+            pool: Worker processes converting documents; defaults to the configured
+                pool, pass None to convert in the calling thread
+            pdf_fast_path: Read PDF text layers directly and run Docling only when
+                they look unusable; defaults to the configured setting
+        """
+        self._converter = None
+        self.pdf_fast_path = AIConfig.get_pdf_fast_path() if pdf_fast_path is None else pdf_fast_path
+        if cache is DocumentProcessor._UNSET:
+            path = AIConfig.get_conversion_cache_path()
+            cache = ConversionCache(path, AIConfig.get_conversion_cache_max_bytes()) if path else None
+        self.cache = cache
+        if pool is DocumentProcessor._UNSET:
+            workers = AIConfig.get_converter_workers()
+            if workers:
+                from .pool import ConverterPool
+
+                pool = ConverterPool(workers, max_tasks_per_child=AIConfig.get_converter_max_tasks_per_child())
+            else:
+                pool = None
+        self.pool = pool
+
+    @property
+    def converter(self):
+        """Docling converter, created on first use (importing docling loads torch and its models)"""
+        if self._converter is None:
+            from docling.document_converter import DocumentConverter
+
+            self._converter = DocumentConverter()
+        return self._converter
+
+    @property
+    def converter_config(self) -> Dict[str, Any]:
+        """Settings that change conversion output, part of every cache key"""
+        try:
+            version = metadata.version("docling")
+        except metadata.PackageNotFoundError:
+            version = None
+        return {"converter": "docling", "version": version, "pdf_fast_path": self.pdf_fast_path}
+
+    def convert(self, file_path: str) -> ConversionResult:
+        """
+        Convert a document to markdown, reusing earlier conversions of the same bytes
+
+        Args:
+            file_path: Path to the document file
+
+        Returns:
+            ConversionResult with the markdown and conversion details
+        """
+        return self.submit(file_path).result()
+
+    def convert_bytes(self, data: bytes, filename: str, content_hash: Optional[str] = None) -> ConversionResult:
+        """
+        Convert a document held in memory, e.g. an upload, without writing it to disk
+
+        Args:
+            data: Document bytes
+            filename: Original file name (its extension selects the converter)
+            content_hash: SHA-256 of data if already known, e.g. computed while it was received
+
+        Returns:
+            ConversionResult with the markdown and conversion details
+        """
+        return self.submit_bytes(data, filename, content_hash).result()
+
+    def submit(self, file_path: str) -> "Future[ConversionResult]":
+        """
+        Start converting a document
+
+        Cache hits, formats with a direct extractor and PDFs with a usable text layer resolve
+        immediately; other documents run in the worker pool if there is one, else in the calling thread.
+
+        Args:
+            file_path: Path to the document file
+
+        Returns:
+            Future resolving to the ConversionResult
+        """
+        try:
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"File not found: {file_path}")
+            if get_extractor(file_path) is not None:
+                # Small structured files: read once for both hashing and extraction
+                with open(file_path, "rb") as file:
+                    data = file.read()
+                return self.submit_bytes(data, file_path)
+            content_hash = hash_file(file_path)
+        except BaseException as e:
+            return self._failed(e)
+        return self._submit(file_path, file_path, content_hash)
+
+    def submit_bytes(
+        self, data: bytes, filename: str, content_hash: Optional[str] = None
+    ) -> "Future[ConversionResult]":
+        """
+        Start converting a document held in memory
+
+        Args:
+            data: Document bytes
+            filename: Original file name (its extension selects the converter)
+            content_hash: SHA-256 of data if already known
+
+        Returns:
+            Future resolving to the ConversionResult
+        """
+        if content_hash is None:
+            content_hash = hashlib.sha256(data).hexdigest()
+        return self._submit(data, filename, content_hash)
+
+    def _submit(self, source: Union[str, bytes], filename: str, content_hash: str) -> "Future[ConversionResult]":
+        """Convert a document given by path or bytes: direct extractor, cache, then pool or inline"""
+        future: "Future[ConversionResult]" = Future()
+        try:
+            # Formats without layout to analyze are extracted directly in milliseconds
+            extractor = get_extractor(filename)
+            if extractor is not None:
+                future.set_result(self._extract(source, filename, content_hash, extractor))
+                return future
+
+            key = make_conversion_key(content_hash, self.converter_config)
+            if self.cache is not None:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    markdown, details = cached
+                    future.set_result(ConversionResult(
+                        markdown=markdown, sha256=content_hash, cached=True, **{**details, "duration": 0.0}
+                    ))
+                    return future
+
+            if self.pool is None:
+                future.set_result(self._store(key, self._convert_document(source, content_hash, filename)))
+                return future
+
+            # Reading a text layer takes milliseconds, so only PDFs that need Docling go to the pool
+            fallback_reason = None
+            if self.pdf_fast_path and Path(filename).suffix.lower() == '.pdf':
+                conversion, fallback_reason = self._convert_text_layer(source, content_hash)
+                if conversion is not None:
+                    future.set_result(self._store(key, conversion))
+                    return future
+        except BaseException as e:
+            future.set_exception(e)
+            return future
+
+        converted = self.pool.submit(source, content_hash, pdf_fast_path=False, filename=filename)
+        converted.add_done_callback(lambda done: self._resolve(future, key, done, fallback_reason))
+        return future
+
+    def convert_many(self, file_paths: List[str]) -> Dict[str, Union[ConversionResult, Exception]]:
+        """
+        Convert documents in parallel on the worker pool
+
+        Args:
+            file_paths: Paths to document files
+
+        Returns:
+            ConversionResult, or the exception that failed the conversion, keyed by file path
+        """
+        futures = {file_path: self.submit(file_path) for file_path in file_paths}
+        results: Dict[str, Union[ConversionResult, Exception]] = {}
+        for file_path, future in futures.items():
+            try:
+                results[file_path] = future.result()
+            except Exception as e:
+                results[file_path] = e
+        return results
+
+    def close(self) -> None:
+        """Stop the worker pool and close the cache"""
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.cache is not None:
+            self.cache.close()
+
+    def _extract(
+        self, source: Union[str, bytes], filename: str, content_hash: str, extractor: Callable[[bytes], str]
+    ) -> ConversionResult:
+        """Convert a document with its direct extractor"""
+        file_extension = Path(filename).suffix.lower()
+        start = time.perf_counter()
+        try:
+            if isinstance(source, str):
+                with open(source, "rb") as file:
+                    source = file.read()
+            markdown = extractor(source)
+        except Exception as e:
+            raise ValueError(f"Failed to convert document {filename}: {e}")
+        return ConversionResult(
+            markdown=markdown,
+            sha256=content_hash,
+            format=file_extension.lstrip("."),
+            converter=EXTRACTOR_NAMES[file_extension],
+            duration=time.perf_counter() - start
+        )
+
+    def _convert_text_layer(
+        self, source: Union[str, bytes], content_hash: str
+    ) -> Tuple[Optional[ConversionResult], Optional[str]]:
+        """
+        Read a PDF's text layer
+
+        Returns:
+            (conversion, None) if the text layer is usable, else (None, why Docling is needed)
+        """
+        start = time.perf_counter()
+        try:
+            text, quality = extract_pdf_text(source)
+        except Exception as e:
+            return None, f"text layer unreadable: {e}"
+        if not quality.ok:
+            return None, quality.reason
+        return ConversionResult(
+            markdown=text,
+            sha256=content_hash,
+            format="pdf",
+            converter="pdfium",
+            pages=quality.pages,
+            duration=time.perf_counter() - start
+        ), None
+
+    def _convert_document(
+        self, source: Union[str, bytes], content_hash: str, filename: Optional[str] = None
+    ) -> ConversionResult:
+        """Convert a document (path or bytes) in this process, trying a PDF's text layer before Docling"""
+        filename = filename or source
+        file_extension = Path(filename).suffix.lower()
+        start = time.perf_counter()
+        fallback_reason = None
+        if self.pdf_fast_path and file_extension == '.pdf':
+            conversion, fallback_reason = self._convert_text_layer(source, content_hash)
+            if conversion is not None:
+                return conversion
+
+        try:
+            if isinstance(source, bytes):
+                from docling.datamodel.base_models import DocumentStream
+
+                source = DocumentStream(name=Path(filename).name, stream=io.BytesIO(source))
+            result = self.converter.convert(source)
+            markdown = result.document.export_to_markdown()
+        except Exception as e:
+            raise ValueError(f"Failed to convert document {filename}: {e}")
+        return ConversionResult(
+            markdown=markdown,
+            sha256=content_hash,
+            format=file_extension.lstrip("."),
+            converter="docling",
+            fallback_reason=fallback_reason,
+            pages=self._page_count(result),
+            duration=time.perf_counter() - start
+        )
+
+    def _failed(self, error: BaseException) -> "Future[ConversionResult]":
+        """A future that already holds an error"""
+        future: "Future[ConversionResult]" = Future()
+        future.set_exception(error)
+        return future
+
+    def _store(self, key: str, conversion: ConversionResult) -> ConversionResult:
+        """Save a fresh conversion in the cache"""
+        if self.cache is not None:
+            details = conversion.model_dump(include={"format", "converter", "fallback_reason", "pages", "duration"})
+            self.cache.set(key, conversion.markdown, details)
+        return conversion
+
+    def _resolve(
+        self,
+        future: "Future[ConversionResult]",
+        key: str,
+        converted: "Future[ConversionResult]",
+        fallback_reason: Optional[str] = None
+    ) -> None:
+        """Pass a pool conversion on to the caller's future, caching it"""
+        try:
+            conversion = converted.result()
+            if fallback_reason is not None:
+                conversion.fallback_reason = fallback_reason
+            future.set_result(self._store(key, conversion))
+        except BaseException as e:
+            future.set_exception(e)
+
     def convert_to_markdown(self, file_path: str) -> str:
         """
-        Convert document to markdown using Docling
-        
+        Convert document to markdown
+
         Args:
             file_path: Path to the document file
-            
+
         Returns:
             Markdown content of the document
         """
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
-        
-        file_extension = Path(file_path).suffix.lower()
-        
-        # For text files, read directly
-        if file_extension == '.txt':
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read()
-        
-        # For other formats, use Docling
-        try:
-            result = self.converter.convert(file_path)
-            return result.document.export_to_markdown()
-        except Exception as e:
-            raise ValueError(f"Failed to convert document {file_path}: {e}")
-    
+        return self.convert(file_path).markdown
+
     def is_supported_format(self, file_path: str) -> bool:
         """
         Check if file format is supported
-        
+
         Args:
             file_path: Path to the file
-            
+
         Returns:
             True if format is supported
         """
-        supported_extensions = {'.pdf', '.doc', '.docx', '.txt'}
         file_extension = Path(file_path).suffix.lower()
-        return file_extension in supported_extensions
+        return file_extension in DOCLING_FORMATS or file_extension in EXTRACTORS
+
+    def _page_count(self, result: Any) -> Optional[int]:
+        """Page count of a Docling conversion result, if it reports one"""
+        try:
+            return result.document.num_pages()
+        except Exception:
+            return None
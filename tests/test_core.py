@@ -0,0 +1,1283 @@
+"""
+Tests for the core AI service
+"""
+import asyncio
+import json
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+from unittest.mock import AsyncMock, Mock
+from pydantic import BaseModel, Field
+
+from blacktable.core.ai_service import AIService
+from blacktable.core.config import AIConfig
+from blacktable.core.batch import BatchRequest, LocalBatchBackend
+from blacktable.core.budget import TokenBudget
+from blacktable.core.clients import get_ai_service, get_http_client, reset_clients
+from blacktable.core.cache import MemoryCache, SQLiteCache, TieredCache, make_cache_key
+from blacktable.core.providers import BaseProvider, Completion, CompletionRequest
+from blacktable.core.json_repair import repair_json
+from blacktable.core.rate_limit import RateLimiter, RateLimits, SQLiteLimiterStore, parse_rate_limit_headers
+from blacktable.core.replay import Cassette, LatencyModel, ReplayProvider, fake_instance
+from blacktable.core.retry import RetryPolicy
+from blacktable.core.router import RouterProvider, RouteTarget
+from blacktable.core.telemetry import BaseTelemetrySink, JSONLSink, RingBufferSink, Telemetry, estimate_cost
+from blacktable.core.schema import SchemaPromptRegistry, compact_schema
+from blacktable.core.singleflight import SingleFlight
+from blacktable.core.stages import StagePolicies, StagePolicy, create_stage_policies
+from blacktable.core.streaming import make_partial_model, parse_partial_json
+from blacktable.core.tokens import HeuristicCounter, count_tokens, get_token_counter
+
+
+class Greeting(BaseModel):
+    """Small response model used across core tests"""
+    message: str
+    count: int = 0
+
+
+class Envelope(BaseModel):
+    """Nested response model used by schema tests"""
+    greeting: Greeting
+    note: Optional[str] = Field(None, description="x" * 200)
+
+
+def make_completion(payload) -> Completion:
+    """Build a provider completion carrying a JSON payload"""
+    text = payload if isinstance(payload, str) else json.dumps(payload)
+    return Completion(text=text, model="test-model", prompt_tokens=10, completion_tokens=5)
+
+
+@pytest.fixture
+def ai_service(monkeypatch):
+    """AI service with a mocked provider backend"""
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    service = AIService(provider="openai")
+    monkeypatch.setattr(service.backend, "complete", Mock())
+    monkeypatch.setattr(service.backend, "acomplete", AsyncMock())
+    return service
+
+
+class TestAIService:
+    """Test cases for AIService"""
+
+    def test_unsupported_provider(self):
+        """Test error for unknown providers"""
+        with pytest.raises(ValueError, match="Unsupported provider"):
+            AIService(provider="unknown")
+
+    def test_generate_structured_response(self, ai_service):
+        """Test blocking structured generation"""
+        ai_service.backend.complete.return_value = make_completion({"message": "hi", "count": 2})
+
+        result = ai_service.generate_structured_response("Say hi", Greeting)
+
+        assert result == Greeting(message="hi", count=2)
+        request = ai_service.backend.complete.call_args[0][0]
+        assert request.prompt == "Say hi"
+
+    def test_agenerate_structured_response(self, ai_service):
+        """Test async structured generation"""
+        ai_service.backend.acomplete.return_value = make_completion({"message": "hi"})
+
+        result = asyncio.run(ai_service.agenerate_structured_response("Say hi", Greeting))
+
+        assert result.message == "hi"
+        ai_service.backend.complete.assert_not_called()
+
+    def test_agenerate_text_response(self, ai_service):
+        """Test async text generation"""
+        ai_service.backend.acomplete.return_value = make_completion("plain text")
+
+        assert asyncio.run(ai_service.agenerate_text_response("Hello")) == "plain text"
+
+    def test_invalid_json_raises(self, ai_service):
+        """Test error for unparseable responses"""
+        ai_service.backend.complete.return_value = make_completion("not json")
+
+        with pytest.raises(ValueError, match="Greeting"):
+            ai_service.generate_structured_response("Say hi", Greeting)
+
+
+class TestResponseCache:
+    """Test cases for the response cache"""
+
+    def test_cache_key_is_stable(self):
+        """Test that identical inputs hash identically"""
+        key = make_cache_key("openai", "gpt-4o", "sys", "prompt", {"type": "object"}, 0.1)
+        assert key == make_cache_key("openai", "gpt-4o", "sys", "prompt", {"type": "object"}, 0.1)
+        assert key != make_cache_key("openai", "gpt-4o", "sys", "prompt", {"type": "object"}, 0.2)
+
+    def test_memory_cache_lru_and_ttl(self):
+        """Test size and TTL eviction of the memory tier"""
+        cache = MemoryCache(max_entries=2, ttl=60)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+
+        expired = MemoryCache(ttl=0)
+        expired.set("a", "1")
+        assert expired.get("a") is None
+        assert cache.stats.hits == 2
+        assert cache.stats.misses == 1
+
+    def test_tiered_cache_backfills_memory(self, tmp_path):
+        """Test that SQLite hits are promoted into the memory tier"""
+        sqlite_cache = SQLiteCache(str(tmp_path / "cache.sqlite3"))
+        sqlite_cache.set("key", "value")
+        memory_cache = MemoryCache()
+        cache = TieredCache([memory_cache, sqlite_cache])
+
+        assert cache.get("key") == "value"
+        assert memory_cache.get("key") == "value"
+
+    def test_structured_response_served_from_cache(self, ai_service):
+        """Test that repeated requests skip the provider"""
+        ai_service.backend.complete.return_value = make_completion({"message": "hi"})
+
+        first = ai_service.generate_structured_response("Say hi", Greeting, system_prompt="sys")
+        second = asyncio.run(ai_service.agenerate_structured_response("Say hi", Greeting, system_prompt="sys"))
+
+        assert first == second
+        assert ai_service.backend.complete.call_count == 1
+        ai_service.backend.acomplete.assert_not_called()
+        assert ai_service.cache_stats["hits"] == 1
+
+
+class TestSchemaPromptRegistry:
+    """Test cases for compiled schema prompts"""
+
+    def test_compact_schema_inlines_refs(self):
+        """Test $ref inlining, title removal and description trimming"""
+        compacted = compact_schema(Envelope.model_json_schema(), max_description_length=20)
+
+        assert "$defs" not in compacted
+        assert "title" not in compacted
+        assert compacted["properties"]["greeting"]["properties"]["message"] == {"type": "string"}
+        assert compacted["properties"]["note"]["type"] == ["string", "null"]
+        assert len(compacted["properties"]["note"]["description"]) == 20
+
+    def test_registry_compiles_once(self):
+        """Test that schemas are built once per model and reported"""
+        registry = SchemaPromptRegistry()
+
+        compiled = registry.get(Envelope)
+
+        assert registry.get(Envelope) is compiled
+        assert " " not in compiled.text
+        report = registry.report()
+        assert report[0]["model"] == "Envelope"
+        assert 0 < report[0]["tokens"] < report[0]["original_tokens"]
+
+    def test_prompt_uses_compiled_schema(self, ai_service):
+        """Test that the structured prompt carries the minified schema"""
+        ai_service.structured_mode = "prompt"
+        ai_service.backend.complete.return_value = make_completion({"message": "hi"})
+
+        ai_service.generate_structured_response("Say hi", Greeting)
+
+        request = ai_service.backend.complete.call_args[0][0]
+        assert request.json_mode is True
+        assert request.response_schema is None
+        assert ai_service.schemas.get(Greeting).text in request.static_prompt
+        assert request.prompt == "User request: Say hi"
+
+
+class TestNativeStructuredOutput:
+    """Test cases for native structured-output mode"""
+
+    def test_strict_schema(self):
+        """Test conversion to the strict structured-output subset"""
+        strict = SchemaPromptRegistry().get(Envelope).strict_schema
+
+        assert strict["additionalProperties"] is False
+        assert strict["required"] == ["greeting", "note"]
+        greeting = strict["properties"]["greeting"]
+        assert greeting["required"] == ["message", "count"]
+        assert greeting["properties"]["count"]["type"] == "integer"
+        assert "default" not in greeting["properties"]["count"]
+        assert strict["properties"]["note"]["type"] == ["string", "null"]
+
+    def test_defaulted_fields_are_not_nullable(self):
+        """Test that only Optional fields accept null in strict schemas"""
+        from blacktable.question_generator.models import Question
+        from blacktable.resume_parser.models import WorkExperienceSection
+
+        question = SchemaPromptRegistry().get(Question).strict_schema
+        section = SchemaPromptRegistry().get(WorkExperienceSection).strict_schema
+
+        assert question["properties"]["is_personalized"]["type"] == "boolean"
+        assert section["properties"]["WorkExperience"]["type"] == "array"
+
+    def test_nulls_for_defaulted_fields_validate(self, ai_service):
+        """Test that nulls sent for non-Optional defaulted fields fall back to their defaults"""
+        from blacktable.resume_parser.models import WorkExperienceSection
+
+        payload = {"WorkExperience": [{"Title": "Engineer", "Skills": None, "Location": None}]}
+        result, errors = ai_service._validate_structured_text(json.dumps(payload), WorkExperienceSection)
+        assert errors == []
+        assert result.WorkExperience[0].Skills is None
+
+        result, errors = ai_service._validate_structured_text('{"WorkExperience": null}', WorkExperienceSection)
+        assert (errors, result.WorkExperience) == ([], [])
+        result, _ = ai_service._validate_structured_text('{"message": "hi", "count": null}', Greeting)
+        assert result == Greeting(message="hi")
+
+    def test_free_form_dict_is_not_strict(self):
+        """Test that Dict[str, Any] fields keep the model on the prompt path"""
+        class Loose(BaseModel):
+            details: Dict[str, Any]
+
+        assert SchemaPromptRegistry().get(Loose).strict_schema is None
+
+    def test_openai_json_schema_request(self, ai_service):
+        """Test that native mode sends a strict json_schema response format"""
+        ai_service.backend.complete.return_value = make_completion({"message": "hi"})
+
+        ai_service.generate_structured_response("Say hi", Greeting)
+
+        request = ai_service.backend.complete.call_args[0][0]
+        kwargs = ai_service.backend._build_kwargs(request)
+        assert kwargs["response_format"]["type"] == "json_schema"
+        assert kwargs["response_format"]["json_schema"]["strict"] is True
+        assert kwargs["messages"][-1]["content"] == "Say hi"
+
+    def test_fallback_to_prompt_mode_on_rejection(self, ai_service, monkeypatch):
+        """Test that a rejected native schema falls back to the prompt path for that model"""
+        rejection = RuntimeError("schema rejected")
+        monkeypatch.setattr(ai_service.backend, "is_bad_request", lambda error: error is rejection)
+        ai_service.backend.complete.side_effect = [rejection, make_completion({"message": "hi"})]
+
+        result = ai_service.generate_structured_response("Say hi", Greeting)
+
+        assert result.message == "hi"
+        retried = ai_service.backend.complete.call_args_list[1][0][0]
+        assert retried.response_schema is None
+        assert "Greeting" in ai_service.prompt_mode_models
+
+    def test_anthropic_tool_use_request(self, monkeypatch):
+        """Test that Anthropic native mode forces a tool call with the schema"""
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+        service = AIService(provider="anthropic", cache=None)
+        request = service._build_structured_request("Say hi", Greeting)
+
+        kwargs = service.backend._build_kwargs(request)
+
+        assert kwargs["tools"][0]["input_schema"]["type"] == "object"
+        assert kwargs["tool_choice"] == {"type": "tool", "name": "Greeting"}
+
+
+class TestPromptCaching:
+    """Test cases for provider-side prompt prefix caching"""
+
+    def test_anthropic_static_prefix_has_cache_breakpoint(self, monkeypatch):
+        """Test that the system prompt is sent as cached system blocks, not folded into the message"""
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+        service = AIService(provider="anthropic", cache=None)
+        service.structured_mode = "prompt"
+        request = service._build_structured_request("Say hi", Greeting, system_prompt="You are terse.")
+
+        kwargs = service.backend._build_kwargs(request)
+
+        assert [block["text"] for block in kwargs["system"]] == ["You are terse.", request.static_prompt]
+        assert kwargs["system"][-1]["cache_control"] == {"type": "ephemeral"}
+        assert "cache_control" not in kwargs["system"][0]
+        assert kwargs["messages"] == [{"role": "user", "content": "User request: Say hi"}]
+
+    def test_anthropic_tool_breakpoint_without_system_prompt(self, monkeypatch):
+        """Test that the tool schema carries the breakpoint when there is no system prompt"""
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+        monkeypatch.setenv("BLACKTABLE_PROMPT_CACHING", "true")
+        service = AIService(provider="anthropic", cache=None)
+
+        kwargs = service.backend._build_kwargs(service._build_structured_request("Say hi", Greeting))
+
+        assert "system" not in kwargs
+        assert kwargs["tools"][0]["cache_control"] == {"type": "ephemeral"}
+
+    def test_caching_can_be_disabled(self, monkeypatch):
+        """Test that BLACKTABLE_PROMPT_CACHING=false leaves requests unmarked"""
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+        monkeypatch.setenv("BLACKTABLE_PROMPT_CACHING", "false")
+        service = AIService(provider="anthropic", cache=None)
+
+        kwargs = service.backend._build_kwargs(
+            service._build_structured_request("Say hi", Greeting, system_prompt="You are terse.")
+        )
+
+        assert "cache_control" not in kwargs["system"][0]
+        assert "cache_control" not in kwargs["tools"][0]
+
+    def test_openai_static_content_comes_first(self, ai_service):
+        """Test that OpenAI requests share a system prefix and end with the dynamic prompt"""
+        ai_service.structured_mode = "prompt"
+        first = ai_service.backend._build_kwargs(
+            ai_service._build_structured_request("Resume A", Greeting, system_prompt="You are terse.")
+        )
+        second = ai_service.backend._build_kwargs(
+            ai_service._build_structured_request("Resume B", Greeting, system_prompt="You are terse.")
+        )
+
+        assert first["messages"][0] == second["messages"][0]
+        assert first["messages"][0]["role"] == "system"
+        assert first["messages"][0]["content"].startswith("You are terse.")
+        assert first["messages"][-1] == {"role": "user", "content": "User request: Resume A"}
+
+
+class TestStreaming:
+    """Test cases for streamed structured responses"""
+
+    def test_parse_partial_json(self):
+        """Test parsing of truncated JSON prefixes"""
+        assert parse_partial_json('{"greeting": {"message": "Hel') == {"greeting": {"message": "Hel"}}
+        assert parse_partial_json('{"a": [1, 2, ') == {"a": [1, 2]}
+        assert parse_partial_json('{"a": 1, "b"') == {"a": 1}
+        assert parse_partial_json('{"a": tr') == {}
+        assert parse_partial_json("no json yet") is None
+
+    def test_partial_model_accepts_missing_fields(self):
+        """Test that partial models make nested required fields optional"""
+        partial = make_partial_model(Envelope).model_validate({"greeting": {}})
+
+        assert partial.greeting.message is None
+        assert make_partial_model(Envelope) is make_partial_model(Envelope)
+
+    def test_stream_structured_response(self, ai_service, monkeypatch):
+        """Test that partial objects are yielded before the validated result"""
+        text = json.dumps({"message": "hello world", "count": 3})
+        chunks = [text[i:i + 4] for i in range(0, len(text), 4)]
+        monkeypatch.setattr(ai_service.backend, "stream", Mock(return_value=iter(chunks)))
+
+        items = list(ai_service.stream_structured_response("Say hi", Greeting))
+
+        assert isinstance(items[-1], Greeting)
+        assert items[-1].count == 3
+        assert any(not isinstance(item, Greeting) and item.message for item in items[:-1])
+        # The streamed answer is cached like a regular one
+        assert list(ai_service.stream_structured_response("Say hi", Greeting)) == [items[-1]]
+
+    def test_astream_structured_response(self, ai_service, monkeypatch):
+        """Test the async streaming path"""
+        async def chunks(request):
+            for chunk in ['{"message":', ' "hi"}']:
+                yield chunk
+
+        monkeypatch.setattr(ai_service.backend, "astream", chunks)
+
+        async def collect():
+            return [item async for item in ai_service.astream_structured_response("Say hi", Greeting)]
+
+        assert asyncio.run(collect())[-1] == Greeting(message="hi")
+
+
+class TestBatch:
+    """Test cases for offline batch execution"""
+
+    def test_run_batch_with_local_backend(self, ai_service, tmp_path):
+        """Test structured and text requests round-tripping through a local batch"""
+        def responder(request):
+            if request.response_schema is not None or request.json_mode:
+                return make_completion({"message": request.prompt, "count": 1})
+            return make_completion("plain text")
+
+        backend = LocalBatchBackend(str(tmp_path), responder=responder)
+        requests = [
+            BatchRequest(custom_id="a", prompt="first", response_model=Greeting),
+            BatchRequest(custom_id="b", prompt="second"),
+        ]
+
+        results = ai_service.run_batch(requests, poll_interval=0, backend=backend)
+
+        assert results["a"].result == Greeting(message="first", count=1)
+        assert results["b"].result == "plain text"
+        ai_service.backend.complete.assert_not_called()
+
+    def test_run_batch_reports_failures_and_uses_cache(self, ai_service, tmp_path):
+        """Test per-request errors and that cached answers skip the batch"""
+        ai_service.backend.complete.return_value = make_completion({"message": "cached"})
+        ai_service.generate_structured_response("cached", Greeting)
+
+        def responder(request):
+            if "broken" in request.prompt:
+                raise RuntimeError("boom")
+            return make_completion("not json")
+
+        backend = LocalBatchBackend(str(tmp_path), responder=responder)
+        results = ai_service.run_batch([
+            BatchRequest(custom_id="cached", prompt="cached", response_model=Greeting),
+            BatchRequest(custom_id="broken", prompt="broken", response_model=Greeting),
+            BatchRequest(custom_id="invalid", prompt="invalid", response_model=Greeting),
+        ], poll_interval=0, backend=backend)
+
+        assert results["cached"].result == Greeting(message="cached")
+        assert results["broken"].error == "boom"
+        assert not results["invalid"].ok
+
+    def test_batch_timeout(self, ai_service, tmp_path):
+        """Test that an unfinished batch times out"""
+        backend = LocalBatchBackend(str(tmp_path))
+        with pytest.raises(TimeoutError):
+            ai_service.run_batch(
+                [BatchRequest(custom_id="a", prompt="x", response_model=Greeting)],
+                poll_interval=0, timeout=0, backend=backend
+            )
+
+
+class TestClientRegistry:
+    """Test cases for the shared client registry"""
+
+    def setup_method(self):
+        """Start every test from an empty registry"""
+        reset_clients()
+
+    def teardown_method(self):
+        """Drop services created with test credentials"""
+        reset_clients()
+
+    def test_shared_ai_service(self, monkeypatch):
+        """Test that components share one AI service by default"""
+        from blacktable.application_analyzer import ApplicationAnalyzer
+        from blacktable.question_generator import QuestionGenerator
+
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+        analyzer = ApplicationAnalyzer()
+        generator = QuestionGenerator()
+
+        assert analyzer.ai_service is get_ai_service("openai")
+        assert analyzer.fit_score_matcher.ai_service is analyzer.ai_service
+        assert generator.ai_service is analyzer.ai_service
+
+    def test_injected_ai_service(self, ai_service):
+        """Test that an injected AI service is used throughout"""
+        from blacktable.application_analyzer import ApplicationAnalyzer
+
+        analyzer = ApplicationAnalyzer(ai_service=ai_service)
+
+        assert analyzer.ai_service is ai_service
+        assert analyzer.fit_score_matcher.ai_service is ai_service
+
+    def test_providers_share_http_pool(self, monkeypatch):
+        """Test that separate services reuse the provider's HTTP client"""
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+        first = AIService(provider="openai")
+        second = AIService(provider="openai")
+
+        assert first.client._client is get_http_client("openai")
+        assert second.client._client is first.client._client
+
+    def test_async_pool_per_event_loop(self, monkeypatch):
+        """Test that async clients are shared within an event loop only"""
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+        service = AIService(provider="openai")
+
+        async def clients():
+            return service.backend.async_client, service.backend.async_client._client
+
+        first_client, first_http = asyncio.run(clients())
+        second_client, second_http = asyncio.run(clients())
+
+        assert first_http is not second_http
+
+        async def same_loop():
+            return service.backend.async_client is service.backend.async_client
+
+        assert asyncio.run(same_loop())
+
+    def test_async_client_needs_event_loop(self, monkeypatch):
+        """Test that no unshared async client is created outside an event loop"""
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+        service = AIService(provider="openai")
+
+        with pytest.raises(RuntimeError, match="running event loop"):
+            service.backend.async_client
+
+
+class FakeClock:
+    """Manually advanced clock for rate limiter tests"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestRateLimiter:
+    """Test cases for the provider rate limiter"""
+
+    def test_request_and_token_buckets(self):
+        """Test that reservations drain the buckets until they refill"""
+        clock = FakeClock()
+        limiter = RateLimiter(limits={"openai": RateLimits(rpm=2, tpm=1000)}, clock=clock)
+
+        assert limiter.try_acquire("openai", "gpt-4o", 400) is not None
+        assert limiter.try_acquire("openai", "gpt-4o", 700) is None  # token budget exhausted
+        assert limiter.try_acquire("openai", "gpt-4o", 100) is not None
+        assert limiter.try_acquire("openai", "gpt-4o", 1) is None  # request budget exhausted
+
+        clock.now += 30
+        assert limiter.try_acquire("openai", "gpt-4o", 100) is not None
+
+    def test_release_refunds_unused_tokens(self):
+        """Test that settling with real usage returns the over-reservation"""
+        limiter = RateLimiter(limits={"openai:gpt-4o": RateLimits(tpm=1000)}, clock=FakeClock())
+        reservation = limiter.try_acquire("openai", "gpt-4o", 900)
+
+        limiter.release(reservation, used_tokens=100)
+
+        assert limiter.state("openai", "gpt-4o").tokens == 900
+
+    def test_aimd_on_rate_limit(self):
+        """Test multiplicative decrease on 429 and additive recovery"""
+        clock = FakeClock()
+        limiter = RateLimiter(limits={"openai": RateLimits(rpm=60)}, clock=clock)
+
+        limiter.release(limiter.try_acquire("openai", "gpt-4o", 0), rate_limited=True, headers={"retry-after": "5"})
+        state = limiter.state("openai", "gpt-4o")
+        assert state.scale == 0.5
+        assert limiter.try_acquire("openai", "gpt-4o", 0) is None
+
+        clock.now += 10
+        limiter.release(limiter.try_acquire("openai", "gpt-4o", 0))
+        assert limiter.state("openai", "gpt-4o").scale == pytest.approx(0.55)
+
+    def test_limits_learned_from_headers(self):
+        """Test that reported limits are adopted when none are configured"""
+        headers = {
+            "x-ratelimit-limit-requests": "100",
+            "x-ratelimit-limit-tokens": "5000",
+            "x-ratelimit-remaining-tokens": "200",
+        }
+        assert parse_rate_limit_headers(headers)["limit_tokens"] == 5000
+        limiter = RateLimiter(clock=FakeClock())
+
+        limiter.release(limiter.try_acquire("openai", "gpt-4o", 10), used_tokens=10, headers=headers)
+
+        state = limiter.state("openai", "gpt-4o")
+        assert state.rpm == 100
+        assert state.tokens == 200
+        assert limiter.try_acquire("openai", "gpt-4o", 500) is None
+
+    def test_concurrency_cap(self):
+        """Test that in-flight calls are capped per key"""
+        limiter = RateLimiter(max_concurrency=1)
+        reservation = limiter.try_acquire("openai", "gpt-4o", 10)
+
+        assert limiter.try_acquire("openai", "gpt-4o", 10) is None
+        limiter.release(reservation)
+        assert limiter.try_acquire("openai", "gpt-4o", 10) is not None
+
+    def test_sqlite_store_is_shared(self, tmp_path):
+        """Test that limiters on the same database share one budget"""
+        path = str(tmp_path / "limits.sqlite3")
+        clock = FakeClock()
+        limits = {"openai": RateLimits(rpm=1)}
+        first = RateLimiter(limits=limits, store=SQLiteLimiterStore(path), clock=clock)
+        second = RateLimiter(limits=limits, store=SQLiteLimiterStore(path), clock=clock)
+
+        assert first.try_acquire("openai", "gpt-4o", 0) is not None
+        assert second.try_acquire("openai", "gpt-4o", 0) is None
+
+    def test_async_acquire_does_not_block_loop_on_locked_store(self, tmp_path):
+        """Test that waiting for another process's lock on a shared store leaves the event loop free"""
+        path = str(tmp_path / "limits.sqlite3")
+        limiter = RateLimiter(limits={"openai": RateLimits(rpm=60)}, store=SQLiteLimiterStore(path))
+        other_process = sqlite3.connect(path, isolation_level=None)
+        other_process.execute("BEGIN IMMEDIATE")
+
+        async def run():
+            ticks = 0
+
+            async def tick():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+
+            ticker = asyncio.create_task(tick())
+            asyncio.get_running_loop().call_later(0.3, other_process.execute, "COMMIT")
+            reservation = await limiter.aacquire("openai", "gpt-4o", 0)
+            ticker.cancel()
+            return reservation, ticks
+
+        reservation, ticks = asyncio.run(run())
+        other_process.close()
+
+        assert reservation is not None
+        assert ticks >= 10
+
+    def test_service_backs_off_on_rate_limit(self, ai_service):
+        """Test that a 429 from the provider shrinks the service's budget"""
+        import httpx
+        import openai
+
+        response = httpx.Response(429, headers={"retry-after": "1"}, request=httpx.Request("POST", "https://x"))
+        ai_service.backend.complete.side_effect = openai.RateLimitError("slow down", response=response, body=None)
+        ai_service.retry_policy = RetryPolicy(max_attempts=1)
+
+        with pytest.raises(openai.RateLimitError):
+            ai_service.generate_text_response("hi")
+
+        assert ai_service.rate_limiter.state("openai", ai_service.model).scale == 0.5
+
+
+class TestRetryAndRepair:
+    """Test cases for retries, local JSON repair and targeted re-asks"""
+
+    def test_repair_json(self):
+        """Test repair of fenced, truncated and trailing-comma output"""
+        assert repair_json('```json\n{"message": "hi",}\n```') == {"message": "hi"}
+        assert repair_json('Sure! {"message": "hi", "count": 2} Hope that helps') == {"message": "hi", "count": 2}
+        assert repair_json('{"message": "hi, there", "items": [1, 2,') == {"message": "hi, there", "items": [1, 2]}
+        assert repair_json("no json here") is None
+
+    def test_backoff_delay(self):
+        """Test jittered exponential backoff bounds"""
+        policy = RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=4.0)
+
+        assert all(0 <= policy.delay(5) <= 4.0 for _ in range(20))
+        assert policy.delay(0, retry_after=2.5) >= 2.5
+        assert policy.should_retry(1) and not policy.should_retry(2)
+
+    def test_transient_errors_are_retried(self, ai_service):
+        """Test that connection errors are retried until a response arrives"""
+        import httpx
+        import openai
+
+        ai_service.retry_policy = RetryPolicy(max_attempts=3, base_delay=0, max_delay=0)
+        ai_service.backend.complete.side_effect = [
+            openai.APIConnectionError(request=httpx.Request("POST", "https://x")),
+            make_completion("hello"),
+        ]
+
+        assert ai_service.generate_text_response("hi") == "hello"
+        assert ai_service.backend.complete.call_count == 2
+
+    def test_non_transient_errors_are_not_retried(self, ai_service):
+        """Test that other errors surface immediately"""
+        ai_service.backend.complete.side_effect = RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            ai_service.generate_text_response("hi")
+        assert ai_service.backend.complete.call_count == 1
+
+    def test_truncated_json_is_repaired_locally(self, ai_service):
+        """Test that truncated output is repaired without another call"""
+        ai_service.backend.complete.return_value = make_completion('{"message": "hi", "count": 4')
+
+        assert ai_service.generate_structured_response("Say hi", Greeting) == Greeting(message="hi", count=4)
+        assert ai_service.backend.complete.call_count == 1
+
+    def test_reask_sends_only_errors(self, ai_service):
+        """Test that invalid output triggers a re-ask without the original prompt"""
+        ai_service.backend.complete.side_effect = [
+            make_completion({"count": "many"}),
+            make_completion({"message": "fixed", "count": 1}),
+        ]
+
+        result = ai_service.generate_structured_response("ORIGINAL PROMPT", Greeting, system_prompt="SYSTEM")
+
+        assert result == Greeting(message="fixed", count=1)
+        reask = ai_service.backend.complete.call_args_list[1].args[0]
+        assert "ORIGINAL PROMPT" not in reask.prompt
+        assert reask.system_prompt is None
+        assert "message: Field required" in reask.prompt
+        assert "count:" in reask.prompt
+
+    def test_reask_gives_up(self, ai_service):
+        """Test the error once re-asks are exhausted"""
+        ai_service.backend.complete.return_value = make_completion({"count": 1})
+
+        with pytest.raises(ValueError, match="Failed to parse AI response"):
+            ai_service.generate_structured_response("Say hi", Greeting)
+        assert ai_service.backend.complete.call_count == 1 + ai_service.reask_attempts
+
+
+class SlowProvider(BaseProvider):
+    """Provider answering after a fixed delay, optionally failing"""
+
+    def __init__(self, name: str, delay: float, text: str = '{"message": "hi"}', error: Exception = None):
+        self.name = name
+        self.delay = delay
+        self.text = text
+        self.error = error
+        self.client = None
+        self.calls = 0
+
+    def complete(self, request):
+        import time
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return Completion(text=self.text, model=request.model)
+
+    async def acomplete(self, request):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return Completion(text=self.text, model=request.model)
+
+
+class TestRouter:
+    """Test cases for hedged, latency-aware routing"""
+
+    def make_request(self) -> CompletionRequest:
+        return CompletionRequest(model="default", prompt="hi", json_mode=True)
+
+    def test_hedge_wins_over_stalled_primary(self):
+        """Test that a hedged request answers when the primary stalls"""
+        stalled = SlowProvider("stalled", delay=1.0, text='{"message": "slow"}')
+        fast = SlowProvider("fast", delay=0.0, text='{"message": "fast"}')
+        router = RouterProvider([RouteTarget(stalled, "a"), RouteTarget(fast, "b")], hedge_delay=0.05)
+        router._choose = lambda: (router.targets[0], router.targets[1])
+
+        completion = router.complete(self.make_request())
+
+        assert completion.text == '{"message": "fast"}'
+        assert completion.model == "b"
+
+    def test_async_hedge_cancels_loser(self):
+        """Test that the async path cancels the slower request"""
+        stalled = SlowProvider("stalled", delay=5.0)
+        fast = SlowProvider("fast", delay=0.0)
+        router = RouterProvider([RouteTarget(stalled, "a"), RouteTarget(fast, "b")], hedge_delay=0.2)
+        router._choose = lambda: (router.targets[0], router.targets[1])
+        weights = router.weights()
+        assert weights["stalled:a"] == weights["fast:b"]
+
+        async def run():
+            import time
+            started = time.monotonic()
+            completion = await router.acomplete(self.make_request())
+            return completion, time.monotonic() - started
+
+        completion, elapsed = asyncio.run(run())
+
+        assert completion.model == "b"
+        assert elapsed < 1.0
+        # The cancelled loser is recorded with the time it had taken when cancelled
+        assert router.targets[0].stats.samples == 1
+        assert router.targets[0].stats.percentile(0.5) >= 0.2
+        weights = router.weights()
+        assert weights["stalled:a"] < weights["fast:b"]
+
+    def test_failover_on_error(self):
+        """Test that a failing primary fails over without waiting for the hedge delay"""
+        broken = SlowProvider("broken", delay=0.0, error=RuntimeError("down"))
+        healthy = SlowProvider("healthy", delay=0.0)
+        router = RouterProvider([RouteTarget(broken, "a"), RouteTarget(healthy, "b")], hedge_delay=10.0)
+        router._choose = lambda: (router.targets[0], router.targets[1])
+
+        assert router.complete(self.make_request()).model == "b"
+        assert router.targets[0].stats.error_rate > 0
+
+    def test_all_targets_fail(self):
+        """Test that the primary's error surfaces when every target fails"""
+        router = RouterProvider([
+            RouteTarget(SlowProvider("a", 0.0, error=RuntimeError("first")), "a"),
+            RouteTarget(SlowProvider("b", 0.0, error=RuntimeError("second")), "b"),
+        ])
+        router._choose = lambda: (router.targets[0], router.targets[1])
+
+        with pytest.raises(RuntimeError, match="first"):
+            router.complete(self.make_request())
+
+    def test_stage_model_kept_on_serving_targets(self):
+        """Test that a stage's model tier survives routing where the target's provider serves it"""
+        router = RouterProvider([
+            RouteTarget(SlowProvider("openai", 0.0), "gpt-4o"),
+            RouteTarget(SlowProvider("anthropic", 0.0), "claude-3-5-sonnet"),
+        ])
+        tiered = CompletionRequest(model="gpt-4o-mini", prompt="hi", json_mode=True)
+
+        router._choose = lambda: (router.targets[0], router.targets[1])
+        assert router.complete(tiered).model == "gpt-4o-mini"
+        assert router.complete(tiered.model_copy(update={"model": "gpt-4o"})).model == "gpt-4o"
+        router._choose = lambda: (router.targets[1], router.targets[0])
+        # Anthropic cannot run an OpenAI model, and the default model maps to each target's own
+        assert router.complete(tiered).model == "claude-3-5-sonnet"
+        assert router.complete(tiered.model_copy(update={"model": "gpt-4o"})).model == "claude-3-5-sonnet"
+
+    def test_close_stops_worker_threads(self, monkeypatch):
+        """Test that closing a router, directly or through reset_clients, shuts its thread pool down"""
+        router = RouterProvider([RouteTarget(SlowProvider("a", 0.0), "a")])
+        assert router.complete(self.make_request()).model == "a"
+        router.close()
+        with pytest.raises(RuntimeError):
+            router._executor.submit(lambda: None)
+
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+        reset_clients()
+        shared = RouterProvider([RouteTarget(SlowProvider("b", 0.0), "b")])
+        get_ai_service("openai")._backends["router"] = shared
+        reset_clients()
+        with pytest.raises(RuntimeError):
+            shared._executor.submit(lambda: None)
+
+    def test_weights_follow_latency_and_errors(self):
+        """Test that slow or failing targets lose routing weight"""
+        fast = RouteTarget(SlowProvider("fast", 0.0), "a")
+        slow = RouteTarget(SlowProvider("slow", 0.0), "b")
+        flaky = RouteTarget(SlowProvider("flaky", 0.0), "c")
+        for _ in range(30):
+            fast.stats.record(latency=0.5)
+            slow.stats.record(latency=5.0)
+            flaky.stats.record(latency=0.5)
+            flaky.stats.record(error=True)
+        router = RouterProvider([fast, slow, flaky], min_samples=20)
+
+        weights = router.weights()
+
+        assert weights[fast.name] > weights[flaky.name]
+        assert weights[fast.name] > weights[slow.name]
+        assert router.hedge_after(slow) == 5.0
+
+
+class TestTelemetry:
+    """Test cases for per-call telemetry"""
+
+    def test_estimate_cost(self):
+        """Test price lookup by model family and cached-token discount"""
+        assert estimate_cost("gpt-4o-2024-08-06", 1_000_000, 0) == pytest.approx(2.5)
+        assert estimate_cost("gpt-4o-mini", 1_000_000, 0) == pytest.approx(0.15)
+        assert estimate_cost("gpt-4o", 1_000_000, 0, cached_tokens=1_000_000) == pytest.approx(1.25)
+        assert estimate_cost("unknown-model", 10, 10) is None
+
+    def test_structured_call_is_recorded(self, ai_service):
+        """Test that calls and cache hits are recorded under their stage"""
+        ai_service.backend.complete.return_value = Completion(
+            text='{"message": "hi"}', model="gpt-4o", prompt_tokens=100, completion_tokens=20, cached_tokens=40
+        )
+
+        ai_service.generate_structured_response("Say hi", Greeting, stage="demo.greet")
+        ai_service.generate_structured_response("Say hi", Greeting, stage="demo.greet")
+
+        records = ai_service.telemetry.ring.records(stage="demo.greet")
+        assert [record.cache_hit for record in records] == [False, True]
+        call = records[0]
+        assert (call.provider, call.model, call.kind) == ("openai", "gpt-4o", "structured")
+        assert (call.prompt_tokens, call.completion_tokens, call.cached_tokens) == (100, 20, 40)
+        assert call.cost == pytest.approx(estimate_cost("gpt-4o", 100, 20, 40))
+        assert call.latency >= 0 and call.queue_time >= 0
+
+        summary = ai_service.telemetry.summary()["demo.greet"]
+        assert summary["calls"] == 2
+        assert summary["cache_hits"] == 1
+
+    def test_errors_and_stream_timing_are_recorded(self, ai_service, monkeypatch):
+        """Test error records and time to first token for streams"""
+        ai_service.backend.complete.side_effect = RuntimeError("boom")
+        with pytest.raises(RuntimeError):
+            ai_service.generate_text_response("hi", stage="demo.text")
+
+        monkeypatch.setattr(ai_service.backend, "stream", Mock(return_value=iter(['{"message":', ' "hi"}'])))
+        list(ai_service.stream_structured_response("Stream hi", Greeting, stage="demo.stream"))
+
+        error = ai_service.telemetry.ring.records(stage="demo.text")[0]
+        assert error.error == "RuntimeError: boom"
+        stream = ai_service.telemetry.ring.records(stage="demo.stream")[0]
+        assert stream.kind == "stream"
+        assert stream.time_to_first_token is not None
+        assert stream.completion_tokens > 0
+
+    def test_jsonl_sink_and_failing_sink(self, ai_service, tmp_path):
+        """Test the JSONL sink and that a broken sink does not break calls"""
+        class BrokenSink(BaseTelemetrySink):
+            def emit(self, record):
+                raise RuntimeError("sink down")
+
+        path = tmp_path / "telemetry.jsonl"
+        ai_service.telemetry = Telemetry([BrokenSink(), JSONLSink(str(path)), RingBufferSink()])
+        ai_service.backend.complete.return_value = make_completion("hello")
+
+        assert ai_service.generate_text_response("hi", stage="demo.text") == "hello"
+        assert json.loads(path.read_text().splitlines()[0])["stage"] == "demo.text"
+
+
+class TestStagePolicies:
+    """Test cases for per-stage model tiering"""
+
+    def test_resolve_merges_dotted_prefixes(self):
+        """Test that specific stage entries override their prefix field by field"""
+        policies = StagePolicies({
+            "fit_score": StagePolicy(model="gpt-4o-mini", max_tokens=1000),
+            "fit_score.overall_assessment": StagePolicy(timeout=15),
+        })
+
+        policy = policies.resolve("fit_score.overall_assessment")
+
+        assert (policy.model, policy.max_tokens, policy.timeout) == ("gpt-4o-mini", 1000, 15)
+        assert policies.resolve("resume_parser.parse_resume") == StagePolicy()
+        assert policies.resolve(None) == StagePolicy()
+
+    def test_env_overrides_yaml(self, monkeypatch, tmp_path):
+        """Test loading policies from a YAML file and the environment"""
+        path = tmp_path / "stages.yaml"
+        path.write_text(
+            "stages:\n"
+            "  fit_score:\n"
+            "    model: gpt-4o-mini\n"
+            "    temperature: 0\n"
+            "  resume_parser:\n"
+            "    provider: anthropic\n"
+        )
+        monkeypatch.setenv("BLACKTABLE_STAGES_FILE", str(path))
+        monkeypatch.setenv("BLACKTABLE_STAGES", "fit_score=:gpt-4.1-mini/800/20")
+
+        policies = create_stage_policies(AIConfig())
+
+        fit = policies.resolve("fit_score.parse_job_requirements")
+        assert (fit.provider, fit.model, fit.max_tokens, fit.timeout, fit.temperature) == (
+            None, "gpt-4.1-mini", 800, 20.0, 0.0
+        )
+        assert policies.resolve("resume_parser.parse_resume").provider == "anthropic"
+
+    def test_requests_use_stage_settings(self, ai_service):
+        """Test that a stage's model, limits and timeout reach the provider call"""
+        ai_service.stage_policies = StagePolicies({
+            "demo.light": StagePolicy(model="gpt-4o-mini", max_tokens=500, timeout=12),
+        })
+        ai_service.backend.complete.return_value = make_completion({"message": "hi"})
+
+        ai_service.generate_structured_response("Say hi", Greeting, stage="demo.light")
+        ai_service.generate_structured_response("Say hi", Greeting, stage="demo.heavy")
+
+        light, heavy = [call[0][0] for call in ai_service.backend.complete.call_args_list]
+        assert (light.model, light.max_tokens, light.timeout) == ("gpt-4o-mini", 500, 12)
+        assert (heavy.model, heavy.max_tokens, heavy.timeout) == ("gpt-4o", AIConfig.MAX_TOKENS, None)
+        assert ai_service.backend.request_options(light) == {"timeout": 12}
+        assert ai_service.telemetry.ring.records(stage="demo.light")[0].model == "test-model"
+
+    def test_stage_routes_to_other_provider(self, ai_service, monkeypatch):
+        """Test that a stage can run on a different provider's backend"""
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+        ai_service.stage_policies = StagePolicies({"demo": StagePolicy(provider="anthropic")})
+
+        backend = ai_service._backend_for("demo.greet")
+        monkeypatch.setattr(backend, "complete", Mock(return_value=make_completion({"message": "hi"})))
+        ai_service.generate_structured_response("Say hi", Greeting, stage="demo.greet")
+
+        request = backend.complete.call_args[0][0]
+        assert backend.name == "anthropic"
+        assert request.model == AIConfig.ANTHROPIC_MODEL
+        assert request.response_schema["type"] == "object"
+        assert not ai_service.backend.complete.called
+        assert ai_service.telemetry.ring.records(stage="demo.greet")[0].provider == "anthropic"
+
+
+class TestTokenBudget:
+    """Test cases for token counting and input compaction"""
+
+    RESUME = (
+        "# Jane Doe\n\njane@example.com\n\n"
+        "## Experience\n\n"
+        + "".join(f"- Built system {i} that served many users across regions\n" for i in range(40))
+        + "\nJane Doe - Resume\n\nPage 1 of 2\n\n<!-- image -->\n\n"
+        "## Experience\n\n- Led the platform team for five years\n\n"
+        "## Publications\n\n"
+        + "".join(f"{i}. Paper number {i} on distributed consensus, Proc. Conf. {2000 + i}\n" for i in range(1, 31))
+        + "\n## Declaration\n\nI hereby declare that the above information is true to my knowledge.\n\n"
+        "## Skills\n\nPython, Go\n\nReferences available upon request.\n\n"
+        "Jane Doe - Resume\n"
+    )
+
+    def test_counters_per_model(self):
+        """Test that Claude models get their own ratio and counters are shared"""
+        assert isinstance(get_token_counter("claude-3-sonnet"), HeuristicCounter)
+        assert count_tokens("x" * 35, "claude-3-sonnet") == 10
+        assert count_tokens("x" * 40) == 10
+        assert count_tokens("") == 0
+        assert get_token_counter("gpt-4o") is get_token_counter("gpt-4o")
+
+    def test_within_budget_is_unchanged(self):
+        """Test that short inputs pass through untouched"""
+        text, report = TokenBudget(10000).fit(self.RESUME)
+        assert text == self.RESUME
+        assert not report.compacted
+        assert report.final_tokens == report.original_tokens
+
+    def test_cheap_cuts_come_first(self):
+        """Test that duplicates, boilerplate and long lists go before any content is truncated"""
+        budget = TokenBudget(count_tokens(self.RESUME) - 400, max_list_items=5)
+        text, report = budget.fit(self.RESUME)
+
+        reasons = {cut.reason for cut in report.cuts}
+        assert {"duplicate", "page_marker", "boilerplate", "list_items"} <= reasons
+        assert "truncated" not in reasons
+        assert report.final_tokens <= budget.max_tokens
+        assert text.count("## Experience") == 1
+        assert "Led the platform team" in text
+        assert "Page 1 of 2" not in text and "hereby declare" not in text and "upon request" not in text
+        assert "5. Paper number 5" in text and "Paper number 6 " not in text
+        assert "25 more entries omitted" in text
+        assert text.count("Jane Doe - Resume") == 1
+        assert "Built system 39" in text
+
+    def test_repeated_role_titles_are_kept(self):
+        """Test that only lines repeated at page edges are dropped, not repeated role titles"""
+        roles = "".join(
+            f"### Acme {i}\n\nSoftware Engineer\n\n"
+            + "".join(f"- Shipped feature {i}.{j} used by many customers\n" for j in range(10))
+            + "\n"
+            for i in range(3)
+        )
+        resume = f"## Experience\n\n{roles}Jane Doe - Resume\n\nPage 1 of 2\n\nJane Doe - Resume\n\n{roles}"
+        text, report = TokenBudget(count_tokens(resume) - 5).fit(resume)
+
+        assert text.count("Software Engineer") == 6
+        assert text.count("### Acme 1") == 2
+        assert text.count("Jane Doe - Resume") == 1
+        assert {cut.reason for cut in report.cuts} == {"duplicate", "page_marker"}
+
+    def test_truncation_keeps_every_section(self):
+        """Test that a tight budget shortens the longest sections but keeps all headings"""
+        budget = TokenBudget(250, max_list_items=5)
+        text, report = budget.fit(self.RESUME)
+
+        assert report.final_tokens <= 250
+        assert any(cut.reason == "truncated" and cut.section == "Experience" for cut in report.cuts)
+        for heading in ("# Jane Doe", "## Experience", "## Publications", "## Skills"):
+            assert heading in text
+        assert "Python, Go" in text
+        assert "truncated" in report.summary()
+
+    def test_service_uses_stage_budget(self, ai_service):
+        """Test that a stage policy's input budget applies to its inputs"""
+        ai_service.stage_policies = StagePolicies({"resume_parser": StagePolicy(input_budget=300)})
+
+        text, report = ai_service.fit_input(self.RESUME, stage="resume_parser.parse_resume")
+        assert report.compacted and report.budget == 300
+        assert count_tokens(text, "gpt-4o") <= 300
+
+        ai_service.input_budget = 0
+        assert ai_service.fit_input(self.RESUME, stage="fit_score")[0] == self.RESUME
+
+    def test_parser_sends_compacted_content(self, ai_service, capsys):
+        """Test that resume parsing sends the compacted markdown and warns about the cuts"""
+        from blacktable.resume_parser.parser import ResumeParser
+
+        ai_service.input_budget = 300
+        system_prompt, prompt = ResumeParser(ai_service=ai_service)._build_extraction_prompts(self.RESUME)
+
+        assert "hereby declare" not in prompt
+        assert "Warning: resume content compacted" in capsys.readouterr().out
+
+
+class TestSingleFlight:
+    """Test cases for coalescing identical in-flight requests"""
+
+    def test_threads_share_one_provider_call(self, ai_service):
+        """Test that concurrent identical blocking calls run the provider once"""
+        ai_service.cache = None
+        release = threading.Event()
+
+        def slow_complete(request):
+            release.wait(5)
+            return make_completion({"message": "hi"})
+
+        ai_service.backend.complete.side_effect = slow_complete
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [
+                pool.submit(ai_service.generate_structured_response, "Say hi", Greeting, stage="demo")
+                for _ in range(4)
+            ]
+            while ai_service.single_flight.stats.deduplicated < 3:
+                time.sleep(0.01)
+            release.set()
+            results = [future.result() for future in futures]
+
+        assert ai_service.backend.complete.call_count == 1
+        assert all(result == results[0] for result in results)
+        assert len({id(result) for result in results}) == 4
+        assert ai_service.single_flight_stats["deduplicated"] == 3
+        assert ai_service.telemetry.summary()["demo"]["deduplicated"] == 3
+
+    def test_async_calls_share_one_provider_call(self, ai_service):
+        """Test coalescing on the event loop, including a failing call"""
+        ai_service.cache = None
+
+        async def slow_acomplete(request):
+            await asyncio.sleep(0.05)
+            if "fail" in request.prompt:
+                raise RuntimeError("provider down")
+            return make_completion({"message": "hi"})
+
+        ai_service.backend.acomplete.side_effect = slow_acomplete
+
+        async def run():
+            ok = await asyncio.gather(*[ai_service.agenerate_structured_response("Say hi", Greeting) for _ in range(5)])
+            failed = await asyncio.gather(
+                *[ai_service.agenerate_structured_response("fail", Greeting) for _ in range(3)],
+                return_exceptions=True
+            )
+            return ok, failed
+
+        ok, failed = asyncio.run(run())
+
+        assert ai_service.backend.acomplete.await_count == 2
+        assert all(result.message == "hi" for result in ok)
+        assert all(isinstance(error, RuntimeError) for error in failed)
+        assert ai_service.single_flight.in_flight() == 0
+
+    def test_sequential_calls_are_not_coalesced(self):
+        """Test that a key is released once its call has finished"""
+        flight = SingleFlight()
+
+        assert flight.do("key", lambda: 1) == (1, False)
+        assert flight.do("key", lambda: 2) == (2, False)
+        assert flight.stats.as_dict() == {"calls": 2, "deduplicated": 0, "dedup_rate": 0.0}
+
+
+class TestImportTime:
+    """Guards for a light cold start"""
+
+    HEAVY_MODULES = ["openai", "anthropic", "docling", "torch", "transformers", "cv2", "dotenv"]
+
+    def _import(self, statement: str) -> dict:
+        """Run an import in a fresh interpreter and report its time and the heavy modules it loaded"""
+        script = (
+            "import json, sys, time\n"
+            "started = time.perf_counter()\n"
+            f"{statement}\n"
+            "elapsed = time.perf_counter() - started\n"
+            f"loaded = [name for name in {self.HEAVY_MODULES!r} if name in sys.modules]\n"
+            "print(json.dumps({'seconds': elapsed, 'loaded': loaded}))\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True, timeout=60
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    def test_package_import_is_lazy(self):
+        """Test that importing the package loads no component"""
+        report = self._import("import blacktable")
+        assert report["loaded"] == []
+        assert report["seconds"] < 1.0
+
+    def test_scoring_import_skips_sdks_and_docling(self):
+        """Test that the scoring component loads without provider SDKs or docling"""
+        report = self._import("from blacktable.fit_score import FITScoreMatcher")
+        assert report["loaded"] == []
+        assert report["seconds"] < 3.0
+
+    def test_lazy_attributes_resolve(self):
+        """Test that lazily exported names still resolve"""
+        import blacktable
+        import blacktable.core
+        from blacktable.core.ai_service import AIService as ServiceClass
+        from blacktable.fit_score.matcher import FITScoreMatcher
+
+        assert blacktable.FITScoreMatcher is FITScoreMatcher
+        assert blacktable.core.AIService is ServiceClass
+        assert "ResumeParser" in dir(blacktable)
+        with pytest.raises(AttributeError):
+            blacktable.Missing
+
+
+class TestReplay:
+    """Test cases for the record/replay provider"""
+
+    def test_record_then_replay(self, tmp_path):
+        """Test that recorded responses replay by request hash without the real provider"""
+        target = Mock(spec=BaseProvider)
+        target.client = None
+        target.default_model = "gpt-4o"
+        target.native_schema.return_value = None
+        target.complete.return_value = make_completion({"message": "recorded", "count": 3})
+        path = str(tmp_path / "cassette.jsonl")
+
+        recorder = ReplayProvider(mode="record", cassette=Cassette(path), target=target)
+        request = CompletionRequest(model="gpt-4o", prompt="Say hi", json_mode=True)
+        assert json.loads(recorder.complete(request).text)["message"] == "recorded"
+
+        player = ReplayProvider(mode="replay", cassette=Cassette(path), latency=LatencyModel("fixed:0.01"))
+        replayed = player.complete(request.model_copy(update={"model": "other-model"}))
+        assert json.loads(replayed.text) == {"message": "recorded", "count": 3}
+        assert "".join(player.stream(request)) == replayed.text
+        assert asyncio.run(player.acomplete(request)).text == replayed.text
+        assert target.complete.call_count == 1
+
+        with pytest.raises(ValueError, match="No recorded response"):
+            player.complete(CompletionRequest(model="gpt-4o", prompt="Unrecorded"))
+
+    def test_record_then_replay_prompt_mode(self, tmp_path, monkeypatch):
+        """Test that models recorded on the prompt path replay without the real provider"""
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        monkeypatch.setenv("BLACKTABLE_REPLAY_MODE", "fake")
+        target = Mock(spec=BaseProvider)
+        target.client = None
+        target.default_model = "gpt-4o"
+        # Like OpenAI for models with Dict fields: no native schema
+        target.native_schema.return_value = None
+        target.complete.return_value = make_completion({"greeting": {"message": "recorded", "count": 3}})
+        path = str(tmp_path / "cassette.jsonl")
+
+        def service_with(backend):
+            service = AIService(provider="replay", cache=None, rate_limiter=None)
+            service.backend = service._backends["replay"] = backend
+            return service
+
+        recorder = service_with(ReplayProvider(mode="record", cassette=Cassette(path), target=target))
+        recorded = recorder.generate_structured_response("Say hi", Envelope, system_prompt="Be brief")
+        assert target.complete.call_args[0][0].json_mode
+
+        player = service_with(ReplayProvider(mode="replay", cassette=Cassette(path)))
+        assert player.generate_structured_response("Say hi", Envelope, system_prompt="Be brief") == recorded
+        assert recorded.greeting.message == "recorded"
+        assert target.complete.call_count == 1
+
+    def test_fake_mode_returns_valid_models(self, monkeypatch):
+        """Test that fake responses validate against the component response models"""
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        monkeypatch.setenv("BLACKTABLE_REPLAY_MODE", "fake")
+        from blacktable.application_analyzer.models import ApplicationAnalysisResult
+        from blacktable.fit_score.models import OverallScoreResponse
+        from blacktable.question_generator.models import QuestionResponse
+        from blacktable.resume_parser.models import ResumeData
+
+        service = AIService(provider="replay", cache=None, rate_limiter=None)
+        for model in (ResumeData, OverallScoreResponse, QuestionResponse, ApplicationAnalysisResult, Envelope):
+            first = service.generate_structured_response("Analyze this", model)
+            assert isinstance(first, model)
+            # Deterministic per request
+            assert service.generate_structured_response("Analyze this", model) == first
+        assert service.generate_text_response("Say hi")
+
+    def test_fake_instance_respects_constraints(self):
+        """Test enums, bounds, nullable types and references"""
+        schema = {
+            "type": "object",
+            "properties": {
+                "level": {"enum": ["low", "high"]},
+                "score": {"type": "integer", "minimum": 0, "maximum": 10},
+                "ratio": {"type": ["number", "null"], "minimum": 0.5, "maximum": 1},
+                "items": {"type": "array", "items": {"$ref": "#/$defs/Item"}, "minItems": 2},
+            },
+            "$defs": {"Item": {"type": "object", "properties": {"name": {"type": "string", "minLength": 12}}}},
+        }
+        value = fake_instance(schema)
+        assert value["level"] in ("low", "high")
+        assert 0 <= value["score"] <= 10
+        assert 0.5 <= value["ratio"] <= 1
+        assert len(value["items"]) >= 2
+        assert all(len(item["name"]) >= 12 for item in value["items"])
+
+    def test_latency_models(self):
+        """Test synthetic latency distributions"""
+        assert LatencyModel("none").sample() == 0.0
+        assert LatencyModel("fixed:0.2").sample() == 0.2
+        assert 1 <= LatencyModel("uniform:1:2", seed=1).sample() <= 2
+        assert LatencyModel("lognormal:1.5:0.5", seed=1).sample() > 0
+        assert LatencyModel("recorded:0.5").sample(recorded=2.0) == 1.0
+        with pytest.raises(ValueError):
+            LatencyModel("poisson:1")
@@ -1,7 +1,10 @@
 """
 Tests for FIT_Score
 """
+import json
 import pytest
+from blacktable.core.batch import LocalBatchBackend
+from blacktable.core.providers import Completion
 from blacktable.fit_score import FITScoreMatcher, FITScoreResult
 from blacktable.resume_parser.models import ResumeData
 
@@ -55,6 +58,48 @@ class TestFITScoreMatcher:
         except Exception as e:
             pytest.skip(f"AI service not available: {e}")
     
+    def test_calculate_fit_scores_batch(self, tmp_path):
+        """Test batch FIT scoring with a local batch backend"""
+        job_requirements = {
+            "title": "Python Developer",
+            "required_skills": ["Python"],
+            "preferred_skills": [],
+            "experience_requirements": [],
+            "education_requirements": None,
+            "key_responsibilities": [],
+            "company_type": None,
+            "seniority_level": "mid",
+            "random_variables": None
+        }
+        prompts = []
+        
+        def responder(request):
+            prompts.append(request.prompt)
+            if "Job Description:" in request.prompt:
+                text = json.dumps(job_requirements)
+            elif request.json_mode or request.response_schema is not None:
+                text = "not json"
+            else:
+                text = "Solid candidate."
+            return Completion(text=text, model="test-model")
+        
+        backend = LocalBatchBackend(str(tmp_path), responder=responder)
+        resume_data = self._create_mock_resume_data()
+        
+        results = self.matcher.calculate_fit_scores_batch(
+            [(resume_data, "Python role"), (resume_data, "Python role")],
+            poll_interval=0,
+            backend=backend
+        )
+        
+        assert len(results) == 2
+        assert all(isinstance(result, FITScoreResult) for result in results)
+        assert results[0].detailed_analysis.overall_assessment == "Solid candidate."
+        # Overall score parsing failed, so the weighted fallback is used
+        assert results[0].confidence == 0.7
+        # The shared job description is parsed once
+        assert sum("Job Description:" in prompt for prompt in prompts) == 1
+    
     def test_skill_analysis(self):
         """Test skill analysis component"""
         candidate_skills = ["Python", "Django", "JavaScript", "SQL"]
@@ -1,9 +1,31 @@
 """
 Tests for Resume Parser
 """
+import asyncio
+import datetime
+import hashlib
+import json
 import pytest
 import os
+import sqlite3
+import time
+import zipfile
+from unittest.mock import Mock
+from blacktable.__main__ import main as cli_main
+from blacktable.core.clients import reset_clients
 from blacktable.resume_parser import ResumeParser, ResumeData
+from blacktable.resume_parser.cache import ConversionCache, make_conversion_key
+from blacktable.resume_parser.extractors import rtf_to_text
+from blacktable.resume_parser.ingest import create_ingest_sink, ingest
+from blacktable.resume_parser.models import (
+    EducationSection, ProfileSection, ProjectSection, WorkExperience, WorkExperienceSection,
+)
+from blacktable.resume_parser.pdf_text import assess_text_layer, extract_pdf_text, find_columns
+from blacktable.resume_parser.pool import ConverterPool
+from blacktable.resume_parser.preextract import apply_pre_extracted, pre_extract
+from blacktable.resume_parser.sections import merge_resume_sections, split_resume_sections
+from blacktable.resume_parser.timeline import parse_date_range, total_experience_months, total_experience_years
+from blacktable.resume_parser.utils import DocumentProcessor
 
 
 class TestResumeParser:
@@ -25,6 +47,9 @@ class TestResumeParser:
         assert self.parser.document_processor.is_supported_format("test.doc")
         assert self.parser.document_processor.is_supported_format("test.docx")
         assert self.parser.document_processor.is_supported_format("test.txt")
+        assert self.parser.document_processor.is_supported_format("test.html")
+        assert self.parser.document_processor.is_supported_format("test.md")
+        assert self.parser.document_processor.is_supported_format("test.rtf")
         assert not self.parser.document_processor.is_supported_format("test.xyz")
     
     def test_parse_resume_from_text(self):
@@ -73,3 +98,722 @@ class TestResumeParser:
         """Test error for non-existent file"""
         with pytest.raises(FileNotFoundError):
             self.parser.parse_resume("non_existent_file.pdf")
+
+
+class FakeConverter:
+    """Docling stand-in that counts conversions"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def convert(self, file_path):
+        self.calls += 1
+        with open(file_path, "rb") as file:
+            content = file.read().decode("latin-1")
+        document = Mock()
+        document.export_to_markdown.return_value = f"# Converted by {os.getpid()}\n\n{content}"
+        document.num_pages.return_value = 2
+        return Mock(document=document)
+
+
+def make_fake_converter():
+    """Converter factory for pool workers"""
+    return FakeConverter()
+
+
+class TestConversionCache:
+    """Test cases for the document conversion cache"""
+
+    def make_processor(self, tmp_path, max_bytes=1024 * 1024):
+        processor = DocumentProcessor(
+            cache=ConversionCache(str(tmp_path / "conversions.sqlite3"), max_bytes), pool=None, pdf_fast_path=False
+        )
+        processor._converter = FakeConverter()
+        return processor
+
+    def test_repeat_upload_skips_conversion(self, tmp_path):
+        """Test that the same bytes under another name are served from the cache"""
+        processor = self.make_processor(tmp_path)
+        first_path = tmp_path / "resume.pdf"
+        second_path = tmp_path / "upload-2" / "resume.pdf"
+        second_path.parent.mkdir()
+        first_path.write_bytes(b"%PDF resume bytes")
+        second_path.write_bytes(b"%PDF resume bytes")
+
+        first = processor.convert(str(first_path))
+        second = processor.convert(str(second_path))
+
+        assert processor._converter.calls == 1
+        assert not first.cached and second.cached
+        assert second.markdown == first.markdown
+        assert (second.sha256, second.pages, second.format) == (first.sha256, 2, "pdf")
+        assert processor.cache.stats.hits == 1
+
+    def test_key_includes_content_and_converter_config(self, tmp_path, monkeypatch):
+        """Test that changed bytes or converter settings convert again"""
+        processor = self.make_processor(tmp_path)
+        path = tmp_path / "resume.pdf"
+        path.write_bytes(b"version one")
+        processor.convert(str(path))
+        path.write_bytes(b"version two")
+        assert "version two" in processor.convert_to_markdown(str(path))
+
+        monkeypatch.setattr(DocumentProcessor, "converter_config", {"converter": "docling", "version": "next"})
+        processor.convert(str(path))
+        assert processor._converter.calls == 3
+
+    def test_size_bound_evicts_least_recently_used(self, tmp_path):
+        """Test that the cache stays within its size bound"""
+        processor = self.make_processor(tmp_path, max_bytes=700)
+        paths = []
+        for index in range(3):
+            path = tmp_path / f"resume{index}.pdf"
+            path.write_bytes(str(index).encode() * 200)
+            paths.append(str(path))
+
+        processor.convert(paths[0])
+        processor.convert(paths[1])
+        processor.convert(paths[0])  # hit, now most recently used
+        processor.convert(paths[2])
+
+        assert processor.cache.size() <= 700
+        assert processor.cache.stats.evictions == 1
+        assert processor.convert(paths[0]).cached
+        assert not processor.convert(paths[1]).cached
+
+    def test_disabled_by_config(self, monkeypatch):
+        """Test that the cache can be turned off"""
+        monkeypatch.setenv("BLACKTABLE_CONVERSION_CACHE", "none")
+        assert DocumentProcessor().cache is None
+
+
+class TestConverterPool:
+    """Test cases for parallel conversion in worker processes"""
+
+    def test_convert_many_in_workers(self, tmp_path):
+        """Test that conversions run in recycled worker processes and fill the cache"""
+        paths = []
+        for index in range(3):
+            path = tmp_path / f"resume{index}.pdf"
+            path.write_bytes(f"resume {index}".encode())
+            paths.append(str(path))
+        missing = str(tmp_path / "missing.pdf")
+        pool = ConverterPool(2, max_tasks_per_child=1, converter_factory=make_fake_converter)
+        processor = DocumentProcessor(cache=ConversionCache(str(tmp_path / "conversions.sqlite3")), pool=pool)
+
+        with pool:
+            results = processor.convert_many(paths + [missing])
+            assert isinstance(results[missing], FileNotFoundError)
+            converted = [results[path] for path in paths]
+            assert [result.markdown.endswith(f"resume {index}") for index, result in enumerate(converted)] == [True] * 3
+            # One task per worker: every conversion ran in a fresh process
+            worker_pids = {result.markdown.splitlines()[0] for result in converted}
+            assert len(worker_pids) == 3 and f"by {os.getpid()}" not in worker_pids
+
+            assert processor.convert(paths[0]).cached
+
+    def test_warm_starts_every_worker(self):
+        """Test that warming starts all workers up front"""
+        with ConverterPool(2, converter_factory=make_fake_converter) as pool:
+            assert len(pool.warm()) >= 1
+            assert len(pool.executor._processes) == 2
+
+    def test_pool_from_config(self, monkeypatch):
+        """Test that the worker count comes from the environment"""
+        monkeypatch.setenv("BLACKTABLE_CONVERTER_WORKERS", "3")
+        monkeypatch.setenv("BLACKTABLE_CONVERTER_MAX_TASKS_PER_CHILD", "0")
+        processor = DocumentProcessor(cache=None)
+        assert (processor.pool.workers, processor.pool.max_tasks_per_child) == (3, None)
+        with pytest.raises(ValueError):
+            ConverterPool(0)
+
+
+def make_pdf(pages, width=612, height=792):
+    """Build a minimal PDF with a Helvetica text layer; pages are lists of (x, y, text)"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        stream = "".join(f"BT /F1 10 Tf {x} {y} Td ({text}) Tj ET\n" for x, y, text in lines).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % (width, height, len(objects))
+        )
+        kids.append(len(objects))
+    kid_refs = " ".join(f"{kid} 0 R" for kid in kids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kid_refs, len(kids))
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class TestPDFFastPath:
+    """Test cases for reading PDF text layers without Docling"""
+
+    SINGLE_COLUMN = [
+        (72, 720 - 14 * i, f"Line {i}: built data pipelines in Python and Go for analytics") for i in range(30)
+    ]
+
+    def make_processor(self, **kwargs):
+        processor = DocumentProcessor(cache=None, pool=None, **kwargs)
+        processor._converter = FakeConverter()
+        return processor
+
+    def test_text_layer_skips_docling(self, tmp_path):
+        """Test that a clean digital PDF is read from its text layer"""
+        path = tmp_path / "resume.pdf"
+        path.write_bytes(make_pdf([self.SINGLE_COLUMN, self.SINGLE_COLUMN[:20]]))
+        processor = self.make_processor()
+
+        result = processor.convert(str(path))
+
+        assert (result.converter, result.pages, result.fallback_reason) == ("pdfium", 2, None)
+        assert processor._converter.calls == 0
+        assert "Line 29: built data pipelines" in result.markdown
+        assert "\r" not in result.markdown
+
+    def test_two_columns_read_in_order(self, tmp_path):
+        """Test that a two-column page is read column by column"""
+        lines = []
+        for i in range(30):
+            # Content stream interleaves the columns row by row
+            lines.append((50, 720 - 14 * i, f"Skill {i} Kubernetes"))
+            lines.append((330, 720 - 14 * i, f"Role {i} engineer at Example"))
+        path = tmp_path / "resume.pdf"
+        path.write_bytes(make_pdf([lines]))
+
+        text, quality = extract_pdf_text(str(path))
+
+        assert quality.ok and quality.columns == 2
+        assert text.index("Skill 29") < text.index("Role 0")
+
+    def test_poor_text_layer_falls_back_to_docling(self, tmp_path):
+        """Test that scans and unreadable files go through Docling with the reason reported"""
+        sparse = tmp_path / "scan.pdf"
+        sparse.write_bytes(make_pdf([[(72, 720, "Page 1")]]))
+        broken = tmp_path / "broken.pdf"
+        broken.write_bytes(b"not a pdf")
+        processor = self.make_processor()
+
+        result = processor.convert(str(sparse))
+        assert result.converter == "docling"
+        assert result.fallback_reason.startswith("sparse text layer")
+        assert processor.convert(str(broken)).fallback_reason.startswith("text layer unreadable")
+        assert processor._converter.calls == 2
+
+    def test_text_layer_read_before_pool(self, tmp_path):
+        """Test that only PDFs needing Docling are sent to the worker pool"""
+        clean = tmp_path / "resume.pdf"
+        clean.write_bytes(make_pdf([self.SINGLE_COLUMN]))
+        sparse = tmp_path / "scan.pdf"
+        sparse.write_bytes(make_pdf([[(72, 720, "Page 1")]]))
+
+        with ConverterPool(1, converter_factory=make_fake_converter) as pool:
+            pool.submit = Mock(wraps=pool.submit)
+            processor = DocumentProcessor(cache=None, pool=pool)
+            results = processor.convert_many([str(clean), str(sparse)])
+
+        assert results[str(clean)].converter == "pdfium"
+        assert pool.submit.call_count == 1 and pool.submit.call_args[0][0] == str(sparse)
+        assert results[str(sparse)].converter == "docling"
+        assert results[str(sparse)].markdown.startswith("# Converted by")
+        assert results[str(sparse)].fallback_reason.startswith("sparse text layer")
+
+    def test_quality_heuristics(self):
+        """Test the garbled glyph and column checks"""
+        clean = "Senior engineer with ten years of experience. " * 10
+        assert assess_text_layer(clean, pages=1, columns=1).ok
+        garbled = assess_text_layer(clean + "\ue000\ue001" * 20, pages=1, columns=1)
+        assert not garbled.ok and garbled.reason.startswith("garbled")
+        assert assess_text_layer(clean, pages=1, columns=3).reason == "complex layout (3 columns)"
+
+        three_columns = [(x, y, x + 150, y + 10) for x in (40, 240, 440) for y in range(100, 700, 20)]
+        assert len(find_columns(three_columns, 612)) == 3
+        # Right-aligned dates next to full-width lines are not a second column
+        dated = [(72, y, 500, y + 10) for y in range(100, 700, 20)]
+        dated += [(510, y, 560, y + 10) for y in range(100, 300, 20)]
+        assert find_columns(dated, 612) == [(0.0, 612)]
+
+    def test_fast_path_can_be_disabled(self, tmp_path, monkeypatch):
+        """Test that the fast path is configurable and part of the cache key"""
+        path = tmp_path / "resume.pdf"
+        path.write_bytes(make_pdf([self.SINGLE_COLUMN]))
+        monkeypatch.setenv("BLACKTABLE_PDF_FAST_PATH", "false")
+        processor = self.make_processor()
+
+        assert processor.convert(str(path)).converter == "docling"
+        assert processor.converter_config["pdf_fast_path"] is False
+
+
+class TestDirectExtractors:
+    """Test cases for formats converted without Docling"""
+
+    def make_processor(self):
+        processor = DocumentProcessor(cache=None, pool=None)
+        processor._converter = FakeConverter()
+        return processor
+
+    def test_docx(self, tmp_path):
+        """Test headings, lists, paragraphs and tables of a DOCX resume"""
+        import docx
+
+        document = docx.Document()
+        document.add_heading("Jane Doe", level=0)
+        document.add_heading("Experience", level=1)
+        document.add_paragraph("Staff Engineer at Example (2019 - 2024)")
+        document.add_paragraph("Led the payments platform", style="List Bullet")
+        table = document.add_table(rows=2, cols=2)
+        table.cell(0, 0).text, table.cell(0, 1).text = "Skill", "Years"
+        table.cell(1, 0).text, table.cell(1, 1).text = "Python", "8"
+        path = tmp_path / "resume.docx"
+        document.save(str(path))
+        processor = self.make_processor()
+
+        result = processor.convert(str(path))
+
+        assert result.converter == "python-docx"
+        assert processor._converter.calls == 0
+        assert result.markdown.startswith("# Jane Doe\n\n## Experience\n\nStaff Engineer at Example")
+        assert "- Led the payments platform" in result.markdown
+        assert "| Skill | Years |\n|---|---|\n| Python | 8 |" in result.markdown
+
+    def test_html(self, tmp_path):
+        """Test that page text becomes markdown without scripts and navigation"""
+        path = tmp_path / "profile.html"
+        path.write_text(
+            "<html><head><title>Profile</title><style>p {color: red}</style></head><body>"
+            "<nav>Home | Jobs</nav><h1>Jane Doe</h1><p>Staff Engineer<br>Berlin</p>"
+            "<section><h2>Experience</h2><ul><li>Example &amp; Co, <b>2019</b></li><li>Acme</li></ul></section>"
+            "<script>track()</script></body></html>"
+        )
+
+        markdown = self.make_processor().convert_to_markdown(str(path))
+
+        assert markdown == (
+            "# Jane Doe\n\nStaff Engineer\nBerlin\n\n## Experience\n\n- Example & Co, 2019\n\n- Acme\n"
+        )
+
+    def test_markdown_and_rtf(self, tmp_path):
+        """Test Markdown passthrough and RTF text extraction"""
+        markdown_path = tmp_path / "resume.md"
+        markdown_path.write_text("# Jane Doe\r\n\r\n- Python\r\n")
+        rtf_path = tmp_path / "resume.rtf"
+        rtf_path.write_text(
+            r"{\rtf1\ansi{\fonttbl{\f0 Arial;}}{\*\generator Word;}\f0 Jane Doe\par "
+            r"Caf\'e9 owner \u8211? 2020\par\pard{\b Skills:} Python\tab Go}"
+        )
+        processor = self.make_processor()
+
+        markdown = processor.convert(str(markdown_path))
+        rtf = processor.convert(str(rtf_path))
+
+        assert (markdown.converter, markdown.markdown) == ("markdown", "# Jane Doe\n\n- Python\n")
+        assert rtf.converter == "rtf"
+        assert rtf.markdown == "Jane Doe\n\nCafé owner \u2013 2020\n\nSkills: Python\tGo\n"
+        assert rtf_to_text(r"{\rtf1 a\{b\}\\c}") == "a{b}\\c"
+
+
+class TestInMemoryConversion:
+    """Test cases for converting uploads without temp files"""
+
+    def test_convert_bytes_matches_path(self, tmp_path):
+        """Test that bytes and files convert alike and share cache entries"""
+        data = make_pdf([TestPDFFastPath.SINGLE_COLUMN])
+        path = tmp_path / "resume.pdf"
+        path.write_bytes(data)
+        processor = DocumentProcessor(cache=ConversionCache(str(tmp_path / "conversions.sqlite3")), pool=None)
+
+        from_bytes = processor.convert_bytes(data, "upload.pdf")
+        from_path = processor.convert(str(path))
+
+        assert from_bytes.converter == "pdfium"
+        assert from_bytes.markdown == from_path.markdown
+        assert from_bytes.sha256 == from_path.sha256 == hashlib.sha256(data).hexdigest()
+        assert from_path.cached
+
+    def test_precomputed_hash_hits_cache_before_conversion(self, tmp_path):
+        """Test that a hash computed during upload is used for the cache lookup"""
+        processor = DocumentProcessor(cache=ConversionCache(str(tmp_path / "conversions.sqlite3")), pool=None)
+        processor.cache.set(
+            make_conversion_key("upload-hash", processor.converter_config),
+            "# Cached resume\n",
+            {"format": "pdf", "converter": "docling", "pages": 1, "duration": 2.5}
+        )
+
+        result = processor.convert_bytes(b"never converted", "resume.pdf", content_hash="upload-hash")
+
+        assert (result.markdown, result.cached, result.sha256) == ("# Cached resume\n", True, "upload-hash")
+
+    def test_extractors_from_bytes(self):
+        """Test direct extractors on in-memory documents"""
+        processor = DocumentProcessor(cache=None, pool=None)
+        result = processor.convert_bytes(b"<h1>Jane Doe</h1><p>Engineer</p>", "profile.html")
+        assert (result.converter, result.markdown) == ("html", "# Jane Doe\n\nEngineer\n")
+        assert processor.convert_bytes("Jane Doe\r\n".encode("utf-8-sig"), "cv.txt").markdown == "Jane Doe\n"
+
+    def test_parse_resume_bytes(self):
+        """Test that uploads are validated and parsed from memory"""
+        parser = ResumeParser(ai_service=Mock())
+        parser.document_processor = DocumentProcessor(cache=None, pool=None)
+        parser.ai_service.fit_input.side_effect = lambda text, stage: (text, Mock(compacted=False))
+        parser.ai_service.generate_structured_response.return_value = "parsed"
+
+        assert parser.parse_resume_bytes(b"Jane Doe, engineer", "cv.txt") == "parsed"
+        assert "Jane Doe, engineer" in parser.ai_service.generate_structured_response.call_args[1]["prompt"]
+        with pytest.raises(ValueError, match="Unsupported file format"):
+            parser.parse_resume_bytes(b"data", "cv.xyz")
+
+
+class TestSectionedParsing:
+    """Test cases for extracting resume sections in concurrent calls"""
+
+    MARKDOWN = """# Jane Doe
+
+jane@example.com
+
+## Summary
+
+Backend engineer.
+
+## Work Experience
+
+### Engineer, Acme
+
+Jan 2019 - Dec 2020
+
+## Projects
+
+### Search engine
+
+## Education
+
+MIT, 2014 - 2018
+"""
+
+    def make_results(self):
+        return {
+            "profile": ProfileSection(About={"Name": "Jane Doe", "TotalWorkExperience": 9},
+                                      CandidateOverall={"Skills": ["Python"]}),
+            "experience": WorkExperienceSection(WorkExperience=[
+                {"ID": 7, "Title": "Engineer", "Skills": ["python", "Go"],
+                 "Timeline": {"Start": "Jan 2019", "End": "Dec 2020"}},
+                {"ID": 7, "Title": "Consultant", "Timeline": {"Start": "June 2020", "End": "Present"}},
+            ]),
+            "projects": ProjectSection(Projects=[{"Title": "Search engine", "Skills": ["Rust"]}]),
+            "education": EducationSection(Education=[{"College": "MIT"}]),
+        }
+
+    def make_parser(self, delay=0.0):
+        def generate(prompt, response_model, system_prompt, stage):
+            time.sleep(delay)
+            kind = stage.rsplit(".", 1)[-1]
+            return self.make_results()[kind] if response_model is not ResumeData else "single call"
+
+        parser = ResumeParser(ai_service=Mock(), sectioned=True)
+        parser.ai_service.fit_input.side_effect = lambda text, stage: (text, Mock(compacted=False))
+        parser.ai_service.generate_structured_response.side_effect = generate
+        return parser
+
+    def test_split_markdown_sections(self):
+        """Test that headings route lines to their sections"""
+        sections = split_resume_sections(self.MARKDOWN)
+
+        assert list(sections) == ["profile", "experience", "projects", "education"]
+        assert sections["profile"].startswith("# Jane Doe") and "Backend engineer." in sections["profile"]
+        assert "### Engineer, Acme" in sections["experience"]
+        assert sections["education"] == "## Education\n\nMIT, 2014 - 2018"
+
+    def test_split_pdf_text_headings(self):
+        """Test headings run into the first line of a page, as in PDF text layers"""
+        sections = split_resume_sections(
+            "EDUCATION MIT, B.Sc 2018\nPage 1 of 2\n\nWORK EXPERIENCE Acme Jan 2019 - Present\n"
+            "SKILLS Python, Go\nSKILLS\nPython, Go"
+        )
+
+        assert sections["education"] == "EDUCATION MIT, B.Sc 2018\nPage 1 of 2"
+        assert sections["experience"] == "WORK EXPERIENCE Acme Jan 2019 - Present\nSKILLS Python, Go"
+        assert sections["profile"] == "SKILLS\nPython, Go"
+
+    def test_job_titles_and_list_items_are_not_headings(self):
+        """Test that caps job titles and list items inside a section do not start a new one"""
+        sections = split_resume_sections(
+            "# Jane Doe\n\n## Experience\n\nPROJECT MANAGER  Acme Corp  2019 - 2021\n\n"
+            "- Leadership\n- Mentoring\n\n## Education\n\nMIT"
+        )
+
+        assert list(sections) == ["profile", "experience", "education"]
+        assert "PROJECT MANAGER  Acme Corp" in sections["experience"]
+        assert "- Leadership" in sections["experience"]
+
+    def test_experience_counts_overlaps_once(self):
+        """Test that total experience merges overlapping roles and caps ongoing ones at today"""
+        today = datetime.date(2022, 6, 15)
+        roles = [
+            WorkExperience(Timeline={"Start": "Jan 2019", "End": "Dec 2020"}),
+            WorkExperience(Timeline={"Start": "06/2020", "End": "Present"}),
+            WorkExperience(Timeline={"Start": "2015", "End": "2015"}),
+            WorkExperience(Timeline={"Start": "unknown"}),
+        ]
+
+        assert parse_date_range("Sept 2023 – Present", today) == ((2023, 9), (2022, 6))
+        assert parse_date_range("2019-2021") == ((2019, 1), (2021, 12))
+        assert total_experience_months(roles, today) == 42 + 12
+        assert total_experience_years(roles[:2], today) == 4
+        assert total_experience_years(roles[3:], today) is None
+
+    def test_merge_sections(self):
+        """Test IDs, skills and total experience of merged sections"""
+        resume = merge_resume_sections(self.make_results(), today=datetime.date(2022, 6, 1)).resume
+
+        assert [(entry.ID, entry.Title) for entry in resume.WorkExperience] == [(1, "Engineer"), (2, "Consultant")]
+        assert [entry.ID for entry in resume.Projects + resume.Education] == [1, 1]
+        assert resume.CandidateOverall.Skills == ["Python", "Go", "Rust"]
+        assert resume.About.Name == "Jane Doe"
+        assert resume.About.TotalWorkExperience == 4
+
+    def test_sections_extracted_concurrently(self):
+        """Test that sectioned parsing takes about as long as the slowest section"""
+        parser = self.make_parser(delay=0.3)
+
+        start = time.monotonic()
+        resume_data = parser.parse_resume_from_text(self.MARKDOWN)
+        elapsed = time.monotonic() - start
+
+        stages = sorted(call[1]["stage"] for call in parser.ai_service.generate_structured_response.call_args_list)
+        assert stages == [f"resume_parser.parse_resume.{kind}" for kind in
+                          ("education", "experience", "profile", "projects")]
+        assert elapsed < 0.9
+        assert resume_data.resume.WorkExperience[1].ID == 2
+
+    def test_async_sections_extracted_concurrently(self):
+        """Test the async variant gathers the section calls"""
+        parser = self.make_parser()
+
+        async def agenerate(prompt, response_model, system_prompt, stage):
+            await asyncio.sleep(0.3)
+            return self.make_results()[stage.rsplit(".", 1)[-1]]
+
+        parser.ai_service.agenerate_structured_response = agenerate
+        start = time.monotonic()
+        resume_data = asyncio.run(parser.aparse_resume_from_text(self.MARKDOWN))
+
+        assert time.monotonic() - start < 0.9
+        assert resume_data.resume.Education[0].College == "MIT"
+
+    def test_unsectioned_text_uses_single_call(self):
+        """Test that text without recognised headings is extracted in one call"""
+        parser = self.make_parser()
+
+        assert parser.parse_resume_from_text("Jane Doe\nEngineer at Acme") == "single call"
+        assert parser.ai_service.generate_structured_response.call_args[1]["stage"] == "resume_parser.parse_resume"
+
+    def test_failed_section_fails_parse(self):
+        """Test that an error in any section call fails the whole parse"""
+        parser = self.make_parser()
+        parser.ai_service.generate_structured_response.side_effect = RuntimeError("rate limited")
+
+        with pytest.raises(ValueError, match="rate limited"):
+            parser.parse_resume_from_text(self.MARKDOWN)
+
+
+class TestPreExtraction:
+    """Test cases for extracting contact fields locally before the model call"""
+
+    TEXT = """# Jane Doe
+
+Phone: +1 (555) 123-4567 | [jane\\_doe@example.com](mailto:jane_doe@example.com)
+[LinkedIn](https://www.linkedin.com/in/janedoe/) | github.com/janedoe
+
+## Experience
+
+Acme, 01.2019 - 03.2020, 2016 - 2018 2019
+"""
+
+    def test_pre_extract(self):
+        """Test emails, phone numbers and links found in markdown"""
+        pre_extracted = pre_extract(self.TEXT)
+
+        assert pre_extracted.Email == "jane_doe@example.com"
+        assert pre_extracted.Mobile == "+1 (555) 123-4567"
+        assert pre_extracted.Linkedin == "https://www.linkedin.com/in/janedoe/"
+        assert [(link.Platform, link.Link) for link in pre_extracted.Weblinks] == [
+            ("LinkedIn", "https://www.linkedin.com/in/janedoe/"), ("GitHub", "https://github.com/janedoe")
+        ]
+
+    def test_dates_are_not_phone_numbers(self):
+        """Test that date ranges with enough digits are not taken for phone numbers"""
+        assert pre_extract("Acme 01.2019 - 03.2020\nMIT 2014 - 2018 2019").Mobile is None
+        assert pre_extract("ID 2021-2022\nCell 98765 43210").Mobile == "98765 43210"
+
+    def test_other_numbers_are_not_phone_numbers(self):
+        """Test that order, account and ISBN numbers are not taken for phone numbers"""
+        assert pre_extract("Order ID 1234567890123").Mobile is None
+        assert pre_extract("Account no. 004512349876").Mobile is None
+        assert pre_extract("ISBN 978-3-16-148410-0\nISBN 9783161484100").Mobile is None
+        assert pre_extract("Order 1234567890123\n555.123.4567").Mobile == "555.123.4567"
+        assert pre_extract("+91 62004 83104\nMobile: 98765 43210").Mobile == "98765 43210"
+
+    def test_local_values_win(self):
+        """Test that local fields replace the model's and links are merged"""
+        resume_data = ResumeData(resume={
+            "About": {"Name": "Jane Doe", "Email": "jane@exmaple.com", "TotalWorkExperience": 10},
+            "WorkExperience": [{"Timeline": {"Start": "Jan 2019", "End": "Dec 2020"}}],
+            "Weblinks": [
+                {"Platform": "GitHub", "Link": "github.com/janedoe/"},
+                {"Platform": "Blog", "Link": "jane.dev"},
+            ],
+        })
+
+        resume = apply_pre_extracted(resume_data, pre_extract(self.TEXT)).resume
+
+        assert (resume.About.Name, resume.About.Email) == ("Jane Doe", "jane_doe@example.com")
+        assert resume.About.TotalWorkExperience == 2
+        assert [link.Platform for link in resume.Weblinks] == ["LinkedIn", "GitHub", "Blog"]
+        assert resume_data.resume.About.Email == "jane@exmaple.com"
+
+    def test_parser_tells_model_to_skip_fields(self):
+        """Test that the prompt lists the pre-extracted fields and the result gets the local values"""
+        parser = ResumeParser(ai_service=Mock(), pre_extract=True)
+        parser.ai_service.fit_input.side_effect = lambda text, stage: (text, Mock(compacted=False))
+        parser.ai_service.generate_structured_response.return_value = ResumeData(resume={"About": {"Name": "Jane"}})
+
+        resume = parser.parse_resume_from_text(self.TEXT).resume
+
+        prompt = parser.ai_service.generate_structured_response.call_args[1]["prompt"]
+        assert "leave them null: About.Email, About.Mobile, About.Linkedin, About.TotalWorkExperience" in prompt
+        assert "https://github.com/janedoe" in prompt.rsplit("Weblinks", 1)[1]
+        assert (resume.About.Name, resume.About.Mobile) == ("Jane", "+1 (555) 123-4567")
+
+    def test_disabled(self):
+        """Test that pre-extraction can be turned off"""
+        parser = ResumeParser(ai_service=Mock(), pre_extract=False)
+        parser.ai_service.fit_input.side_effect = lambda text, stage: (text, Mock(compacted=False))
+        parser.ai_service.generate_structured_response.return_value = ResumeData()
+
+        assert parser.parse_resume_from_text(self.TEXT) == ResumeData()
+        assert "leave them null" not in parser.ai_service.generate_structured_response.call_args[1]["prompt"]
+
+
+class TestIngest:
+    """Test cases for the bulk ingest pipeline"""
+
+    def make_parser(self, fail=(), delay=0.0):
+        state = {"active": 0, "peak": 0, "calls": 0}
+
+        async def agenerate(prompt, response_model, system_prompt, stage):
+            state["active"] += 1
+            state["calls"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(delay)
+            state["active"] -= 1
+            if any(name in prompt for name in fail):
+                raise RuntimeError("model unavailable")
+            return ResumeData(resume={"About": {"Name": prompt.split("Resume Content:\n", 1)[1].split("\n", 1)[0]}})
+
+        parser = ResumeParser(ai_service=Mock(), sectioned=False, pre_extract=False)
+        parser.document_processor = DocumentProcessor(cache=None, pool=None)
+        parser.ai_service.fit_input.side_effect = lambda text, stage: (text, Mock(compacted=False))
+        parser.ai_service.agenerate_structured_response = agenerate
+        return parser, state
+
+    def write_resumes(self, directory, count):
+        directory.mkdir(parents=True, exist_ok=True)
+        for index in range(count):
+            (directory / f"cv{index:02d}.txt").write_text(f"Candidate {index:02d}\nEngineer\n")
+        (directory / "notes.xyz").write_text("not a resume")
+
+    def run(self, source, output, parser, **kwargs):
+        sink = create_ingest_sink(str(output))
+        try:
+            return asyncio.run(ingest(str(source), sink, parser, progress=None, **kwargs))
+        finally:
+            sink.close()
+
+    def test_directory_to_jsonl_resumes_from_checkpoint(self, tmp_path):
+        """Test that a rerun skips resumes the output already holds"""
+        self.write_resumes(tmp_path / "resumes" / "batch", 5)
+        output = tmp_path / "out" / "resumes.jsonl"
+        parser, state = self.make_parser()
+
+        stats = self.run(tmp_path / "resumes", output, parser, limit=3)
+        assert (stats.parsed, stats.failed, stats.skipped) == (3, 0, 0)
+
+        stats = self.run(tmp_path / "resumes", output, parser)
+        records = [json.loads(line) for line in output.read_text().splitlines()]
+        assert (stats.parsed, stats.skipped, state["calls"]) == (2, 3, 5)
+        assert [record["source"] for record in records] == [f"batch/cv{index:02d}.txt" for index in range(5)]
+        assert records[4]["data"]["resume"]["About"]["Name"] == "Candidate 04"
+        assert records[0]["converter"] == "text"
+
+    def test_interrupted_jsonl_line(self, tmp_path):
+        """Test that a line cut short by an interrupted run is ignored and the resume parsed again"""
+        self.write_resumes(tmp_path / "resumes", 2)
+        output = tmp_path / "resumes.jsonl"
+        output.write_text('{"source": "cv00.txt", "ok": true}\n{"source": "cv01.txt", "ok": tr')
+        parser, state = self.make_parser()
+
+        stats = self.run(tmp_path / "resumes", output, parser)
+
+        assert (stats.parsed, stats.skipped) == (1, 1)
+        assert json.loads(output.read_text().splitlines()[-1])["source"] == "cv01.txt"
+
+    def test_zip_to_sqlite_retries_failures(self, tmp_path):
+        """Test zip archives read in memory, failures recorded and retried on the next run"""
+        self.write_resumes(tmp_path / "resumes", 4)
+        archive = tmp_path / "resumes.zip"
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            for path in sorted((tmp_path / "resumes").iterdir()):
+                zip_file.write(path, f"2024/{path.name}")
+        output = tmp_path / "resumes.sqlite3"
+
+        parser, _ = self.make_parser(fail=("Candidate 02",))
+        stats = self.run(archive, output, parser)
+        assert (stats.parsed, stats.failed) == (3, 1)
+        assert stats.summary()["error_rate"] == 0.25
+
+        parser, state = self.make_parser()
+        stats = self.run(archive, output, parser)
+        assert (stats.parsed, stats.skipped, state["calls"]) == (1, 3, 1)
+        with sqlite3.connect(output) as conn:
+            rows = conn.execute("SELECT source, ok, error FROM resumes ORDER BY source").fetchall()
+        assert rows == [(f"2024/cv{index:02d}.txt", 1, None) for index in range(4)]
+
+    def test_bounded_concurrency(self, tmp_path):
+        """Test that extraction never runs more calls than its concurrency"""
+        self.write_resumes(tmp_path / "resumes", 12)
+        parser, state = self.make_parser(delay=0.05)
+
+        stats = self.run(tmp_path / "resumes", tmp_path / "resumes.jsonl", parser, concurrency=3, max_pending=4)
+
+        assert stats.parsed == 12
+        assert state["peak"] == 3
+        with pytest.raises(ValueError, match="max_pending"):
+            self.run(tmp_path / "resumes", tmp_path / "resumes.jsonl", parser, concurrency=4, max_pending=2)
+
+    def test_cli_reports_bad_source(self, tmp_path, monkeypatch, capsys):
+        """Test that the ingest command rejects a source that is neither a directory nor an archive"""
+        monkeypatch.setenv("BLACKTABLE_CONVERSION_CACHE", "none")
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        output = tmp_path / "out" / "out.jsonl"
+
+        # The source is checked before the provider is set up or the output created
+        assert cli_main(["ingest", str(tmp_path / "missing"), "-o", str(output), "--quiet"]) == 2
+        assert "Error: Not a directory or zip archive" in capsys.readouterr().err
+        assert not output.parent.exists()
+
+    def test_cli_reports_provider_errors(self, tmp_path, monkeypatch, capsys):
+        """Test that a missing provider key is reported as an error instead of a traceback"""
+        monkeypatch.setenv("BLACKTABLE_CONVERSION_CACHE", "none")
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        # Not the shared service an earlier test built with a key
+        reset_clients()
+
+        assert cli_main(["ingest", str(tmp_path), "-o", str(tmp_path / "out.jsonl"), "--quiet"]) == 2
+        assert "Error: OpenAI API key not found" in capsys.readouterr().err